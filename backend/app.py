@@ -1,14 +1,24 @@
 import logging
 import os
 import json
+import threading
+import time
+import uuid
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
-from documents import initialize_vectorstore
-from chat_model import CustomAgentExecutor
+from documents import retrieval_service, embeddings
+from document_events import document_changed
+from catalog import catalog
+from keyword_index import keyword_index
+from paths import DOCUMENTS_DIR, TRAVEL_PLANS_DIR
+from sessions import session_store
+from metrics import registry, HTTP_REQUEST_SECONDS
 from tool_actions import update_todo_list
-from documents import vectorstore
+from budget_actions import update_budget
+from storage import list_store
+from http_caching import conditional_response, compress_response, file_etag
 
 load_dotenv()
 
@@ -21,16 +31,39 @@ logging.basicConfig(
     ]
 )
 
-agent = None
-conversation_history = []
-
 app = Flask(__name__)
-CORS(app, origins=[os.getenv('FRONTEND_URL', 'http://localhost:3000')])
+CORS(app, origins=[os.getenv('FRONTEND_URL', 'http://localhost:3000')], expose_headers=['X-Session-ID'])
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Label by route pattern, not the raw path, to keep the number of series bounded
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method, endpoint=endpoint, status=response.status_code
+        )
+    return response
+
+@app.after_request
+def compress(response):
+    return compress_response(response)
+
+def get_session_id(data: dict = None):
+    """Session ID from the X-Session-ID header, the JSON body or the query string"""
+    return (
+        request.headers.get('X-Session-ID')
+        or (data or {}).get('session_id')
+        or request.args.get('session_id')
+    )
 
 @app.route('/chat', methods=['POST'])
 def chat():
-    global conversation_history, agent, vectorstore
-    
     try:
         data = request.get_json()
         user_message = data.get('message', '')
@@ -40,15 +73,9 @@ def chat():
         if not user_message:
             return jsonify({'error': 'Message is required'}), 400
         
-        # Initialize vector store if not done
-        if vectorstore is None:
-            initialize_vectorstore()
-        
-        # Initialize agent if not done
-        if agent is None:
-            agent = CustomAgentExecutor(max_iterations=3)
-            
-        answer = agent.invoke(input=user_message, conversation_history=conversation_history)
+        session = session_store.get(get_session_id(data))
+        with session.lock:
+            answer = session.agent.invoke(input=user_message)
 
         logging.info(f"Agent invocation completed: {answer}")
         
@@ -63,26 +90,70 @@ def chat():
             response_text = str(answer)
         
         # Add to conversation history
-        conversation_history.append({
-            'user': user_message,
-            'assistant': response_text,
-            'timestamp': datetime.now().isoformat()
-        })
+        session.add_turn(user_message, response_text, datetime.now().isoformat())
         
-        return jsonify({'response': response_text})
+        response = jsonify({'response': response_text, 'session_id': session.session_id})
+        response.headers['X-Session-ID'] = session.session_id
+        return response
     
     except Exception as e:
         print(f"Error in chat endpoint: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /chat using Server-Sent Events. Emits 'tool' events
+    as the agent calls tools, 'token' events with pieces of the answer as the
+    model generates them, and a final 'done' event with the full response.
+    """
+    data = request.get_json()
+    user_message = data.get('message', '')
+
+    logging.info(f"Received streaming user message: {user_message}")
+    
+    if not user_message:
+        return jsonify({'error': 'Message is required'}), 400
+    
+    session = session_store.get(get_session_id(data))
+    
+    def generate():
+        try:
+            # One turn at a time per session; other sessions are unaffected
+            with session.lock:
+                for event in session.agent.stream(input=user_message):
+                    if event['type'] == 'done':
+                        timestamp = datetime.now().isoformat()
+                        # Add to conversation history
+                        session.add_turn(user_message, event['answer'], timestamp)
+                        event = {
+                            'type': 'done',
+                            'response': event['answer'],
+                            'timestamp': timestamp,
+                            'session_id': session.session_id
+                        }
+                    yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            print(f"Error in chat stream: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'error': 'Internal server error'})}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'X-Session-ID': session.session_id}
+    )
+
 @app.route('/history', methods=['GET'])
 def get_history():
-    return jsonify({'history': conversation_history})
+    session = session_store.peek(get_session_id())
+    return jsonify({'history': session.get_history() if session else []})
 
 @app.route('/history', methods=['DELETE'])
 def clear_history():
-    global conversation_history
-    conversation_history = []
+    session = session_store.peek(get_session_id())
+    if session:
+        with session.lock:
+            session.clear()
     return jsonify({'message': 'History cleared successfully'})
 
 @app.route('/documents', methods=['POST'])
@@ -96,7 +167,7 @@ def upload_document():
             return jsonify({'error': 'Content is required'}), 400
         
         # Save document
-        documents_dir = os.path.join(os.path.dirname(__file__), '..', 'documents')
+        documents_dir = DOCUMENTS_DIR
         os.makedirs(documents_dir, exist_ok=True)
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -106,8 +177,8 @@ def upload_document():
         with open(filepath, 'w', encoding='utf-8') as f:
             f.write(content)
         
-        # Reinitialize vector store to include new document
-        initialize_vectorstore()
+        # Index the new document in the background; searches keep using the current index meanwhile
+        document_changed(filepath)
         
         return jsonify({
             'message': 'Document uploaded successfully',
@@ -118,35 +189,24 @@ def upload_document():
         print(f"Error uploading document: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def travel_plan_summaries():
+    plans = []
+    for entry in catalog.list('travel_plans', '.txt'):
+        plans.append({
+            'filename': entry.filename,
+            'destination': entry.meta['destination'],
+            'created': entry.meta['created']
+        })
+    
+    # Sort by creation time (newest first)
+    plans.sort(key=lambda x: x['created'], reverse=True)
+    return plans
+
 @app.route('/travel-plans', methods=['GET'])
 def get_travel_plans():
     """Get list of all travel plan files"""
     try:
-        travel_plans_dir = os.path.join(os.path.dirname(__file__), '..', 'documents/travel_plans')
-        
-        if not os.path.exists(travel_plans_dir):
-            return jsonify({'plans': []})
-        
-        plans = []
-        for filename in os.listdir(travel_plans_dir):
-            if filename.endswith('.txt') and filename != '.gitkeep':
-                filepath = os.path.join(travel_plans_dir, filename)
-                # Extract destination from filename (before the timestamp)
-                destination = filename.split('_')[0].title()
-                # Get file modification time
-                mod_time = os.path.getmtime(filepath)
-                created = datetime.fromtimestamp(mod_time).isoformat()
-                
-                plans.append({
-                    'filename': filename,
-                    'destination': destination,
-                    'created': created
-                })
-        
-        # Sort by creation time (newest first)
-        plans.sort(key=lambda x: x['created'], reverse=True)
-        
-        return jsonify({'plans': plans})
+        return jsonify({'plans': travel_plan_summaries()})
     
     except Exception as e:
         print(f"Error getting travel plans: {str(e)}")
@@ -156,23 +216,28 @@ def get_travel_plans():
 def get_travel_plan(filename):
     """Get content of a specific travel plan"""
     try:
-        travel_plans_dir = os.path.join(os.path.dirname(__file__), '..', 'documents/travel_plans')
+        travel_plans_dir = TRAVEL_PLANS_DIR
         filepath = os.path.join(travel_plans_dir, filename)
         
-        if not os.path.exists(filepath):
+        try:
+            stat = os.stat(filepath)
+        except OSError:
             return jsonify({'error': 'Travel plan not found'}), 404
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Extract destination from filename
-        destination = filename.split('_')[0].title()
+        def build():
+            with open(filepath, 'r', encoding='utf-8') as f:
+                content = f.read()
+            
+            # Extract destination from filename
+            destination = filename.split('_')[0].title()
+            
+            return jsonify({
+                'filename': filename,
+                'destination': destination,
+                'content': content
+            })
         
-        return jsonify({
-            'filename': filename,
-            'destination': destination,
-            'content': content
-        })
+        return conditional_response(file_etag(stat.st_mtime, stat.st_size), stat.st_mtime, build)
     
     except Exception as e:
         print(f"Error getting travel plan: {str(e)}")
@@ -182,13 +247,14 @@ def get_travel_plan(filename):
 def delete_travel_plan(filename):
     """Delete a specific travel plan"""
     try:
-        travel_plans_dir = os.path.join(os.path.dirname(__file__), '..', 'documents/travel_plans')
+        travel_plans_dir = TRAVEL_PLANS_DIR
         filepath = os.path.join(travel_plans_dir, filename)
         
         if not os.path.exists(filepath):
             return jsonify({'error': 'Travel plan not found'}), 404
         
         os.remove(filepath)
+        document_changed(filepath)
         return jsonify({'message': 'Travel plan deleted successfully'})
     
     except Exception as e:
@@ -199,34 +265,8 @@ def delete_travel_plan(filename):
 def get_todo_lists():
     """Get list of all todo lists"""
     try:
-        todo_lists_dir = os.path.join(os.path.dirname(__file__), '..', 'documents/todo_lists')
-        
-        if not os.path.exists(todo_lists_dir):
-            return jsonify({'lists': []})
-        
-        lists = []
-        for filename in os.listdir(todo_lists_dir):
-            if filename.endswith('.json') and filename != '.gitkeep':
-                filepath = os.path.join(todo_lists_dir, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        todo_data = json.load(f)
-                    
-                    lists.append({
-                        'filename': filename,
-                        'title': todo_data.get('title', filename.split('_')[0].title()),
-                        'created': todo_data.get('created', ''),
-                        'updated': todo_data.get('updated', ''),
-                        'item_count': len(todo_data.get('items', [])),
-                        'completed_count': len([item for item in todo_data.get('items', []) if item.get('completed', False)])
-                    })
-                except:
-                    continue
-        
-        # Sort by creation time (newest first)
-        lists.sort(key=lambda x: x['created'], reverse=True)
-        
-        return jsonify({'lists': lists})
+        # Newest first
+        return jsonify({'lists': list_store.list('todo_lists')})
     
     except Exception as e:
         print(f"Error getting todo lists: {str(e)}")
@@ -236,22 +276,24 @@ def get_todo_lists():
 def get_todo_list(filename):
     """Get content of a specific todo list"""
     try:
-        todo_lists_dir = os.path.join(os.path.dirname(__file__), '..', 'documents/todo_lists')
-        filepath = os.path.join(todo_lists_dir, filename)
-        
-        if not os.path.exists(filepath):
+        stat = list_store.stat('todo_lists', filename)
+        if stat is None:
             return jsonify({'error': 'Todo list not found'}), 404
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            todo_data = json.load(f)
-        
-        return jsonify({
-            'filename': filename,
-            'title': todo_data.get('title', ''),
-            'created': todo_data.get('created', ''),
-            'updated': todo_data.get('updated', ''),
-            'items': todo_data.get('items', [])
-        })
+        def build():
+            todo_data = list_store.get('todo_lists', filename)
+            if todo_data is None:
+                return jsonify({'error': 'Todo list not found'}), 404
+            
+            return jsonify({
+                'filename': filename,
+                'title': todo_data.get('title', ''),
+                'created': todo_data.get('created', ''),
+                'updated': todo_data.get('updated', ''),
+                'items': todo_data.get('items', [])
+            })
+        
+        return conditional_response(stat[0], stat[1], build)
     
     except Exception as e:
         print(f"Error getting todo list: {str(e)}")
@@ -274,17 +316,32 @@ def update_todo_list_endpoint(filename):
         print(f"Error updating todo list: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/todo-lists/<filename>', methods=['PATCH'])
+def patch_todo_list(filename):
+    """Apply a batch of item operations to a todo list, returning only the changed items"""
+    try:
+        data = request.get_json(silent=True) or {}
+        operations = data.get('operations')
+        if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+            return jsonify({'error': 'operations must be a list of objects'}), 400
+        
+        result = list_store.apply_operations('todo_lists', filename, operations)
+        if result is None:
+            return jsonify({'error': 'Todo list not found'}), 404
+        return jsonify({'filename': filename, **result})
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error patching todo list: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/todo-lists/<filename>', methods=['DELETE'])
 def delete_todo_list(filename):
     """Delete a specific todo list"""
     try:
-        todo_lists_dir = os.path.join(os.path.dirname(__file__), '..', 'documents/todo_lists')
-        filepath = os.path.join(todo_lists_dir, filename)
-        
-        if not os.path.exists(filepath):
+        if not list_store.delete('todo_lists', filename):
             return jsonify({'error': 'Todo list not found'}), 404
-        
-        os.remove(filepath)
         return jsonify({'message': 'Todo list deleted successfully'})
     
     except Exception as e:
@@ -295,37 +352,8 @@ def delete_todo_list(filename):
 def get_budgets():
     """Get list of all budgets"""
     try:
-        budgets_dir = os.path.join(os.path.dirname(__file__), '..', 'documents/budgets')
-        
-        if not os.path.exists(budgets_dir):
-            return jsonify({'documents/budgets': []})
-        
-        budgets = []
-        for filename in os.listdir(budgets_dir):
-            if filename.endswith('.json') and filename != '.gitkeep':
-                filepath = os.path.join(budgets_dir, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        budget_data = json.load(f)
-                    
-                    # Calculate total amount
-                    total_amount = sum(item.get('amount', 0) for item in budget_data.get('items', []))
-                    
-                    budgets.append({
-                        'filename': filename,
-                        'title': budget_data.get('title', filename.split('_')[0].title()),
-                        'created': budget_data.get('created', ''),
-                        'updated': budget_data.get('updated', ''),
-                        'item_count': len(budget_data.get('items', [])),
-                        'total_amount': total_amount
-                    })
-                except:
-                    continue
-        
-        # Sort by creation time (newest first)
-        budgets.sort(key=lambda x: x['created'], reverse=True)
-        
-        return jsonify({'documents/budgets': budgets})
+        # Newest first
+        return jsonify({'documents/budgets': list_store.list('budgets')})
     
     except Exception as e:
         print(f"Error getting budgets: {str(e)}")
@@ -335,22 +363,24 @@ def get_budgets():
 def get_budget(filename):
     """Get content of a specific budget"""
     try:
-        budgets_dir = os.path.join(os.path.dirname(__file__), '..', 'documents/budgets')
-        filepath = os.path.join(budgets_dir, filename)
-        
-        if not os.path.exists(filepath):
+        stat = list_store.stat('budgets', filename)
+        if stat is None:
             return jsonify({'error': 'Budget not found'}), 404
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            budget_data = json.load(f)
-        
-        return jsonify({
-            'filename': filename,
-            'title': budget_data.get('title', ''),
-            'created': budget_data.get('created', ''),
-            'updated': budget_data.get('updated', ''),
-            'items': budget_data.get('items', [])
-        })
+        def build():
+            budget_data = list_store.get('budgets', filename)
+            if budget_data is None:
+                return jsonify({'error': 'Budget not found'}), 404
+            
+            return jsonify({
+                'filename': filename,
+                'title': budget_data.get('title', ''),
+                'created': budget_data.get('created', ''),
+                'updated': budget_data.get('updated', ''),
+                'items': budget_data.get('items', [])
+            })
+        
+        return conditional_response(stat[0], stat[1], build)
     
     except Exception as e:
         print(f"Error getting budget: {str(e)}")
@@ -373,23 +403,70 @@ def update_budget_endpoint(filename):
         print(f"Error updating budget: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/budgets/<filename>', methods=['PATCH'])
+def patch_budget(filename):
+    """Apply a batch of item operations to a budget, returning only the changed items"""
+    try:
+        data = request.get_json(silent=True) or {}
+        operations = data.get('operations')
+        if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+            return jsonify({'error': 'operations must be a list of objects'}), 400
+        
+        result = list_store.apply_operations('budgets', filename, operations)
+        if result is None:
+            return jsonify({'error': 'Budget not found'}), 404
+        return jsonify({'filename': filename, **result})
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error patching budget: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/budgets/<filename>', methods=['DELETE'])
 def delete_budget(filename):
     """Delete a specific budget"""
     try:
-        budgets_dir = os.path.join(os.path.dirname(__file__), '..', 'documents/budgets')
-        filepath = os.path.join(budgets_dir, filename)
-        
-        if not os.path.exists(filepath):
+        if not list_store.delete('budgets', filename):
             return jsonify({'error': 'Budget not found'}), 404
-        
-        os.remove(filepath)
         return jsonify({'message': 'Budget deleted successfully'})
     
     except Exception as e:
         print(f"Error deleting budget: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+# Serialized overview and the ETag it was built for; rebuilt only when a document or list changes
+_overview_cache = {'etag': None, 'body': None}
+_overview_lock = threading.Lock()
+# Distinguishes ETags across restarts, when the version counters start again from zero
+_instance_id = uuid.uuid4().hex[:8]
+
+@app.route('/documents/overview', methods=['GET'])
+def documents_overview():
+    """Travel plans, todo lists and budgets with their counts and totals in one response"""
+    try:
+        # Both versions are in-memory counters, so an unchanged panel costs a 304 without reading any document
+        etag = f"{_instance_id}-{catalog.current_version()}-{list_store.version}"
+        
+        def build():
+            with _overview_lock:
+                body = _overview_cache['body'] if _overview_cache['etag'] == etag else None
+            if body is None:
+                body = json.dumps({
+                    'plans': travel_plan_summaries(),
+                    'lists': list_store.list('todo_lists'),
+                    'budgets': list_store.list('budgets'),
+                })
+                with _overview_lock:
+                    _overview_cache.update(etag=etag, body=body)
+            return Response(body, mimetype='application/json')
+        
+        return conditional_response(etag, None, build)
+    
+    except Exception as e:
+        print(f"Error getting documents overview: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/documents/list', methods=['GET'])
 def list_all_documents():
     """List all documents with their metadata"""
@@ -421,14 +498,20 @@ def search_documents():
         if not keyword:
             return jsonify({'error': 'Keyword is required'}), 400
         
-        from middleware import create_middleware_stack
-        middleware = create_middleware_stack()
+        from middleware import search_filters
+        try:
+            filters = search_filters(data.get('document_type'), data.get('destination'), data.get('filename'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        context = middleware['document'].get_relevant_context(keyword)
+        results = keyword_index.search(keyword, max_results, filters)
+        # Kept in the "[From filename]: text" form it had before results existed, for existing callers
+        context = "\n\n".join(f"[From {result['filename']}]: {result['snippet']}" for result in results)
         
         return jsonify({
             'keyword': keyword,
-            'context': context,
+            'results': results,
+            'context': context or "No relevant documents found.",
             'message': f'Search completed for: {keyword}'
         })
     
@@ -441,18 +524,25 @@ def read_document(filename):
     """Read a specific document by filename"""
     try:
         from middleware import create_middleware_stack
-        middleware = create_middleware_stack()
-        
-        content = middleware['document'].read_specific_document(filename)
         
-        if content is None:
+        entry = catalog.get(filename)
+        if entry is None:
             return jsonify({'error': 'Document not found'}), 404
         
-        return jsonify({
-            'filename': filename,
-            'content': content,
-            'message': f'Document read successfully: {filename}'
-        })
+        def build():
+            middleware = create_middleware_stack()
+            content = middleware['document'].read_specific_document(filename)
+            
+            if content is None:
+                return jsonify({'error': 'Document not found'}), 404
+            
+            return jsonify({
+                'filename': filename,
+                'content': content,
+                'message': f'Document read successfully: {filename}'
+            })
+        
+        return conditional_response(file_etag(entry.mtime, entry.size), entry.mtime, build)
     
     except Exception as e:
         print(f"Error reading document: {str(e)}")
@@ -460,9 +550,19 @@ def read_document(filename):
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy'})
+    return jsonify({
+        'status': 'healthy',
+        'embedding_cache': embeddings.stats(),
+        'sessions': session_store.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage latencies, tool timings, LLM usage and cache counters in the Prometheus text format"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
-    # Initialize vector store on startup
-    initialize_vectorstore()
+    # Open the persisted index on startup and sync it with the documents in the background
+    retrieval_service.start()
+    threading.Thread(target=keyword_index.build, daemon=True).start()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,6 @@
+"""
+Performance benchmarks for the travel assistant backend.
+
+Run from the backend directory, e.g. `python -m benchmarks.run` for the
+full offline load benchmark or `python -m benchmarks.agent_setup`.
+"""
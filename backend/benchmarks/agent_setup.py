@@ -0,0 +1,53 @@
+"""
+Microbenchmark for the per-turn cost of setting up the agent.
+
+Compares rebuilding the runnable and tool map on every turn (as
+CustomAgentExecutor.invoke used to) against the pipeline and registry
+compiled once at import. No LLM calls are made.
+
+    python -m benchmarks.agent_setup [--iterations 500]
+"""
+import argparse
+import os
+import timeit
+
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+import chat_model  # noqa: E402
+
+
+def per_turn_setup():
+    """What every turn used to pay before the first LLM call"""
+    agent = (
+        {
+            "input": lambda x: x["input"],
+            "context": lambda x: x["context"],
+            "conversation_context": lambda x: x["conversation_context"],
+            "document_summary": lambda x: x["document_summary"],
+            "chat_history": lambda x: x["chat_history"],
+            "agent_scratchpad": lambda x: x.get("agent_scratchpad", [])
+        }
+        | chat_model.get_agent_prompt()
+        | chat_model.llm.bind_tools(chat_model.tools, tool_choice="any")
+    )
+    tool_map = {tool.name: tool.func for tool in chat_model.tools}
+    return agent, tool_map.get("final_answer_tool")
+
+
+def shared_setup():
+    """What a turn pays now: look up the compiled pipeline and registry"""
+    return chat_model.agent_pipeline, chat_model.TOOL_REGISTRY.get("final_answer_tool")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    for name, func in (("per-turn rebuild", per_turn_setup), ("shared pipeline", shared_setup)):
+        seconds = min(timeit.repeat(func, number=args.iterations, repeat=3))
+        print(f"{name:>18}: {seconds / args.iterations * 1e6:10.1f} us/turn")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Synthetic document corpora for benchmarking: travel plans, budgets and todo
+lists in the same formats the app writes them.
+
+    python -m benchmarks.corpus --count 1000 --output /tmp/corpus
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Dict
+
+DESTINATIONS = [
+    "thailand", "vietnam", "cambodia", "japan", "new_zealand", "peru", "iceland", "morocco",
+    "portugal", "italy", "greece", "mexico", "canada", "kenya", "australia", "norway",
+    "chile", "india", "indonesia", "scotland", "croatia", "turkey", "egypt", "argentina",
+]
+ACTIVITIES = [
+    "hike to the old temple", "take a cooking class", "visit the night market", "go snorkelling",
+    "tour the national museum", "ride the coastal train", "see the waterfalls", "kayak along the river",
+    "explore the old town", "watch the sunset from the viewpoint", "try the street food", "visit the vineyards",
+]
+TIPS = [
+    "The dry season is the best time to visit.", "Check visa requirements before booking.",
+    "Buses are cheap but slow; domestic flights save time.", "Carry cash for rural areas.",
+    "Book popular tours a few weeks ahead.", "Pack layers, evenings get cold.",
+    "Travel insurance is strongly recommended.", "Local SIM cards are inexpensive at the airport.",
+]
+TODO_ITEMS = [
+    "renew passport", "book flights", "reserve first hotel", "buy travel insurance", "get vaccinations",
+    "exchange currency", "download offline maps", "pack adapters", "arrange airport transfer",
+    "book day tours", "check baggage allowance", "share itinerary with family",
+]
+BUDGET_ITEMS = [
+    ("Flight", 300, 1500), ("Accommodation", 200, 2000), ("Food", 100, 800), ("Transport", 50, 500),
+    ("Activities", 50, 600), ("Insurance", 40, 200), ("Visa", 0, 150), ("Souvenirs", 20, 300),
+]
+
+# Share of each document type in a generated corpus
+DEFAULT_MIX = {'travel_plans': 0.4, 'budgets': 0.3, 'todo_lists': 0.3}
+
+
+def _travel_plan(rng: random.Random, destination: str, created: datetime) -> str:
+    name = destination.replace('_', ' ').title()
+    days = rng.randint(3, 14)
+    lines = [
+        f"Travel Plan for {name}",
+        f"Created: {created.strftime('%Y-%m-%d %H:%M:%S')}",
+        "=" * 50,
+        "",
+        f"A {days} day trip to {name}. {rng.choice(TIPS)}",
+        "",
+    ]
+    for day in range(1, days + 1):
+        lines.append(f"Day {day}: {rng.choice(ACTIVITIES).capitalize()} and {rng.choice(ACTIVITIES)}.")
+    lines.extend(["", "Tips: " + " ".join(rng.sample(TIPS, 3))])
+    return "\n".join(lines)
+
+
+def _budget(rng: random.Random, destination: str, created: datetime) -> dict:
+    items = []
+    for index, (name, low, high) in enumerate(rng.sample(BUDGET_ITEMS, rng.randint(1, len(BUDGET_ITEMS)))):
+        items.append({
+            "id": index + 1,
+            "name": name,
+            "amount": float(rng.randint(low, high)),
+            "created": created.isoformat(),
+        })
+    return {
+        "title": destination.replace('_', ' ').title(),
+        "created": created.isoformat(),
+        "updated": created.isoformat(),
+        "items": items,
+    }
+
+
+def _todo_list(rng: random.Random, destination: str, created: datetime) -> dict:
+    items = []
+    for index, text in enumerate(rng.sample(TODO_ITEMS, rng.randint(1, len(TODO_ITEMS)))):
+        items.append({
+            "id": index + 1,
+            "text": text,
+            "completed": rng.random() < 0.3,
+            "created": created.isoformat(),
+        })
+    return {
+        "title": f"{destination.replace('_', ' ').title()} prep",
+        "created": created.isoformat(),
+        "updated": created.isoformat(),
+        "items": items,
+    }
+
+
+def generate(output_dir: str, count: int, seed: int = 0, mix: Dict[str, float] = None) -> Dict[str, int]:
+    """Write count documents under output_dir and return how many of each type"""
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    counts = {doc_type: 0 for doc_type in mix}
+    for doc_type in mix:
+        os.makedirs(os.path.join(output_dir, doc_type), exist_ok=True)
+
+    doc_types = list(mix)
+    weights = [mix[doc_type] for doc_type in doc_types]
+    for index in range(count):
+        doc_type = rng.choices(doc_types, weights)[0]
+        destination = rng.choice(DESTINATIONS)
+        created = start + timedelta(minutes=index * 7)
+        # The index suffix keeps filenames unique at any corpus size
+        stem = f"{destination}_{created.strftime('%Y%m%d_%H%M%S')}_{index:06d}"
+        if doc_type == 'travel_plans':
+            path = os.path.join(output_dir, doc_type, stem + '.txt')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(_travel_plan(rng, destination, created))
+        else:
+            data = _budget(rng, destination, created) if doc_type == 'budgets' else _todo_list(rng, destination, created)
+            path = os.path.join(output_dir, doc_type, stem + '.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+        mtime = created.timestamp()
+        os.utime(path, (mtime, mtime))
+        counts[doc_type] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic document corpus")
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    counts = generate(args.output, args.count, args.seed)
+    print(f"Wrote {args.count} documents to {args.output}: {counts}")
+
+
+if __name__ == '__main__':
+    main()
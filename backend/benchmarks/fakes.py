@@ -0,0 +1,142 @@
+"""
+Deterministic local stand-ins for the OpenAI chat model and embeddings, with
+configurable latency, so the pipeline can be benchmarked offline.
+"""
+import hashlib
+import math
+import re
+import time
+from typing import Any, List, Optional
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hashed bag-of-words vectors: texts sharing words get similar vectors, so
+    similarity search behaves plausibly without a model. Each call sleeps
+    latency seconds plus per_text_latency for every text embedded.
+    """
+
+    model = "fake-embeddings"
+
+    def __init__(self, size: int = 256, latency: float = 0.0, per_text_latency: float = 0.0):
+        self.size = size
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._sleep(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._sleep(1)
+        return self._vector(text)
+
+    def _sleep(self, count: int):
+        delay = self.latency + self.per_text_latency * count
+        if delay:
+            time.sleep(delay)
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.size
+        for word in _WORD.findall(text.lower()):
+            digest = hashlib.md5(word.encode('utf-8')).digest()
+            index = int.from_bytes(digest[:4], 'little') % self.size
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Scripted agent model. With tools bound and tool_choice "auto", the first
+    step of a turn calls a read-only document tool when the user's message
+    asks about their documents and the answer follows as plain content;
+    general questions are answered straight away. With "any" every step must
+    call a tool, so the first step always picks a document tool (a search for
+    general questions) and the answer goes through final_answer_tool.
+    Without tools (e.g. summarization) it replies with a short text. Every
+    call sleeps latency seconds.
+    """
+
+    latency: float = 0.0
+    tools_bound: bool = False
+    tool_choice: str = "auto"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "FakeChatModel":
+        return self.__class__(latency=self.latency, tools_bound=True, tool_choice=kwargs.get("tool_choice", "auto"))
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    def _respond(self, messages) -> AIMessage:
+        last_human = 0
+        for index, message in enumerate(messages):
+            if isinstance(message, HumanMessage):
+                last_human = index
+        query = str(messages[last_human].content) if messages else ""
+
+        if not self.tools_bound:
+            return AIMessage(content=" ".join(query.split()[:60]))
+
+        step = sum(1 for message in messages[last_human:] if isinstance(message, ToolMessage))
+        tool = None
+        if step == 0:
+            tool = self._pick_tool(query)
+            if tool is None and self.tool_choice != "auto":
+                tool = "search_documents_by_keyword", {"keyword": query[:100], "max_results": 5}
+        if tool is not None:
+            name, args = tool
+        else:
+            answer = f"Here is what I found for: {query[:200]}" if step else f"Some advice on: {query[:200]}"
+            if self.tool_choice == "auto":
+                return AIMessage(content=answer)
+            name, args = "final_answer_tool", {
+                "answer": answer,
+                "tools_used": [call["name"] for message in messages[last_human:]
+                               if isinstance(message, AIMessage) for call in message.tool_calls],
+            }
+        call_id = "call_" + hashlib.md5(f"{query}:{step}".encode('utf-8')).hexdigest()[:12]
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}])
+
+    @staticmethod
+    def _pick_tool(query: str):
+        """The document tool a message calls for, or None for general advice"""
+        lowered = query.lower()
+        if "statistic" in lowered or "how many" in lowered:
+            return "get_document_statistics", {}
+        if "list" in lowered or "what documents" in lowered:
+            return "list_available_documents", {}
+        if any(word in lowered for word in ("search", "my ", "budget", "todo")):
+            return "search_documents_by_keyword", {"keyword": query[:100], "max_results": 5}
+        return None
+
+
+def install(chat_latency: float = 0.0, embedding_latency: float = 0.0, per_text_latency: float = 0.0,
+            tool_choice: str = "auto"):
+    """
+    Swap the app's chat model and embeddings for the fakes. Call after the
+    backend modules are imported and before any executor is created.
+    """
+    import chat_model
+    import documents
+
+    fake_llm = FakeChatModel(latency=chat_latency)
+    chat_model.llm = fake_llm
+    chat_model.agent_pipeline = chat_model.build_agent_pipeline(fake_llm, tool_choice=tool_choice)
+
+    fake_embeddings = FakeEmbeddings(latency=embedding_latency, per_text_latency=per_text_latency)
+    documents.embeddings.embeddings = fake_embeddings
+    documents.embeddings.model = fake_embeddings.model
+    return fake_llm, fake_embeddings
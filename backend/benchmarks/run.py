@@ -0,0 +1,386 @@
+"""
+Offline load benchmark for the chat pipeline and document endpoints.
+
+Generates a synthetic corpus in a temporary directory, swaps the OpenAI chat
+model and embeddings for local fakes with configurable latency, indexes the
+corpus and drives the Flask app through its test client. Reports latency
+percentiles, throughput and time spent per pipeline stage for each scenario,
+and can save the results as a baseline or compare against one.
+
+    python -m benchmarks.run --docs 1000 --requests 200 --concurrency 8
+    python -m benchmarks.run --save baseline.json
+    python -m benchmarks.run --compare baseline.json
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+SCENARIOS = ('chat', 'search', 'crud')
+CHAT_MESSAGES = [
+    "What should I pack for {destination}?",
+    "Search my documents for {destination}",
+    "How much have I budgeted for {destination}?",
+    "List my documents",
+    "What's on my todo list for {destination}?",
+    "How many documents do I have? Give me statistics",
+    "Suggest things to do in {destination}",
+]
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def _latency_summary(seconds: List[float]) -> dict:
+    values = sorted(seconds)
+    return {
+        'p50': _percentile(values, 50) * 1000,
+        'p95': _percentile(values, 95) * 1000,
+        'p99': _percentile(values, 99) * 1000,
+        'mean': sum(values) / len(values) * 1000 if values else 0.0,
+        'max': values[-1] * 1000 if values else 0.0,
+    }
+
+
+class StageTimer:
+    """Records wall time spent in named pipeline stages by wrapping methods in place"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[float]] = {}
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+
+    def wrap(self, owner, attribute: str, stage: str):
+        original = getattr(owner, attribute)
+        timer = self
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                timer.record(stage, time.perf_counter() - start)
+
+        setattr(owner, attribute, timed)
+
+    def wrap_generator(self, owner, attribute: str, stage: str):
+        """Like wrap, for generator methods consumed with `yield from`"""
+        original = getattr(owner, attribute)
+        timer = self
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return (yield from original(*args, **kwargs))
+            finally:
+                timer.record(stage, time.perf_counter() - start)
+
+        setattr(owner, attribute, timed)
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = dict(self._samples)
+        result = {}
+        for stage, seconds in sorted(samples.items()):
+            values = sorted(seconds)
+            result[stage] = {
+                'count': len(values),
+                'total_ms': sum(values) * 1000,
+                'mean_ms': sum(values) / len(values) * 1000,
+                'p95_ms': _percentile(values, 95) * 1000,
+            }
+        return result
+
+
+def instrument(timer: StageTimer):
+    """Wrap the pipeline stages the breakdown reports on"""
+    from chat_model import CustomAgentExecutor
+    from documents import RetrievalService
+    from keyword_index import KeywordIndex
+    from middleware import DocumentMiddleware, QueryEnhancementMiddleware
+    from prompt_budget import PromptAssembler
+
+    timer.wrap(RetrievalService, 'rebuild', 'indexing')
+    timer.wrap(QueryEnhancementMiddleware, 'enhance_query', 'context_assembly')
+    timer.wrap(DocumentMiddleware, 'get_relevant_context', 'retrieval')
+    timer.wrap(KeywordIndex, 'search', 'keyword_search')
+    timer.wrap(DocumentMiddleware, 'get_document_summary', 'summary')
+    timer.wrap_generator(CustomAgentExecutor, '_stream_step', 'agent_step')
+    timer.wrap(CustomAgentExecutor, '_run_tool', 'tool')
+    timer.wrap(PromptAssembler, '_summarize', 'history_summarization')
+
+
+class Workload:
+    """Builds the requests for each scenario from the generated corpus"""
+
+    def __init__(self, documents_dir: str, sessions: int, seed: int):
+        from benchmarks.corpus import DESTINATIONS
+        self.destinations = DESTINATIONS
+        self.sessions = sessions
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.todo_files = sorted(os.listdir(os.path.join(documents_dir, 'todo_lists')))
+        self.plan_files = sorted(os.listdir(os.path.join(documents_dir, 'travel_plans')))
+        self.budget_files = sorted(os.listdir(os.path.join(documents_dir, 'budgets')))
+        self.upload_counter = itertools.count()
+
+    def _choice(self, values):
+        with self.rng_lock:
+            return self.rng.choice(values)
+
+    def chat(self, client, index: int):
+        message = self._choice(CHAT_MESSAGES).format(destination=self._choice(self.destinations).replace('_', ' '))
+        response = client.post(
+            '/chat', json={'message': message},
+            headers={'X-Session-ID': f"bench-{index % self.sessions}"}
+        )
+        return 'POST /chat', response
+
+    def search(self, client, index: int):
+        keyword = f"{self._choice(self.destinations).replace('_', ' ')} {self._choice(['budget', 'itinerary', 'todo', 'flights'])}"
+        return 'POST /documents/search', client.post('/documents/search', json={'keyword': keyword})
+
+    def crud(self, client, index: int):
+        operation = index % 8
+        if operation == 0:
+            return 'GET /travel-plans', client.get('/travel-plans')
+        if operation == 1:
+            return 'GET /todo-lists', client.get('/todo-lists')
+        if operation == 2:
+            return 'GET /budgets', client.get('/budgets')
+        if operation == 3 and self.todo_files:
+            return 'GET /todo-lists/<file>', client.get(f"/todo-lists/{self._choice(self.todo_files)}")
+        if operation == 4 and self.todo_files:
+            return 'PATCH /todo-lists/<file>', client.patch(
+                f"/todo-lists/{self._choice(self.todo_files)}",
+                json={'operations': [{'op': 'toggle', 'id': 1}]}
+            )
+        if operation == 5 and self.budget_files:
+            return 'GET /budgets/<file>', client.get(f"/budgets/{self._choice(self.budget_files)}")
+        if operation == 6:
+            number = next(self.upload_counter)
+            return 'POST /documents', client.post('/documents', json={
+                'title': f"benchmark note {number}",
+                'content': f"Notes for {self._choice(self.destinations)}: remember to {self._choice(['book', 'pack', 'check'])} early."
+            })
+        if self.plan_files:
+            return 'GET /documents/read/<file>', client.get(f"/documents/read/{self._choice(self.plan_files)}")
+        return 'GET /documents/list', client.get('/documents/list')
+
+
+def run_scenario(app, request: Callable, requests: int, concurrency: int) -> dict:
+    """Issue requests from concurrency worker threads and summarise their latencies"""
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def one(index: int):
+        client = app.test_client()
+        start = time.perf_counter()
+        operation, response = request(client, index)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.setdefault(operation, []).append(elapsed)
+            if response.status_code >= 400:
+                errors[operation] = errors.get(operation, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        'requests': requests,
+        'errors': sum(errors.values()),
+        'seconds': wall,
+        'throughput': requests / wall if wall else 0.0,
+        'latency_ms': _latency_summary(all_latencies),
+        'operations': {
+            operation: {'count': len(values), 'errors': errors.get(operation, 0), **_latency_summary(values)}
+            for operation, values in sorted(latencies.items())
+        },
+    }
+
+
+def print_report(results: dict):
+    setup = results['setup']
+    print(f"\nCorpus: {setup['documents']} documents {setup['counts']}, "
+          f"generated in {setup['corpus_seconds']:.2f}s, indexed in {setup['indexing_seconds']:.2f}s")
+    for name, scenario in results['scenarios'].items():
+        latency = scenario['latency_ms']
+        print(f"\n== {name}: {scenario['requests']} requests, {scenario['errors']} errors, "
+              f"{scenario['throughput']:.1f} req/s")
+        print(f"   latency ms  p50 {latency['p50']:8.1f}  p95 {latency['p95']:8.1f}  "
+              f"p99 {latency['p99']:8.1f}  max {latency['max']:8.1f}")
+        if 'llm_calls_per_turn' in scenario:
+            print(f"   LLM calls per turn {scenario['llm_calls_per_turn']:.2f}")
+        for operation, stats in scenario['operations'].items():
+            print(f"   {operation:<28} n={stats['count']:<5} p50 {stats['p50']:8.1f}  p95 {stats['p95']:8.1f}  "
+                  f"p99 {stats['p99']:8.1f}  errors {stats['errors']}")
+        if scenario['stages']:
+            print("   stages:")
+            for stage, stats in scenario['stages'].items():
+                print(f"     {stage:<24} n={stats['count']:<6} mean {stats['mean_ms']:8.2f} ms  "
+                      f"p95 {stats['p95_ms']:8.2f} ms  total {stats['total_ms']:10.1f} ms")
+
+
+def _change(current: float, baseline: float) -> str:
+    if not baseline:
+        return "    n/a"
+    return f"{(current - baseline) / baseline * 100:+6.1f}%"
+
+
+def print_comparison(results: dict, baseline: dict):
+    print("\nCompared with baseline (latency: lower is better, throughput: higher is better)")
+    for name, scenario in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        print(f"== {name}")
+        for key in ('p50', 'p95', 'p99'):
+            current, before = scenario['latency_ms'][key], previous['latency_ms'][key]
+            print(f"   {key:<10} {before:10.1f} -> {current:10.1f} ms  {_change(current, before)}")
+        print(f"   throughput {previous['throughput']:10.1f} -> {scenario['throughput']:10.1f} req/s  "
+              f"{_change(scenario['throughput'], previous['throughput'])}")
+        if 'llm_calls_per_turn' in scenario and 'llm_calls_per_turn' in previous:
+            print(f"   LLM calls  {previous['llm_calls_per_turn']:10.2f} -> {scenario['llm_calls_per_turn']:10.2f} /turn  "
+                  f"{_change(scenario['llm_calls_per_turn'], previous['llm_calls_per_turn'])}")
+        for stage, stats in scenario['stages'].items():
+            before = previous.get('stages', {}).get(stage)
+            if before:
+                print(f"   {stage:<24} mean {before['mean_ms']:8.2f} -> {stats['mean_ms']:8.2f} ms  "
+                      f"{_change(stats['mean_ms'], before['mean_ms'])}")
+
+
+def _settle():
+    """Let delayed list exports and the re-indexing they trigger finish before the corpus is removed"""
+    if 'storage' in sys.modules:
+        flush = getattr(sys.modules['storage'].list_store, 'flush', None)
+        if flush is not None:
+            flush()
+    if 'documents' in sys.modules:
+        sys.modules['documents'].retrieval_service.wait_for_rebuild()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the chat pipeline and document endpoints")
+    parser.add_argument('--docs', type=int, default=1000, help="documents in the synthetic corpus (100 to 100000)")
+    parser.add_argument('--requests', type=int, default=200, help="requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--sessions', type=int, default=50, help="distinct chat sessions")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="comma separated: chat,search,crud")
+    parser.add_argument('--chat-latency', type=float, default=0.05, help="seconds per fake LLM call")
+    parser.add_argument('--embedding-latency', type=float, default=0.005, help="seconds per fake embedding call")
+    parser.add_argument('--per-text-latency', type=float, default=0.0, help="extra seconds per text embedded")
+    parser.add_argument('--tool-choice', choices=['auto', 'any'], default='auto',
+                        help="'any' forces a tool call every step, answering through final_answer_tool")
+    parser.add_argument('--response-cache', action='store_true', help="enable the semantic response cache")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help="where to put the corpus and index (default: a temporary directory)")
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="compare against results saved with --save")
+    parser.add_argument('--verbose', action='store_true', help="show the app's own logging and output")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='travel-assistant-bench-')
+    documents_dir = os.path.join(workdir, 'documents')
+    # Point the app at the benchmark corpus before any backend module is imported
+    os.environ['DOCUMENTS_DIR'] = documents_dir
+    os.environ['VECTORSTORE_DIR'] = os.path.join(workdir, 'vectorstore')
+    os.environ.pop('EMBEDDING_CACHE_PATH', None)
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    os.environ.setdefault('ANONYMIZED_TELEMETRY', 'False')
+    os.environ['RESPONSE_CACHE_ENABLED'] = 'true' if args.response_cache else 'false'
+
+    from benchmarks.corpus import generate
+    from benchmarks.fakes import install
+
+    try:
+        start = time.perf_counter()
+        counts = generate(documents_dir, args.docs, args.seed)
+        corpus_seconds = time.perf_counter() - start
+
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with quiet:
+            from app import app
+            from documents import retrieval_service
+            if not args.verbose:
+                logging.getLogger().setLevel(logging.WARNING)
+            install(args.chat_latency, args.embedding_latency, args.per_text_latency, args.tool_choice)
+
+            timer = StageTimer()
+            instrument(timer)
+            start = time.perf_counter()
+            retrieval_service.rebuild()
+            indexing_seconds = time.perf_counter() - start
+
+            workload = Workload(documents_dir, args.sessions, args.seed)
+            results = {
+                'config': {key: value for key, value in vars(args).items()
+                           if key not in ('save', 'compare', 'workdir', 'verbose')},
+                'setup': {
+                    'documents': args.docs,
+                    'counts': counts,
+                    'corpus_seconds': corpus_seconds,
+                    'indexing_seconds': indexing_seconds,
+                },
+                'scenarios': {},
+            }
+            for name in scenarios:
+                timer.reset()
+                scenario = run_scenario(app, getattr(workload, name), args.requests, args.concurrency)
+                # Include the background re-indexing that the scenario's writes caused
+                retrieval_service.wait_for_rebuild()
+                scenario['stages'] = timer.summary()
+                if name == 'chat':
+                    steps = scenario['stages'].get('agent_step', {}).get('count', 0)
+                    scenario['llm_calls_per_turn'] = steps / args.requests if args.requests else 0.0
+                results['scenarios'][name] = scenario
+    finally:
+        _settle()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_comparison(results, json.load(f))
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
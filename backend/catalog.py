@@ -0,0 +1,264 @@
+"""
+In-memory catalog of the documents directory
+"""
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from document_events import add_listener
+from paths import DOCUMENTS_DIR
+
+DOCUMENT_TYPES = ('travel_plans', 'budgets', 'todo_lists')
+
+
+class CatalogEntry:
+    """A catalogued file with its stat info and the metadata parsed from its header"""
+
+    def __init__(self, filename: str, path: str, doc_type: str, mtime: float, size: int, meta: dict,
+                 rel_path: Optional[str] = None):
+        self.filename = filename
+        self.path = path
+        self.rel_path = rel_path or filename
+        self.doc_type = doc_type
+        self.mtime = mtime
+        self.size = size
+        self.meta = meta
+
+    def to_dict(self) -> dict:
+        return {
+            'filename': self.filename,
+            'type': self.doc_type,
+            'size': self.size,
+            'modified': self.mtime,
+            **self.meta,
+        }
+
+
+def _parse_meta(path: str, doc_type: str, filename: str, mtime: float) -> dict:
+    """Extract the listing metadata for a file"""
+    meta = {}
+    try:
+        if doc_type == 'travel_plans' and filename.endswith('.txt'):
+            # Extract destination from filename (before the timestamp)
+            meta['destination'] = filename.split('_')[0].title()
+            meta['created'] = datetime.fromtimestamp(mtime).isoformat()
+        elif doc_type in ('todo_lists', 'budgets') and filename.endswith('.json'):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            items = data.get('items', [])
+            meta['title'] = data.get('title', filename.split('_')[0].title())
+            meta['created'] = data.get('created', '')
+            meta['updated'] = data.get('updated', '')
+            meta['item_count'] = len(items)
+            if doc_type == 'todo_lists':
+                meta['completed_count'] = len([item for item in items if item.get('completed', False)])
+            else:
+                meta['total_amount'] = sum(item.get('amount', 0) for item in items)
+    except (OSError, ValueError, AttributeError) as e:
+        logging.getLogger(__name__).warning(f"Error reading metadata for {filename}: {e}")
+        meta['unreadable'] = True
+    return meta
+
+
+class DocumentCatalog:
+    """
+    Index of relative path -> path, type, mtime, size and parsed metadata,
+    with a filename index for lookups by name, built once and kept current
+    by document write notifications. Changes made
+    outside the app are picked up by comparing directory mtimes, checked at
+    most once every check_interval seconds, so lookups and listings don't
+    walk or parse the documents tree.
+    """
+
+    def __init__(self, documents_dir: str = DOCUMENTS_DIR, check_interval: float = 1.0):
+        self.documents_dir = os.path.abspath(documents_dir)
+        self.check_interval = check_interval
+        self.logger = logging.getLogger(__name__)
+        # Keyed by path relative to documents_dir, so same-named files in different folders coexist
+        self._entries: Dict[str, CatalogEntry] = {}
+        self._by_filename: Dict[str, Set[str]] = {}
+        self._dir_mtimes: Dict[str, float] = {}
+        self._last_check = 0.0
+        self._lock = threading.RLock()
+        # Increases whenever an entry is added, changed or dropped
+        self.version = 0
+
+    def get(self, filename: str) -> Optional[CatalogEntry]:
+        """
+        Look up a file by relative path or by name, re-reading its metadata if
+        it changed on disk. When several folders hold a file of that name, the
+        one nearest the top of the tree (then first by path) is returned.
+        """
+        self.refresh()
+        with self._lock:
+            entry = self._lookup(filename)
+            if entry is None:
+                return None
+            try:
+                stat = os.stat(entry.path)
+            except OSError:
+                self._remove(entry.rel_path)
+                return None
+            if stat.st_mtime != entry.mtime or stat.st_size != entry.size:
+                entry = self._add(entry.path, stat)
+            return entry
+
+    def current_version(self) -> int:
+        """The version after picking up any changes made on disk"""
+        self.refresh()
+        return self.version
+
+    def list(self, doc_type: str, extension: Optional[str] = None) -> List[CatalogEntry]:
+        """All entries of a type (travel_plans, budgets, todo_lists or other)"""
+        self.refresh()
+        with self._lock:
+            return [
+                entry for entry in self._entries.values()
+                if entry.doc_type == doc_type and (extension is None or entry.filename.endswith(extension))
+            ]
+
+    def entries(self) -> List[CatalogEntry]:
+        """Every catalogued file"""
+        self.refresh()
+        with self._lock:
+            return list(self._entries.values())
+
+    def most_recent(self, doc_type: str, extension: Optional[str] = None) -> Optional[CatalogEntry]:
+        entries = self.list(doc_type, extension)
+        return max(entries, key=lambda entry: entry.mtime) if entries else None
+
+    def recent(self, count: int = 5) -> List[CatalogEntry]:
+        """The most recently modified files across every type"""
+        self.refresh()
+        with self._lock:
+            return heapq.nlargest(count, self._entries.values(), key=lambda entry: entry.mtime)
+
+    def summary(self) -> Dict[str, List[str]]:
+        """Filenames grouped by document type"""
+        self.refresh()
+        summary = {doc_type: [] for doc_type in DOCUMENT_TYPES}
+        summary['other'] = []
+        with self._lock:
+            for entry in self._entries.values():
+                summary[entry.doc_type].append(entry.filename)
+        return summary
+
+    def update(self, path: Optional[str] = None):
+        """
+        Re-catalog a single file after it was written or deleted. Without a
+        path the next lookup rescans every directory.
+        """
+        with self._lock:
+            if path is None:
+                self._dir_mtimes.clear()
+                self._last_check = 0.0
+                return
+            path = os.path.abspath(path)
+            if not path.startswith(self.documents_dir + os.sep):
+                return
+            try:
+                stat = os.stat(path)
+            except OSError:
+                self._remove(os.path.relpath(path, self.documents_dir))
+            else:
+                self._add(path, stat)
+            # The write itself changed the directory mtime; don't rescan because of it
+            directory = os.path.dirname(path)
+            if directory in self._dir_mtimes:
+                try:
+                    self._dir_mtimes[directory] = os.stat(directory).st_mtime
+                except OSError:
+                    self._dir_mtimes.pop(directory, None)
+
+    def refresh(self, force: bool = False):
+        """Rescan any directory whose mtime changed since it was last listed"""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            self._last_check = now
+            os.makedirs(self.documents_dir, exist_ok=True)
+            pending = [self.documents_dir]
+            while pending:
+                directory = pending.pop()
+                try:
+                    mtime = os.stat(directory).st_mtime
+                except OSError:
+                    continue
+                if self._dir_mtimes.get(directory) != mtime:
+                    self._dir_mtimes[directory] = mtime
+                    self._scan_directory(directory)
+                pending.extend(path for path in self._dir_mtimes if os.path.dirname(path) == directory)
+            for directory in [d for d in self._dir_mtimes if not os.path.isdir(d)]:
+                self._forget_directory(directory)
+
+    def _scan_directory(self, directory: str):
+        """List one directory, adding new and changed files and dropping removed ones"""
+        seen = set()
+        try:
+            with os.scandir(directory) as it:
+                for item in it:
+                    if item.name.startswith('.'):
+                        continue
+                    if item.is_dir():
+                        self._dir_mtimes.setdefault(item.path, None)
+                    elif item.is_file():
+                        seen.add(item.path)
+                        stat = item.stat()
+                        entry = self._entries.get(os.path.relpath(item.path, self.documents_dir))
+                        if entry is None or entry.mtime != stat.st_mtime or entry.size != stat.st_size:
+                            self._add(item.path, stat)
+        except OSError as e:
+            self.logger.error(f"Error scanning {directory}: {e}")
+            return
+        for rel_path in [key for key, entry in self._entries.items()
+                         if os.path.dirname(entry.path) == directory and entry.path not in seen]:
+            self._remove(rel_path)
+
+    def _forget_directory(self, directory: str):
+        self._dir_mtimes.pop(directory, None)
+        for rel_path in [key for key, entry in self._entries.items()
+                         if os.path.dirname(entry.path) == directory]:
+            self._remove(rel_path)
+
+    def _lookup(self, filename: str) -> Optional[CatalogEntry]:
+        entry = self._entries.get(os.path.normpath(filename))
+        if entry is not None:
+            return entry
+        rel_paths = self._by_filename.get(filename)
+        if not rel_paths:
+            return None
+        return self._entries[min(rel_paths, key=lambda rel_path: (rel_path.count(os.sep), rel_path))]
+
+    def _add(self, path: str, stat: os.stat_result) -> CatalogEntry:
+        filename = os.path.basename(path)
+        rel_path = os.path.relpath(path, self.documents_dir)
+        top_level = rel_path.split(os.sep)[0]
+        doc_type = top_level if top_level in DOCUMENT_TYPES and top_level != rel_path else 'other'
+        entry = CatalogEntry(
+            filename, path, doc_type, stat.st_mtime, stat.st_size,
+            _parse_meta(path, doc_type, filename, stat.st_mtime), rel_path
+        )
+        self._entries[rel_path] = entry
+        self._by_filename.setdefault(filename, set()).add(rel_path)
+        self.version += 1
+        return entry
+
+    def _remove(self, rel_path: str):
+        entry = self._entries.pop(rel_path, None)
+        if entry is None:
+            return
+        rel_paths = self._by_filename.get(entry.filename)
+        if rel_paths is not None:
+            rel_paths.discard(rel_path)
+            if not rel_paths:
+                del self._by_filename[entry.filename]
+        self.version += 1
+
+
+catalog = DocumentCatalog()
+add_listener(catalog.update)
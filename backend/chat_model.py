@@ -1,5 +1,10 @@
 import os
+import re
 import json
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from tools import create_todo_list_tool, add_todo_item_tool, create_travel_plan_tool, final_answer_tool
@@ -8,7 +13,12 @@ from langchain_core.runnables.base import RunnableSerializable
 from langchain_core.messages import ToolMessage
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from dotenv import load_dotenv
+from prompt_budget import PromptAssembler, count_tokens, message_tokens
+from context_compression import compress_context
+from metrics import span, TOOL_SECONDS, TOOL_ERRORS, TURN_SECONDS, LLM_CALLS_PER_TURN, LLM_TOKENS, CONTEXT_TOKENS_SAVED
 from middleware import create_middleware_stack
+from document_events import current_generation
+from response_cache import response_cache
 
 load_dotenv()
 
@@ -33,7 +43,8 @@ def get_agent_prompt():
             "After using a tool the tool output will be provided in the "
             " 'scratchpad' below. If you have an answer in the "
             "scratchpad you should not use any more tools and "
-            "instead answer directly to the user."
+            "instead answer directly to the user. "
+            "When no tool is needed, reply to the user directly without calling one."
             )),
         MessagesPlaceholder(variable_name="chat_history"),
         ("human", "{input}"),
@@ -47,69 +58,220 @@ tools = [
     final_answer_tool,
 ] + document_tools
 
+# Tools that create or modify documents
+WRITE_TOOLS = {
+    create_todo_list_tool.name,
+    add_todo_item_tool.name,
+    create_travel_plan_tool.name,
+}
+
+# Tool calls from a single step run concurrently, mostly waiting on file and index I/O
+TOOL_WORKERS = 4
+_tool_pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="agent-tool")
+
+# Name -> function lookup for executing tool calls, built once
+TOOL_REGISTRY = {tool.name: tool.func for tool in tools}
+
 llm = ChatOpenAI(
     model_name="gpt-4o",
     max_retries=3,
     openai_api_key=os.getenv('OPENAI_API_KEY')
     )
 
+
+def build_agent_pipeline(agent_llm, tool_choice: str = "auto"):
+    """
+    Compile the prompt and tool-bound LLM into one runnable. Binding converts
+    every tool schema, so this is done once and the result reused across
+    requests and sessions. With tool_choice "auto" the model may answer in
+    plain content, which ends the turn without a final_answer_tool call.
+    """
+    return get_agent_prompt() | agent_llm.bind_tools(tools, tool_choice=tool_choice)
+
+
+agent_pipeline = build_agent_pipeline(llm)
+
+_ANSWER_KEY = re.compile(r'"answer"\s*:\s*"')
+_JSON_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f'}
+
+
+@lru_cache(maxsize=1)
+def _system_prompt_tokens() -> int:
+    """Tokens in the fixed part of the system prompt"""
+    return count_tokens(get_agent_prompt().messages[0].prompt.template)
+
+
+def _record_token_usage(inputs: dict, message):
+    """Count the tokens of one LLM step, estimating them if the model doesn't report usage"""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        LLM_TOKENS.inc(usage.get("input_tokens", 0), direction="input")
+        LLM_TOKENS.inc(usage.get("output_tokens", 0), direction="output")
+        return
+    input_tokens = _system_prompt_tokens()
+    for value in inputs.values():
+        if isinstance(value, str):
+            input_tokens += count_tokens(value)
+        elif isinstance(value, list):
+            input_tokens += sum(message_tokens(item) for item in value)
+    output_tokens = message_tokens(message) + sum(
+        count_tokens(json.dumps(call["args"])) for call in message.tool_calls
+    )
+    LLM_TOKENS.inc(input_tokens, direction="input")
+    LLM_TOKENS.inc(output_tokens, direction="output")
+
+
+def _decode_partial_answer(args: str) -> str:
+    """
+    Decode as much of the "answer" string as has arrived in a partial JSON
+    arguments payload, stopping before any incomplete escape sequence
+    """
+    match = _ANSWER_KEY.search(args)
+    if not match:
+        return ""
+    decoded = []
+    i = match.end()
+    while i < len(args):
+        char = args[i]
+        if char == '"':
+            break
+        if char != '\\':
+            decoded.append(char)
+            i += 1
+            continue
+        if i + 1 >= len(args):
+            break
+        escape = args[i + 1]
+        if escape != 'u':
+            decoded.append(_JSON_ESCAPES.get(escape, escape))
+            i += 2
+            continue
+        if i + 6 > len(args):
+            break
+        code = int(args[i + 2:i + 6], 16)
+        if 0xD800 <= code < 0xDC00:
+            # Surrogate pair: wait for the low half
+            if i + 12 > len(args):
+                break
+            low = int(args[i + 8:i + 12], 16)
+            decoded.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+            i += 12
+            continue
+        decoded.append(chr(code))
+        i += 6
+    return "".join(decoded)
+
+
+class _AnswerStream:
+    """Turns streamed final_answer_tool argument fragments into answer text deltas"""
+
+    def __init__(self):
+        self.args = ""
+        self.emitted = 0
+
+    def feed(self, fragment: str) -> str:
+        self.args += fragment
+        decoded = _decode_partial_answer(self.args)
+        delta = decoded[self.emitted:]
+        self.emitted = len(decoded)
+        return delta
+
+
 class CustomAgentExecutor:
     chat_history: list[BaseMessage]
 
     def name2tool(self, name: str):
-        tool_map = {tool.name: tool.func for tool in tools}
-        return tool_map.get(name)
+        return TOOL_REGISTRY.get(name)
     
 
-    def __init__(self, max_iterations: int = 3):
+    def __init__(self, max_iterations: int = 3, agent_llm=None, max_history_turns: int = 20):
         self.chat_history = []
         self.max_iterations = max_iterations
+        self.max_history_turns = max_history_turns
         self.middleware = create_middleware_stack()
         
-        # Create prompt without context parameter
-        self.prompt_template = get_agent_prompt()
+        # Reuse the shared compiled pipeline unless a different model is supplied
+        if agent_llm is None:
+            self.agent_llm = llm
+            self.agent = agent_pipeline
+        else:
+            self.agent_llm = agent_llm
+            self.agent = build_agent_pipeline(agent_llm)
+        
+        # Keeps history and context within token budgets, summarizing older turns
+        self.prompt = PromptAssembler(summary_llm=self.agent_llm)
+        # Shared answers to similar questions, when RESPONSE_CACHE_ENABLED is set
+        self.response_cache = response_cache
+
+    def invoke(self, input: str) -> str:
+        result = None
+        for event in self.stream(input):
+            if event["type"] == "done":
+                result = {"answer": event["answer"], "tools_used": event["tools_used"]}
+        # return the final answer in dict form
+        return json.dumps(result)
+
+    def stream(self, input: str) -> Iterator[dict]:
+        """
+        Run the agent, yielding events as they happen:
+        {"type": "tool", "name", "args"} after each tool call,
+        {"type": "token", "content"} for each piece of the final answer, and
+        {"type": "done", "answer", "tools_used"} once the turn is complete.
+        """
+        started = time.perf_counter()
+        # the document generation the answer is produced against
+        generation = current_generation()
+        cached = self.response_cache.lookup(input) if self.response_cache is not None else None
+        if cached is not None:
+            final_answer, tools_used = cached.answer, cached.tools_used
+            llm_calls = 0
+            yield {"type": "token", "content": final_answer}
+        else:
+            final_answer, tools_used, llm_calls, cacheable = yield from self._run_agent(input)
+            if cacheable and self.response_cache is not None:
+                self.response_cache.store(input, final_answer, tools_used, generation)
         
-        agent_llm = ChatOpenAI(
-            model_name="gpt-4o",
-            max_retries=3,
-            openai_api_key=os.getenv('OPENAI_API_KEY')
-        )
-        self.agent_llm = agent_llm
-
-    def invoke(self, input: str, conversation_history: list = None) -> dict:
-        # Use middleware to enhance the query with context
+        self.chat_history.extend([
+            HumanMessage(content=input),
+            AIMessage(content=final_answer)
+        ])
+        # fold older turns into the summary so long conversations don't grow
+        # the prompt without limit; done first so it happens even if the
+        # client stops reading after the final event
+        self.prompt.compact(self.chat_history, max_turns=self.max_history_turns)
+        TURN_SECONDS.observe(time.perf_counter() - started)
+        LLM_CALLS_PER_TURN.observe(llm_calls)
+        yield {"type": "done", "answer": final_answer, "tools_used": tools_used}
+
+    def _run_agent(self, input: str):
+        """
+        Run the agent loop for one turn, yielding tool and token events, and
+        return (answer, tools used, LLM calls made, whether the answer may be
+        reused for a similar question)
+        """
+        # Use middleware to enhance the query with document context. Recent turns
+        # are already in chat_history, so the conversation context is just the
+        # summary of the turns folded out of it
         enhanced_query = self.middleware['query_enhancement'].enhance_query(input)
-        context = enhanced_query.get('context', '')
+        # The context goes into the prompt on every agent step, so it is
+        # compressed once here rather than paid for in full each time
+        retrieved = enhanced_query.get('context', '')
+        with span('context_compression'):
+            context = self.prompt.fit_context(compress_context(input, retrieved))
+        CONTEXT_TOKENS_SAVED.observe(count_tokens(retrieved) - count_tokens(context))
         document_summary = json.dumps(enhanced_query.get('document_summary', {}), indent=2)
-        
-        # Get conversation context
-        conversation_context = ""
-        if conversation_history:
-            conversation_context = self.middleware['conversation'].process_conversation_context(
-                input, conversation_history
-            )
-        
-        # Create the agent with enhanced context
-        agent = (
-            {
-                "input": lambda x: x["input"],
-                "context": lambda x: x["context"],
-                "conversation_context": lambda x: x["conversation_context"],
-                "document_summary": lambda x: x["document_summary"],
-                "chat_history": lambda x: x["chat_history"],
-                "agent_scratchpad": lambda x: x.get("agent_scratchpad", [])
-            }
-            | self.prompt_template
-            | self.agent_llm.bind_tools(tools, tool_choice="any")
-        )
+        conversation_context = self.prompt.conversation_context()
         
         # invoke the agent but we do this iteratively in a loop until
         # reaching a final answer
         count = 0
         agent_scratchpad = []
+        tools_called = []
+        final_answer = None
+        tool_out = None
         while count < self.max_iterations:
-            # invoke a step for the agent to generate a tool call
-            tool_call = agent.invoke({
+            # stream a step for the agent to generate a tool call
+            tool_call = yield from self._stream_step(self.agent, {
                 "input": input,
                 "context": context,
                 "conversation_context": conversation_context,
@@ -117,38 +279,111 @@ class CustomAgentExecutor:
                 "chat_history": self.chat_history,
                 "agent_scratchpad": agent_scratchpad
             })
+            # a reply without tool calls is the answer itself, already streamed
+            if not tool_call.tool_calls:
+                count += 1
+                final_answer = tool_call.content if isinstance(tool_call.content, str) else str(tool_call.content)
+                tools_used = tools_called
+                break
             # add initial tool call to scratchpad
             agent_scratchpad.append(tool_call)
-            # otherwise we execute the tool and add it's output to the agent scratchpad
-            tool_name = tool_call.tool_calls[0]["name"]
-            tool_args = tool_call.tool_calls[0]["args"]
-            tool_call_id = tool_call.tool_calls[0]["id"]
-            tool_out = self.name2tool(tool_name)(**tool_args)
-            # add the tool output to the agent scratchpad
-            tool_exec = ToolMessage(
-                content=f"{tool_out}",
-                tool_call_id=tool_call_id
-            )
-            agent_scratchpad.append(tool_exec)
-            # add a print so we can see intermediate steps
-            print(f"{count}: {tool_name}({tool_args})")
+            # otherwise we execute every tool called in this step and add their
+            # outputs to the agent scratchpad in call order
+            outputs = self._execute_tool_calls(tool_call.tool_calls)
+            final_answer_out = None
+            for call, tool_out in zip(tool_call.tool_calls, outputs):
+                tool_exec = ToolMessage(
+                    content=f"{tool_out}",
+                    tool_call_id=call["id"]
+                )
+                agent_scratchpad.append(tool_exec)
+                # add a print so we can see intermediate steps
+                print(f"{count}: {call['name']}({call['args']})")
+                if call["name"] == "final_answer_tool":
+                    final_answer_out = tool_out
+                else:
+                    tools_called.append(call["name"])
+                    yield {"type": "tool", "name": call["name"], "args": call["args"]}
             count += 1
-            # if the tool call is the final answer tool, we stop
-            if tool_name == "final_answer_tool":
+            # if the final answer tool was called, we stop
+            if final_answer_out is not None:
+                tool_out = final_answer_out
                 break
-        # add the final output to the chat history
-        if isinstance(tool_out, dict) and "answer" in tool_out:
-            final_answer = tool_out["answer"]
-        else:
-            # For non-final-answer tools, use the tool output as the final answer
-            final_answer = str(tool_out)
         
-        self.chat_history.extend([
-            HumanMessage(content=input),
-            AIMessage(content=final_answer)
-        ])
-        # return the final answer in dict form
-        if isinstance(tool_out, dict):
-            return json.dumps(tool_out)
-        else:
-            return json.dumps({"answer": final_answer, "tools_used": []})
\ No newline at end of file
+        # only real answers from turns that changed no documents can be replayed
+        cacheable = not any(name in WRITE_TOOLS for name in tools_called)
+        if final_answer is None:
+            if isinstance(tool_out, dict) and "answer" in tool_out:
+                final_answer = tool_out["answer"]
+                tools_used = tool_out.get("tools_used", [])
+            else:
+                # For non-final-answer tools, use the tool output as the final answer
+                final_answer = "" if tool_out is None else str(tool_out)
+                tools_used = []
+                cacheable = False
+        return final_answer, tools_used, count, cacheable
+
+    def reset(self):
+        """Forget the conversation"""
+        self.chat_history.clear()
+        self.prompt.reset()
+
+    def _execute_tool_calls(self, tool_calls: list) -> list:
+        """
+        Run all tool calls from one step and return their outputs in call
+        order. Read-only tools run concurrently on the shared pool; tools that
+        modify documents run one at a time, in order, meanwhile.
+        """
+        if len(tool_calls) == 1:
+            return [self._run_tool(tool_calls[0])]
+        
+        pending = {}
+        for index, call in enumerate(tool_calls):
+            if call["name"] not in WRITE_TOOLS:
+                pending[index] = _tool_pool.submit(self._run_tool, call)
+        
+        outputs = []
+        for index, call in enumerate(tool_calls):
+            if index in pending:
+                outputs.append(pending[index].result())
+            else:
+                outputs.append(self._run_tool(call))
+        return outputs
+
+    def _run_tool(self, call: dict):
+        tool_func = self.name2tool(call["name"])
+        if tool_func is None:
+            TOOL_ERRORS.inc(tool=call["name"])
+            return f"Unknown tool '{call['name']}'"
+        with TOOL_SECONDS.time(tool=call["name"]):
+            try:
+                return tool_func(**call["args"])
+            except Exception as e:
+                TOOL_ERRORS.inc(tool=call["name"])
+                return f"Error running {call['name']}: {str(e)}"
+
+    def _stream_step(self, agent, inputs: dict):
+        """
+        Stream one LLM step, yielding token events for answer text as it is
+        generated, and return the complete message
+        """
+        message = None
+        answer_streams = {}
+        with span("agent_step"):
+            for chunk in agent.stream(inputs):
+                message = chunk if message is None else message + chunk
+                if isinstance(chunk.content, str) and chunk.content:
+                    yield {"type": "token", "content": chunk.content}
+                for tool_chunk in getattr(chunk, "tool_call_chunks", None) or []:
+                    index = tool_chunk.get("index")
+                    if tool_chunk.get("name") == "final_answer_tool":
+                        answer_streams[index] = _AnswerStream()
+                    if index in answer_streams and tool_chunk.get("args"):
+                        text = answer_streams[index].feed(tool_chunk["args"])
+                        if text:
+                            yield {"type": "token", "content": text}
+        if message is None:
+            # the model streamed nothing: an empty reply with no tool calls
+            message = AIMessage(content="")
+        _record_token_usage(inputs, message)
+        return message
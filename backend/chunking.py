@@ -0,0 +1,200 @@
+"""
+Structure-aware chunking of documents for the search index
+"""
+import json
+import os
+import re
+from typing import List, Optional, Tuple
+from langchain_core.documents import Document
+from catalog import DOCUMENT_TYPES
+
+# Upper bound on the characters in one chunk
+CHUNK_SIZE = 1000
+
+_TIMESTAMP_SUFFIX = re.compile(r'_\d{8}_\d{6}(?:_\d+)?$')
+# A section heading, matched against a stripped line: "## Heading" or a line that is only bold text,
+# e.g. "**Additional Tips:**" or "**Phnom Penh** (2-3 days)". Also used by context compression
+HEADING = re.compile(r'^(?:#{1,6}\s+(?P<markdown>.+?)\s*#*|\*\*(?P<bold>[^*]+?)\*\*:?(?P<note>\s*\([^)]*\))?:?)\s*$')
+_PLAN_TITLE = re.compile(r'^Travel Plan for (?P<destination>.+)$')
+_PLAN_HEADER = re.compile(r'^(?:Created: .*|=+)$')
+
+
+def document_type(rel_path: str) -> str:
+    """travel_plans, budgets or todo_lists for files in those folders, otherwise other"""
+    parts = rel_path.replace(os.sep, '/').split('/')
+    return parts[0] if len(parts) > 1 and parts[0] in DOCUMENT_TYPES else 'other'
+
+
+def name_from_filename(filename: str) -> str:
+    """'new_zealand_20260106_093536.json' -> 'New Zealand'"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return _TIMESTAMP_SUFFIX.sub('', stem).replace('_', ' ').strip().title()
+
+
+def chunk_file(file_path: str, rel_path: str) -> List[Document]:
+    """Split a document into chunks, each carrying source, filename, type and destination metadata"""
+    doc_type = document_type(rel_path)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    if file_path.endswith('.json'):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = None
+        if doc_type in ('budgets', 'todo_lists') and isinstance(data, dict):
+            chunks = _list_chunks(doc_type, data, file_path)
+        else:
+            # Compact JSON drops the indentation that pretty-printed files spend most of their characters on
+            compact = json.dumps(data, ensure_ascii=False, separators=(',', ':')) if data is not None else text
+            chunks = [(None, piece) for piece in _pack([compact])]
+    elif doc_type == 'travel_plans':
+        chunks = _plan_chunks(text, file_path)
+    else:
+        chunks = [(None, piece) for piece in _pack(_paragraphs(text))]
+
+    # Taken from the filename rather than the content so search filters can be built from the catalog
+    destination = name_from_filename(file_path)
+    documents = []
+    for section, content in chunks:
+        metadata = {
+            'source': file_path,
+            'filename': os.path.basename(file_path),
+            'type': doc_type,
+            'destination': destination,
+        }
+        if section:
+            metadata['section'] = section
+        documents.append(Document(page_content=content, metadata=metadata))
+    return documents
+
+
+def _plan_chunks(text: str, file_path: str) -> List[Tuple[Optional[str], str]]:
+    """
+    Split a plan on its headings and pack whole sections into chunks, so a
+    chunk only breaks mid-section when one section is longer than a chunk.
+    Each chunk starts with the plan name so it stands on its own; the title
+    block is dropped.
+    """
+    destination = name_from_filename(file_path)
+    sections: List[Tuple[Optional[str], List[str]]] = [(None, [])]
+    for line in text.splitlines():
+        stripped = line.strip()
+        at_start = len(sections) == 1 and not any(l.strip() for l in sections[0][1])
+        title = _PLAN_TITLE.match(stripped)
+        if at_start and title:
+            destination = title.group('destination').strip()
+            continue
+        if at_start and _PLAN_HEADER.match(stripped):
+            continue
+        heading = HEADING.match(stripped)
+        if heading:
+            name = (heading.group('markdown') or heading.group('bold')).strip().rstrip(':')
+            note = (heading.group('note') or '').strip()
+            sections.append((f"{name} {note}".strip(), [stripped]))
+        else:
+            sections[-1][1].append(line)
+
+    prefix = f"Travel plan for {destination}\n"
+    size = CHUNK_SIZE - len(prefix)
+    chunks: List[Tuple[Optional[str], str]] = []
+    current_heading, current = None, ""
+    for heading, lines in sections:
+        body = "\n".join(lines).strip()
+        if not body:
+            continue
+        for piece in _pack(_paragraphs(body), size):
+            if current and len(current) + 2 + len(piece) > size:
+                chunks.append((current_heading, prefix + current))
+                current = ""
+            if not current:
+                current_heading = heading
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append((current_heading, prefix + current))
+    return chunks
+
+
+def _list_chunks(doc_type: str, data: dict, file_path: str) -> List[Tuple[Optional[str], str]]:
+    """A header line plus one compact line per item, packed into as few chunks as fit"""
+    title = str(data.get('title') or name_from_filename(file_path))
+    items = [item for item in data.get('items', []) if isinstance(item, dict)]
+    if doc_type == 'budgets':
+        total = sum(_amount(item) for item in items)
+        header = f"Budget '{title}': {len(items)} items, total ${total:,.2f}"
+        records = [_budget_record(item) for item in items]
+    else:
+        done = len([item for item in items if item.get('completed')])
+        header = f"Todo list '{title}': {len(items)} items, {done} done"
+        records = [_todo_record(item) for item in items]
+    if not records:
+        return [(None, header)]
+    return [(None, f"{header}\n{piece}") for piece in _pack(records, CHUNK_SIZE - len(header) - 1, "\n")]
+
+
+def _amount(item: dict) -> float:
+    try:
+        return float(item.get('amount', 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _extra_fields(item: dict, skip: Tuple[str, ...]) -> str:
+    """Other short scalar fields of an item (category, notes...), leaving out ids and timestamps"""
+    extras = [
+        f"{field}: {value}" for field, value in item.items()
+        if field not in skip + ('id', 'created', 'updated')
+        and isinstance(value, (str, int, float)) and not isinstance(value, bool) and str(value).strip()
+    ]
+    return f" ({'; '.join(extras)})" if extras else ""
+
+
+def _budget_record(item: dict) -> str:
+    name = item.get('name') or item.get('text') or 'Item'
+    return f"- {name}: ${_amount(item):,.2f}{_extra_fields(item, ('name', 'text', 'amount'))}"
+
+
+def _todo_record(item: dict) -> str:
+    mark = 'x' if item.get('completed') else ' '
+    return f"- [{mark}] {item.get('text', '')}{_extra_fields(item, ('text', 'completed'))}"
+
+
+def _paragraphs(text: str) -> List[str]:
+    return [paragraph.strip() for paragraph in re.split(r'\n\s*\n', text) if paragraph.strip()]
+
+
+def _pack(pieces: List[str], size: int = CHUNK_SIZE, separator: str = "\n\n") -> List[str]:
+    """
+    Greedily join pieces into chunks of at most size characters. A piece
+    longer than size is cut on line breaks, then on spaces, then hard.
+    """
+    chunks: List[str] = []
+    current = ""
+    for piece in pieces:
+        for part in _split_long(piece, size):
+            if current and len(current) + len(separator) + len(part) > size:
+                chunks.append(current)
+                current = ""
+            current = f"{current}{separator}{part}" if current else part
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_long(text: str, size: int) -> List[str]:
+    if len(text) <= size:
+        return [text]
+    for separator in ("\n", " "):
+        if separator in text:
+            parts = []
+            current = ""
+            for word in text.split(separator):
+                if current and len(current) + len(separator) + len(word) > size:
+                    parts.append(current)
+                    current = ""
+                current = f"{current}{separator}{word}" if current else word
+            if current:
+                parts.append(current)
+            # Pieces that are still too long have no separators left of this kind
+            return [piece for part in parts for piece in _split_long(part, size)]
+    return [text[start:start + size] for start in range(0, len(text), size)]
@@ -0,0 +1,160 @@
+"""
+Compression of retrieved context before it goes into the prompt
+"""
+import os
+import re
+from typing import List, Optional, Set, Tuple
+from chunking import HEADING, name_from_filename
+from prompt_budget import count_tokens
+
+# Share of a passage's word shingles already in earlier passages above which it is dropped as a near-duplicate
+DUPLICATE_THRESHOLD = float(os.getenv('CONTEXT_DUPLICATE_THRESHOLD', '0.8'))
+# Passages shorter than this are kept whole or dropped whole; trimming them saves too little to lose the surrounding text
+MIN_TRIM_TOKENS = int(os.getenv('CONTEXT_MIN_TRIM_TOKENS', '80'))
+# Relevant paragraphs longer than this are cut to their relevant lines and sentences
+PARAGRAPH_CHARS = 300
+SHINGLE_WORDS = 3
+
+_PASSAGE_SPLIT = re.compile(r'\n\n(?=\[From )')
+_PASSAGE_SOURCE = re.compile(r'^(\[From ([^\]]*)\]: )')
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9*\-])')
+_WORD = re.compile(r'\w+')
+STOP_WORDS = {
+    'the', 'and', 'for', 'are', 'was', 'what', 'which', 'who', 'how', 'when', 'where', 'why', 'can', 'could',
+    'should', 'would', 'with', 'about', 'from', 'into', 'that', 'this', 'these', 'those', 'there', 'their',
+    'have', 'has', 'had', 'you', 'your', 'our', 'any', 'some', 'tell', 'give', 'show', 'please', 'want',
+    'need', 'does', 'did', 'not', 'all', 'get', 'also', 'more', 'most', 'much', 'many', 'trip', 'travel',
+}
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def query_terms(query: str) -> Set[str]:
+    """Words of the query worth matching passages on"""
+    return {word for word in _words(query) if len(word) > 2 and word not in STOP_WORDS}
+
+
+def _mentions(text: str, terms: Set[str]) -> bool:
+    """Whether text contains a query term, counting 'beach' and 'beaches' as the same word"""
+    for word in _words(text):
+        for term in terms:
+            if word == term or (min(len(word), len(term)) >= 4 and (word.startswith(term) or term.startswith(word))):
+                return True
+    return False
+
+
+def _shingles(text: str) -> Set[tuple]:
+    words = _words(text)
+    if len(words) < SHINGLE_WORDS:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def drop_near_duplicates(passages: List[str]) -> List[str]:
+    """
+    Drop passages whose text mostly appears in the passages before them,
+    such as the same sections of two saved versions of a plan. Passages
+    arrive most relevant first, so the better-ranked copy is the one kept.
+    """
+    kept = []
+    seen: Set[tuple] = set()
+    for passage in passages:
+        shingles = _shingles(_PASSAGE_SOURCE.sub('', passage))
+        if kept and len(shingles & seen) >= DUPLICATE_THRESHOLD * len(shingles):
+            continue
+        kept.append(passage)
+        seen |= shingles
+    return kept
+
+
+def trim_passage(passage: str, terms: Set[str]) -> Optional[str]:
+    """
+    Cut a passage down to its first line (the plan or list it comes from)
+    and the paragraphs mentioning a query term. Long paragraphs, such as the
+    item lines of a budget, are cut further to the lines and sentences that
+    mention one.
+
+    Terms naming what the passage is about, in its first line or its
+    file's destination, say nothing about which paragraphs matter: for
+    "what should I do in cambodia" every line of the Cambodia plan is
+    relevant. If no other term matches, a passage about a query term is
+    kept whole. Returns None if nothing in the passage mentions a term.
+    """
+    return _trim(passage, terms)[0]
+
+
+def _trim(passage: str, terms: Set[str]) -> Tuple[Optional[str], bool]:
+    """trim_passage, plus whether a term other than the passage's subject matched"""
+    match = _PASSAGE_SOURCE.match(passage)
+    source = match.group(1) if match else ""
+    header, _, body = passage[len(source):].partition("\n")
+    destination = name_from_filename(match.group(2)) if match else ""
+    about = {term for term in terms if _mentions(f"{header} {destination}", {term})}
+    specific = terms - about
+    if count_tokens(passage) < MIN_TRIM_TOKENS:
+        matched = _mentions(passage, specific)
+        return (passage if about or matched else None), matched
+
+    kept = []
+    for paragraph in re.split(r'\n\s*\n', body):
+        if not _mentions(paragraph, specific):
+            continue
+        if len(paragraph) <= PARAGRAPH_CHARS:
+            kept.append(paragraph.strip())
+            continue
+        lines = []
+        for line in paragraph.split("\n"):
+            sentences = [sentence for sentence in _SENTENCE_SPLIT.split(line) if _mentions(sentence, specific)]
+            if sentences:
+                lines.append(" ".join(sentences))
+        kept.append("\n".join(lines))
+    if not kept:
+        return (passage if about else None), False
+    return source + header + "\n" + "\n\n".join(kept), True
+
+
+def drop_repeated_headings(passages: List[str]) -> List[str]:
+    """
+    Drop heading lines already given earlier for the same file, such as a
+    plan that repeats its "### Suggested Itinerary" heading or two chunks of
+    one plan that both keep it
+    """
+    seen: Set[tuple] = set()
+    result = []
+    for passage in passages:
+        match = _PASSAGE_SOURCE.match(passage)
+        source = match.group(2) if match else None
+        lines = []
+        for line in passage.split("\n"):
+            if HEADING.match(line.strip()):
+                key = (source, line.strip().lower())
+                if key in seen:
+                    continue
+                seen.add(key)
+            lines.append(line)
+        result.append(re.sub(r'\n{3,}', '\n\n', "\n".join(lines)).strip())
+    return result
+
+
+def compress_context(query: str, context: str) -> str:
+    """
+    Trim formatted search results to the text relevant to the query and
+    drop near-duplicate passages and repeated headings. Passages that don't
+    mention the query are dropped when others do, and so are passages only
+    about a place in the query when others match something more specific
+    ("beaches" in "cambodia beaches"). If none match (a vague follow-up, or
+    a match on meaning alone) they are all kept whole. The token budget is
+    applied afterwards by PromptAssembler.fit_context.
+    """
+    if not context.startswith('[From '):
+        return context
+    passages = _PASSAGE_SPLIT.split(context)
+    terms = query_terms(query)
+    trimmed = [_trim(passage, terms) for passage in passages] if terms else []
+    if any(specific for _, specific in trimmed):
+        passages = [passage for passage, specific in trimmed if specific]
+    elif any(passage for passage, _ in trimmed):
+        passages = [passage for passage, _ in trimmed if passage]
+    return "\n\n".join(drop_repeated_headings(drop_near_duplicates(passages)))
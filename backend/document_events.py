@@ -0,0 +1,47 @@
+"""
+Change notifications for the document store
+"""
+import logging
+import threading
+from typing import Callable, List, Optional
+
+_lock = threading.Lock()
+_generation = 0
+_listeners: List[Callable[[Optional[str]], None]] = []
+
+
+def current_generation() -> int:
+    """
+    Counter that increases whenever stored documents or the search index
+    change. Caches stamp entries with it so stale entries are never served.
+    """
+    return _generation
+
+
+def bump_generation() -> int:
+    """Invalidate generation-stamped caches without notifying listeners"""
+    global _generation
+    with _lock:
+        _generation += 1
+        return _generation
+
+
+def add_listener(listener: Callable[[Optional[str]], None]):
+    """Register a callback run with the changed path after every document write"""
+    with _lock:
+        _listeners.append(listener)
+
+
+def document_changed(path: Optional[str] = None):
+    """
+    Record that a document was created, updated or deleted. Write paths call
+    this after touching the documents directory.
+    """
+    bump_generation()
+    with _lock:
+        listeners = list(_listeners)
+    for listener in listeners:
+        try:
+            listener(path)
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Error notifying document change listener: {e}")
@@ -5,7 +5,9 @@ import os
 import json
 from typing import Dict, Any, List, Optional
 from langchain.tools import tool
-from middleware import DocumentMiddleware
+from middleware import DocumentMiddleware, search_filters
+from catalog import catalog
+from keyword_index import keyword_index
 
 # Initialize document middleware
 doc_middleware = DocumentMiddleware()
@@ -56,19 +58,29 @@ def read_specific_document(filename: str) -> Dict[str, Any]:
         return {"status": "error", "message": f"Error reading document: {str(e)}"}
 
 @tool
-def search_documents_by_keyword(keyword: str, max_results: int = 5) -> Dict[str, Any]:
+def search_documents_by_keyword(keyword: str, max_results: int = 5, document_type: Optional[str] = None,
+                                destination: Optional[str] = None, filename: Optional[str] = None) -> Dict[str, Any]:
     """
-    Search for documents containing specific keywords or phrases.
-    Use this when the user wants to find documents related to specific topics.
+    Search for documents containing specific keywords or phrases, best
+    matches first. Use this when the user wants to find documents mentioning
+    specific words, places or items.
+    Narrow the search with document_type, destination or filename when the
+    user is asking about particular documents.
     
     Args:
         keyword: The keyword or phrase to search for
         max_results: Maximum number of results to return (default: 5)
+        document_type: Only search "travel_plans", "budgets" or "todo_lists"
+        destination: Only search documents for this destination (e.g., "Thailand")
+        filename: Only search this document (e.g., "thailand_20251223_095643.txt")
     """
     try:
-        context = doc_middleware.get_relevant_context(keyword)
-        
-        if "No relevant documents found" in context or "No documents available" in context:
+        filters = search_filters(document_type, destination, filename)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    try:
+        matches = keyword_index.search(keyword, max_results, filters)
+        if not matches:
             return {
                 "status": "info",
                 "keyword": keyword,
@@ -76,22 +88,14 @@ def search_documents_by_keyword(keyword: str, max_results: int = 5) -> Dict[str,
                 "message": f"No documents found containing '{keyword}'"
             }
         
-        # Parse the context to extract document sources
-        results = []
-        context_parts = context.split('\n\n')
-        
-        for part in context_parts[:max_results]:
-            if '[From ' in part:
-                # Extract filename and content
-                start = part.find('[From ') + 6
-                end = part.find(']: ')
-                if start > 5 and end > start:
-                    filename = part[start:end]
-                    content_snippet = part[end + 3:end + 203] + "..." if len(part) > end + 200 else part[end + 3:]
-                    results.append({
-                        "filename": filename,
-                        "content_snippet": content_snippet
-                    })
+        results = [
+            {
+                "filename": match["filename"],
+                "type": match["type"],
+                "content_snippet": match["snippet"]
+            }
+            for match in matches
+        ]
         
         return {
             "status": "success",
@@ -114,28 +118,20 @@ def get_document_statistics() -> Dict[str, Any]:
         
         total_docs = sum(len(docs) for docs in summary.values())
         
-        # Get file sizes and dates if possible
-        documents_dir = os.path.join(os.path.dirname(__file__), '..', 'documents')
-        recent_files = []
-        
-        for root, dirs, files in os.walk(documents_dir):
-            for file in files[-5:]:  # Get last 5 files
-                file_path = os.path.join(root, file)
-                try:
-                    stat = os.stat(file_path)
-                    recent_files.append({
-                        "name": file,
-                        "size": stat.st_size,
-                        "modified": stat.st_mtime
-                    })
-                except:
-                    continue
+        recent_files = [
+            {
+                "name": entry.filename,
+                "size": entry.size,
+                "modified": entry.mtime
+            }
+            for entry in catalog.recent(5)
+        ]
         
         return {
             "status": "success",
             "total_documents": total_docs,
             "by_type": {k: len(v) for k, v in summary.items()},
-            "recent_files": sorted(recent_files, key=lambda x: x["modified"], reverse=True)[:5],
+            "recent_files": recent_files,
             "message": f"Document collection contains {total_docs} total files"
         }
         
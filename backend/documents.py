@@ -1,11 +1,18 @@
+import hashlib
+import json
 import logging
 import os
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from langchain_community.vectorstores import Chroma
 from langchain_community.embeddings import OpenAIEmbeddings
-from langchain_text_splitters import CharacterTextSplitter
 from langchain_openai import ChatOpenAI
-from langchain_community.document_loaders import DirectoryLoader, TextLoader, JSONLoader
+from embedding_cache import CachedEmbeddings
+from chunking import chunk_file
+import document_events
+from paths import DOCUMENTS_DIR
+from metrics import registry, span, cache_collector
 
 load_dotenv()
 
@@ -13,52 +20,336 @@ openai_api_key = os.getenv('OPENAI_API_KEY')
 if not openai_api_key:
     raise ValueError("OPENAI_API_KEY environment variable is required")
 
+INDEXED_EXTENSIONS = ('.txt', '.json')
+COLLECTION_NAME = "documents"
+
+# The index is persisted here so restarts can serve straight away instead of re-embedding
+VECTORSTORE_DIR = os.getenv('VECTORSTORE_DIR', os.path.join(os.path.dirname(__file__), '..', 'vectorstore'))
+MANIFEST_PATH = os.path.join(VECTORSTORE_DIR, 'manifest.json')
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', os.path.join(VECTORSTORE_DIR, 'embedding_cache.sqlite'))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '50000'))
+
 # Initialize LangChain components
-embeddings = OpenAIEmbeddings(openai_api_key=openai_api_key)
+embeddings = CachedEmbeddings(
+    OpenAIEmbeddings(openai_api_key=openai_api_key),
+    EMBEDDING_CACHE_PATH,
+    max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+)
+registry.add_collector(cache_collector('embeddings', embeddings.stats))
 llm = ChatOpenAI(openai_api_key=openai_api_key)
 
-vectorstore = None
+# Bump when the way documents are split or stored changes so persisted indexes get rebuilt
+INDEX_FORMAT_VERSION = 4
 
-def initialize_vectorstore():
+# Two collections are kept: queries read the active one while rebuilds go into the other
+BUFFER_NAMES = ('a', 'b')
+# Chroma rejects very large single writes, so adds and copies are sent in batches
+WRITE_BATCH_SIZE = 1000
+
+
+def _scan_documents():
+    """Return {relative path: absolute path} for every indexable file"""
+    found = {}
+    for root, dirs, files in os.walk(DOCUMENTS_DIR):
+        for file in files:
+            if file.endswith(INDEXED_EXTENSIONS):
+                file_path = os.path.join(root, file)
+                rel_path = os.path.relpath(file_path, DOCUMENTS_DIR).replace(os.sep, '/')
+                found[rel_path] = file_path
+    return found
+
+
+def _hash_file(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _file_fingerprint(rel_path, file_path, *manifests):
+    """
+    Return (hash, mtime, size) for a file, reusing a known hash when mtime
+    and size are unchanged so untouched files are never re-read
+    """
+    stat = os.stat(file_path)
+    for files in manifests:
+        entry = files.get(rel_path)
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            return entry['hash'], stat.st_mtime, stat.st_size
+    return _hash_file(file_path), stat.st_mtime, stat.st_size
+
+
+def _chunk_ids(rel_path, file_hash, count):
+    return [f"{rel_path}:{file_hash[:16]}:{i}" for i in range(count)]
+
+
+def _batched(items, size=WRITE_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
-    """Initialize the vector store with documents"""
-    global vectorstore
-    
-    # Create documents directory if it doesn't exist
-    documents_dir = os.path.join(os.path.dirname(__file__), '..', 'documents')
-    os.makedirs(documents_dir, exist_ok=True)
 
-    print("Reading documents from:", documents_dir)
+def _index_version():
+    return {
+        'format': INDEX_FORMAT_VERSION,
+        'embedding_model': getattr(embeddings, 'model', type(embeddings).__name__),
+    }
 
-    # Load existing documents with separate loaders
-    documents = []
-    if os.path.exists(documents_dir) and os.listdir(documents_dir):
-        # Load .txt files
+
+class IndexBuffer:
+    """One persisted Chroma collection plus the manifest of files it holds"""
+
+    def __init__(self, name: str, store: Chroma, files: dict):
+        self.name = name
+        self.store = store
+        # Keyed by path relative to DOCUMENTS_DIR:
+        # {"hash": sha256 of the content, "mtime": ..., "size": ..., "chunk_ids": [...]}
+        self.files = files
+        self.readers = 0
+
+    def chunk_count(self) -> int:
+        return sum(len(entry['chunk_ids']) for entry in self.files.values())
+
+
+class RetrievalService:
+    """
+    Owns the document index and hands out read handles to it.
+
+    Rebuilds are applied to the standby buffer while queries keep reading the
+    active one, then the two are swapped under a lock, so a query never waits
+    on a rebuild or sees a half-built index. Chunks the active buffer already
+    holds are copied across rather than embedded again.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._buffers = {}
+        self._active = None
+        self._state = threading.Condition()
+        self._rebuild_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._rebuild_requested = False
+        self._worker = None
+
+    def start(self):
+        """Open the persisted buffers and schedule a background sync with the files on disk"""
+        with self._start_lock:
+            if self._started:
+                return
+            self._open_buffers()
+            self._started = True
+        self.request_rebuild()
+
+    @contextmanager
+    def read(self):
+        """
+        Yield the active vector store (or None before the first build). The
+        buffer is not modified by rebuilds until every reader has released it.
+        """
+        self.start()
+        with self._state:
+            buffer = self._active
+            if buffer is not None:
+                buffer.readers += 1
         try:
-            txt_loader = DirectoryLoader(documents_dir, glob="**/*.txt", loader_cls=TextLoader)
-            txt_documents = txt_loader.load()
-            documents.extend(txt_documents)
-            print(f"Loaded {len(txt_documents)} .txt documents")
-        except Exception as e:
-            print(f"Error loading .txt files: {e}")
-        
-        # Load .json files 
+            yield buffer.store if buffer is not None else None
+        finally:
+            if buffer is not None:
+                with self._state:
+                    buffer.readers -= 1
+                    self._state.notify_all()
+
+    def request_rebuild(self):
+        """Sync the index in the background; bursts of requests are coalesced into one rebuild"""
+        with self._state:
+            self._rebuild_requested = True
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._rebuild_worker, name="index-rebuild", daemon=True)
+            self._worker.start()
+
+    def wait_for_rebuild(self, timeout: float = None) -> bool:
+        """Block until pending background rebuilds finish; returns False on timeout"""
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+            return not worker.is_alive()
+        return True
+
+    @span('index_rebuild')
+    def rebuild(self):
+        """Synchronously bring the standby buffer in line with the documents directory and swap it in"""
+        self.start()
+        with self._rebuild_lock:
+            with self._state:
+                source = self._active
+                target = next(buffer for buffer in self._buffers.values() if buffer is not source)
+                # In-flight queries may still hold this buffer from before the last swap
+                self._state.wait_for(lambda: target.readers == 0)
+
+            changed = self._sync_buffer(target, source)
+
+            with self._state:
+                self._active = target
+            self._save_manifest()
+
+            if changed:
+                # Cached search results were computed against the previous buffer
+                document_events.bump_generation()
+                self.logger.info("Swapped in rebuilt index buffer '%s' (%d documents)", target.name, len(target.files))
+
+    def _rebuild_worker(self):
+        while True:
+            with self._state:
+                if not self._rebuild_requested:
+                    self._worker = None
+                    return
+                self._rebuild_requested = False
+            try:
+                self.rebuild()
+            except Exception as e:
+                self.logger.error(f"Error rebuilding document index: {e}")
+
+    def _open_store(self, name: str) -> Chroma:
+        return Chroma(
+            collection_name=f"{COLLECTION_NAME}_{name}",
+            embedding_function=embeddings,
+            persist_directory=VECTORSTORE_DIR,
+        )
+
+    def _open_buffers(self):
+        """
+        Open both persisted collections. A collection is emptied if the manifest
+        is missing, was written by a different index version, or doesn't account
+        for every chunk the collection holds.
+        """
+        os.makedirs(VECTORSTORE_DIR, exist_ok=True)
+        stored = self._load_manifest()
+        if stored and stored.get('version') != _index_version():
+            stored = None
+
+        for name in BUFFER_NAMES:
+            store = self._open_store(name)
+            files = (stored or {}).get('buffers', {}).get(name, {})
+            buffer = IndexBuffer(name, store, files)
+            if stored is None or store._collection.count() != buffer.chunk_count():
+                print(f"Persisted index buffer '{name}' is missing or out of date, it will be rebuilt.")
+                store.delete_collection()
+                buffer = IndexBuffer(name, self._open_store(name), {})
+            self._buffers[name] = buffer
+
+        active = self._buffers.get((stored or {}).get('active'))
+        self._active = active if active is not None and active.files else None
+
+    def _load_manifest(self):
         try:
-            json_loader = DirectoryLoader(
-                documents_dir, 
-                glob="**/*.json", 
-                loader_cls=JSONLoader,
-                loader_kwargs={'jq_schema': '.', 'text_content': False}
+            with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_manifest(self):
+        data = {
+            'version': _index_version(),
+            'active': self._active.name if self._active is not None else None,
+            'buffers': {name: buffer.files for name, buffer in self._buffers.items()},
+        }
+        tmp_path = MANIFEST_PATH + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, MANIFEST_PATH)
+
+    def _sync_buffer(self, target: IndexBuffer, source: IndexBuffer = None) -> bool:
+        """
+        Apply new, changed and removed files to the target buffer. Returns True
+        if any chunks were added or deleted.
+        """
+        # Create documents directory if it doesn't exist
+        os.makedirs(DOCUMENTS_DIR, exist_ok=True)
+
+        print("Reading documents from:", DOCUMENTS_DIR)
+
+        source_files = source.files if source is not None else {}
+        current_files = _scan_documents()
+        fingerprints = {}
+        for rel_path, file_path in current_files.items():
+            try:
+                fingerprints[rel_path] = _file_fingerprint(rel_path, file_path, target.files, source_files)
+            except OSError as e:
+                print(f"Error reading {rel_path}: {e}")
+
+        removed = [rel_path for rel_path in target.files if rel_path not in fingerprints]
+        changed = []
+        for rel_path, (file_hash, mtime, size) in fingerprints.items():
+            entry = target.files.get(rel_path)
+            if entry is None or entry['hash'] != file_hash:
+                changed.append(rel_path)
+            else:
+                # Content is unchanged, only the stat info needs refreshing
+                entry.update(mtime=mtime, size=size)
+
+        if not removed and not changed:
+            print(f"Vector store up to date ({len(target.files)} documents indexed).")
+            return False
+
+        stale_ids = []
+        for rel_path in removed + changed:
+            stale_ids.extend(target.files.get(rel_path, {}).get('chunk_ids', []))
+
+        copy_ids = []
+        new_texts = []
+        new_ids = []
+        new_entries = {}
+        for rel_path in changed:
+            file_hash, mtime, size = fingerprints[rel_path]
+            known = source_files.get(rel_path)
+            if known is not None and known['hash'] == file_hash:
+                # The active buffer already has these chunks embedded
+                ids = list(known['chunk_ids'])
+                copy_ids.extend(ids)
+            else:
+                try:
+                    texts = chunk_file(current_files[rel_path], rel_path)
+                except Exception as e:
+                    # Recorded with no chunks so the file is not retried until it changes
+                    print(f"Error loading {rel_path}: {e}")
+                    texts = []
+                ids = _chunk_ids(rel_path, file_hash, len(texts))
+                new_texts.extend(texts)
+                new_ids.extend(ids)
+            new_entries[rel_path] = {'hash': file_hash, 'mtime': mtime, 'size': size, 'chunk_ids': ids}
+
+        for ids in _batched(stale_ids):
+            target.store.delete(ids=ids)
+        for ids in _batched(copy_ids):
+            copied = source.store._collection.get(ids=ids, include=['embeddings', 'documents', 'metadatas'])
+            target.store._collection.upsert(
+                ids=copied['ids'],
+                embeddings=copied['embeddings'],
+                documents=copied['documents'],
+                metadatas=copied['metadatas'],
+            )
+        for start in range(0, len(new_texts), WRITE_BATCH_SIZE):
+            target.store.add_documents(
+                new_texts[start:start + WRITE_BATCH_SIZE],
+                ids=new_ids[start:start + WRITE_BATCH_SIZE],
             )
-            json_documents = json_loader.load()
-            documents.extend(json_documents)
-            print(f"Loaded {len(json_documents)} .json documents")
-        except Exception as e:
-            print(f"Error loading .json files: {e}")
-    
-    print(f"Total loaded {len(documents)} documents for vectorstore initialization.")
-    
-    if documents:
-        text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-        texts = text_splitter.split_documents(documents)
-        vectorstore = Chroma.from_documents(texts, embeddings)
\ No newline at end of file
+
+        for rel_path in removed + changed:
+            target.files.pop(rel_path, None)
+        target.files.update(new_entries)
+
+        print(f"Indexed {len(new_entries)} new or changed documents ({len(new_texts)} chunks embedded, "
+              f"{len(copy_ids)} copied), removed {len(removed)} documents; {len(target.files)} documents indexed.")
+        return True
+
+
+retrieval_service = RetrievalService()
+# Writes to the documents directory are picked up by a background rebuild
+document_events.add_listener(lambda path: retrieval_service.request_rebuild())
+
+
+def initialize_vectorstore():
+    """Synchronously bring the document index up to date with the documents directory"""
+    retrieval_service.rebuild()
@@ -0,0 +1,160 @@
+"""
+Persistent cache for embedding vectors
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List
+from langchain_core.embeddings import Embeddings
+
+
+def _as_float32(vector) -> List[float]:
+    """Round a vector to the stored precision so cache hits and misses return identical values"""
+    return array('f', vector).tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model with a SQLite cache keyed by model name and a
+    hash of the text, so unchanged chunks and repeated queries are never sent
+    to the embedding API twice. The least recently used entries are evicted
+    once the cache holds more than max_entries vectors.
+    """
+
+    def __init__(self, embeddings: Embeddings, path: str, max_entries: int = 50000):
+        self.embeddings = embeddings
+        self.path = path
+        self.max_entries = max_entries
+        self.model = getattr(embeddings, 'model', type(embeddings).__name__)
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._entries = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key('document', text) for text in texts]
+        cached = self._get_many(keys)
+
+        # Embed each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = {key: _as_float32(vector) for key, vector in zip(missing.keys(), vectors)}
+            self._put_many(computed)
+            cached.update(computed)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key('query', text)
+        cached = self._get_many([key])
+        with self._lock:
+            if key in cached:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if key in cached:
+            return cached[key]
+
+        vector = _as_float32(self.embeddings.embed_query(text))
+        self._put_many({key: vector})
+        return vector
+
+    def stats(self) -> dict:
+        """Hit/miss counters since startup and the number of cached vectors"""
+        with self._lock:
+            self._connect()
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': self._entries,
+            }
+
+    def _key(self, kind: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return f"{self.model}:{kind}:{digest}"
+
+    def _connect(self):
+        """Open the database on first use (call with the lock held)"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._entries = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def _get_many(self, keys: List[str]) -> dict:
+        found = {}
+        if not keys:
+            return found
+        try:
+            with self._lock:
+                conn = self._connect()
+                unique_keys = list(dict.fromkeys(keys))
+                # Stay well under SQLite's bound parameter limit
+                for start in range(0, len(unique_keys), 500):
+                    batch = unique_keys[start:start + 500]
+                    placeholders = ','.join('?' * len(batch))
+                    rows = conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = array('f', blob).tolist()
+                if found:
+                    now = time.time()
+                    conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(now, key) for key in found]
+                    )
+                    conn.commit()
+        except sqlite3.Error as e:
+            self.logger.error(f"Error reading embedding cache: {e}")
+        return found
+
+    def _put_many(self, vectors: dict):
+        if not vectors:
+            return
+        try:
+            with self._lock:
+                conn = self._connect()
+                now = time.time()
+                # Another thread may have stored the same key meanwhile; the vector is identical
+                cursor = conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                    [(key, array('f', vector).tobytes(), now) for key, vector in vectors.items()]
+                )
+                self._entries += cursor.rowcount
+                overflow = self._entries - self.max_entries
+                if overflow > 0:
+                    conn.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (overflow,)
+                    )
+                    self._entries -= overflow
+                conn.commit()
+        except sqlite3.Error as e:
+            self.logger.error(f"Error writing embedding cache: {e}")
@@ -0,0 +1,83 @@
+"""
+Conditional GETs and response compression
+"""
+import gzip
+import os
+from datetime import datetime, timezone
+from typing import Callable, Optional
+from flask import Response, make_response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Smaller bodies aren't worth the CPU or the extra headers
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', '1024'))
+COMPRESSION_LEVEL = int(os.getenv('COMPRESSION_LEVEL', '6'))
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/plain', 'text/html', 'text/css', 'application/javascript')
+
+
+def file_etag(mtime: float, size: int) -> str:
+    """Validator for a file that changes whenever its mtime or size does"""
+    return f"{int(mtime * 1_000_000):x}-{size:x}"
+
+
+def conditional_response(etag: str, last_modified: Optional[float], build: Callable) -> Response:
+    """
+    Answer 304 Not Modified when the client's cached copy is current,
+    otherwise build the response. Either way it carries the validators and
+    asks browsers to revalidate before reusing their copy, so a repeat
+    request costs no document reads when nothing changed.
+    """
+    modified = datetime.fromtimestamp(int(last_modified), timezone.utc) if last_modified is not None else None
+    if request.if_none_match:
+        # Weak comparison, so compressed (weak) ETags still match
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        not_modified = bool(modified and request.if_modified_since and modified <= request.if_modified_since)
+
+    response = Response(status=304) if not_modified else make_response(build())
+    if response.status_code in (200, 304):
+        response.set_etag(etag)
+        if modified is not None:
+            response.last_modified = modified
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def compress_response(response: Response) -> Response:
+    """
+    Compress a buffered text or JSON body with br or gzip when the client
+    accepts it. Streamed responses (Server-Sent Events) are left alone so
+    tokens reach the client as they are produced.
+    """
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        encoding = 'br'
+    elif accepted['gzip']:
+        encoding = 'gzip'
+    else:
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESSION_MIN_BYTES:
+        return response
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=min(COMPRESSION_LEVEL, 11))
+    else:
+        compressed = gzip.compress(body, compresslevel=COMPRESSION_LEVEL)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    # The compressed bytes differ from the identity ones, so the ETag can only be weak
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,197 @@
+"""
+In-memory BM25 keyword index over the document catalog
+"""
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from catalog import catalog, CatalogEntry
+from chunking import chunk_file, name_from_filename
+from document_events import add_listener
+from metrics import span
+
+# BM25 term frequency saturation and length normalisation
+BM25_K1 = 1.5
+BM25_B = 0.75
+SNIPPET_CHARS = 200
+
+_TOKEN = re.compile(r'\w+')
+# Markdown emphasis and heading marks, dropped from snippets before matches are highlighted
+_MARKUP = re.compile(r'\*\*|__|^#+\s*')
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class IndexedDocument:
+    """A document's searchable text and the fields results are filtered on"""
+
+    def __init__(self, entry: CatalogEntry, text: str, terms: Counter):
+        self.filename = entry.filename
+        self.path = entry.path
+        self.mtime = entry.mtime
+        self.size = entry.size
+        self.fields = {
+            'filename': entry.filename,
+            'type': entry.doc_type,
+            'destination': name_from_filename(entry.filename),
+        }
+        self.text = text
+        self.terms = terms
+        self.length = sum(terms.values())
+
+
+class KeywordIndex:
+    """
+    Inverted index of term -> {filename: term frequency}, ranked with BM25.
+    A file is re-read only when it is written or the catalog reports it
+    changed, so lookups never touch the disk or the embeddings API.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._documents: Dict[str, IndexedDocument] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        self._catalog_version = None
+
+    def update(self, path: Optional[str] = None):
+        """Re-index one file after it was written or deleted; without a path, resync with the catalog"""
+        if path is None:
+            with self._lock:
+                self._catalog_version = None
+            return
+        filename = os.path.basename(path)
+        entry = catalog.get(filename)
+        with self._lock:
+            if entry is None:
+                self._remove(filename)
+            else:
+                self._index(entry)
+
+    def build(self):
+        """Index every catalogued file now rather than on the first search"""
+        self._sync()
+
+    @span('keyword_search')
+    def search(self, query: str, max_results: int = 5,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Rank documents matching any query term, best first, optionally
+        restricted by {'type', 'destination', 'filename'} filters. Each
+        result has the filename, type, destination, score and a snippet
+        with the matched terms in bold.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        self._sync()
+        with self._lock:
+            count = len(self._documents)
+            if not count:
+                return []
+            average_length = self._total_length / count
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for filename, frequency in postings.items():
+                    document = self._documents[filename]
+                    if filters and not _matches(document, filters):
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * document.length / average_length)
+                    scores[filename] = scores.get(filename, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:max_results]
+            return [
+                {
+                    **self._documents[filename].fields,
+                    'score': round(score, 4),
+                    'snippet': _snippet(self._documents[filename].text, terms),
+                }
+                for filename, score in ranked
+            ]
+
+    def _sync(self):
+        """Pick up files the catalog saw change outside the app's own writes"""
+        version = catalog.current_version()
+        if version == self._catalog_version:
+            return
+        entries = catalog.entries()
+        with self._lock:
+            current = {entry.filename: entry for entry in entries}
+            for filename in [name for name in self._documents if name not in current]:
+                self._remove(filename)
+            for entry in entries:
+                document = self._documents.get(entry.filename)
+                if document is None or (document.path, document.mtime, document.size) != \
+                        (entry.path, entry.mtime, entry.size):
+                    self._index(entry)
+            self._catalog_version = version
+
+    def _index(self, entry: CatalogEntry):
+        rel_path = os.path.relpath(entry.path, catalog.documents_dir)
+        try:
+            text = "\n".join(chunk.page_content for chunk in chunk_file(entry.path, rel_path))
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Error reading {entry.filename} for the keyword index: {e}")
+            text = ""
+        self._remove(entry.filename)
+        document = IndexedDocument(entry, text, Counter(tokenize(text)))
+        self._documents[entry.filename] = document
+        self._total_length += document.length
+        for term, frequency in document.terms.items():
+            self._postings.setdefault(term, {})[entry.filename] = frequency
+
+    def _remove(self, filename: str):
+        document = self._documents.pop(filename, None)
+        if document is None:
+            return
+        self._total_length -= document.length
+        for term in document.terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(filename, None)
+                if not postings:
+                    del self._postings[term]
+
+
+def _matches(document: IndexedDocument, filters: Dict[str, Any]) -> bool:
+    for field, value in filters.items():
+        allowed = value if isinstance(value, (list, tuple)) else (value,)
+        if document.fields.get(field) not in allowed:
+            return False
+    return True
+
+
+def _snippet(text: str, terms: List[str]) -> str:
+    """The line with the most distinct query terms, cut to SNIPPET_CHARS around the first match"""
+    wanted = set(terms)
+    best_line, best_hits = "", 0
+    for line in text.splitlines():
+        hits = len(wanted.intersection(tokenize(line)))
+        if hits > best_hits:
+            best_line, best_hits = _MARKUP.sub('', line).strip(), hits
+    if not best_hits:
+        return text[:SNIPPET_CHARS]
+
+    pattern = re.compile(r'\b(' + '|'.join(re.escape(term) for term in sorted(wanted, key=len, reverse=True)) + r')\b',
+                         re.IGNORECASE)
+    start = 0
+    if len(best_line) > SNIPPET_CHARS:
+        first = pattern.search(best_line)
+        start = max(0, min(first.start() - SNIPPET_CHARS // 4, len(best_line) - SNIPPET_CHARS))
+    snippet = best_line[start:start + SNIPPET_CHARS]
+    snippet = pattern.sub(lambda match: f"**{match.group(0)}**", snippet)
+    return ("..." if start else "") + snippet + ("..." if start + SNIPPET_CHARS < len(best_line) else "")
+
+
+keyword_index = KeywordIndex()
+add_listener(keyword_index.update)
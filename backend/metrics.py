@@ -0,0 +1,221 @@
+"""
+Lightweight in-process metrics exposed in the Prometheus text format
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Upper bounds in seconds for latency histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Bucketed observations per label set"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_number(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Holds the metrics and collectors rendered by /metrics. Collectors are
+    called at scrape time and return (name, type, help, [(labels, value)]),
+    so values other modules already track (cache stats) cost nothing per request.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors: List[Callable] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+
+        # Several collectors may report samples for the same metric family
+        families = {}
+        for collector in collectors:
+            try:
+                collected = collector()
+            except Exception as e:
+                lines.append(f"# collector error: {_escape(e)}")
+                continue
+            for name, metric_type, documentation, samples in collected:
+                families.setdefault(name, (metric_type, documentation, []))[2].extend(samples)
+        for name, (metric_type, documentation, samples) in families.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                names = tuple(labels)
+                values = tuple(labels[label] for label in names)
+                lines.append(f"{name}{_format_labels(names, values)} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    'travel_assistant_stage_seconds',
+    'Time spent in each pipeline stage',
+    ['stage']
+)
+TOOL_SECONDS = registry.histogram(
+    'travel_assistant_tool_seconds',
+    'Time spent running each agent tool',
+    ['tool']
+)
+TOOL_ERRORS = registry.counter(
+    'travel_assistant_tool_errors_total',
+    'Agent tool calls that raised or named an unknown tool',
+    ['tool']
+)
+TURN_SECONDS = registry.histogram(
+    'travel_assistant_turn_seconds',
+    'Time to complete an agent turn'
+)
+LLM_CALLS_PER_TURN = registry.histogram(
+    'travel_assistant_llm_calls_per_turn',
+    'LLM steps taken to answer one turn',
+    buckets=(1, 2, 3, 4, 5, 8, 10)
+)
+LLM_TOKENS = registry.counter(
+    'travel_assistant_llm_tokens_total',
+    'LLM tokens sent and received, estimated with tiktoken when the model does not report usage',
+    ['direction']
+)
+CONTEXT_TOKENS_SAVED = registry.histogram(
+    'travel_assistant_context_tokens_saved',
+    'Retrieved context tokens removed per turn by deduplication, trimming and the context budget',
+    buckets=(0, 50, 100, 250, 500, 1000, 2000, 4000)
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'travel_assistant_http_request_seconds',
+    'Time to produce an HTTP response (streamed bodies excluded)',
+    ['method', 'endpoint', 'status']
+)
+
+
+def span(stage: str):
+    """Time a block of code as a pipeline stage: `with span('retrieval'): ...`"""
+    return STAGE_SECONDS.time(stage=stage)
+
+
+def cache_collector(name: str, stats: Callable[[], dict]) -> Callable:
+    """Collector reporting the hit/miss counters of a cache exposing stats()"""
+    def collect():
+        current = stats()
+        return [
+            ('travel_assistant_cache_requests_total', 'counter', 'Cache lookups by result', [
+                ({'cache': name, 'result': 'hit'}, current['hits']),
+                ({'cache': name, 'result': 'miss'}, current['misses']),
+            ]),
+            ('travel_assistant_cache_entries', 'gauge', 'Entries held by each cache', [
+                ({'cache': name}, current['entries']),
+            ]),
+        ]
+    return collect
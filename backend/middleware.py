@@ -2,11 +2,152 @@
 Middleware for document processing and context injection
 """
 import os
+import re
 import json
 import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from typing import List, Dict, Optional, Any
 from datetime import datetime
-from documents import vectorstore, initialize_vectorstore
+from documents import retrieval_service
+from document_events import current_generation
+from caching import LRUCache
+from catalog import catalog, DOCUMENT_TYPES
+from chunking import name_from_filename
+from metrics import registry, span, cache_collector
+
+# Formatted search results shared by every DocumentMiddleware, keyed by the
+# document store generation so any document write invalidates them
+_context_cache = LRUCache(max_entries=512)
+registry.add_collector(cache_collector('retrieval_context', _context_cache.stats))
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+# Words that point a query at one kind of document
+TYPE_KEYWORDS = {
+    'budgets': re.compile(r'\b(budgets?|expenses)\b'),
+    'todo_lists': re.compile(r'\b(todos?|to-dos?|checklists?|packing lists?)\b'),
+    'travel_plans': re.compile(r'\b(itinerar(y|ies)|schedules?|(travel|trip) plans?)\b'),
+}
+_FILENAME = re.compile(r'[\w\-]+\.(?:txt|md|json)\b')
+
+_destinations_lock = threading.Lock()
+_destinations = (None, {})
+
+
+def known_destinations() -> Dict[str, str]:
+    """{lowercased name: name} for every destination with a document, rebuilt when the catalog changes"""
+    global _destinations
+    version = catalog.current_version()
+    with _destinations_lock:
+        if _destinations[0] != version:
+            names = {}
+            summary = catalog.summary()
+            for doc_type in DOCUMENT_TYPES:
+                for filename in summary[doc_type]:
+                    name = name_from_filename(filename)
+                    names[name.lower()] = name
+            _destinations = (version, names)
+        return _destinations[1]
+
+
+def search_filters(document_type: Optional[str] = None, destination: Optional[str] = None,
+                   filename: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build search filters from explicit values. Raises ValueError for an
+    unknown document type.
+    """
+    filters = {}
+    if filename:
+        filters['filename'] = os.path.basename(filename)
+    if document_type:
+        if document_type not in DOCUMENT_TYPES + ('other',):
+            raise ValueError(f"document_type must be one of {', '.join(DOCUMENT_TYPES + ('other',))}")
+        filters['type'] = document_type
+    if destination:
+        filters['destination'] = known_destinations().get(destination.strip().lower(), destination.strip().title())
+    return filters
+
+
+def mentioned_documents(query: str) -> Dict[str, List[str]]:
+    """
+    Extract the documents a query mentions: catalogued filenames, document
+    types named by their keywords and destinations that have a document.
+    """
+    filenames = [filename for filename in _FILENAME.findall(query) if catalog.get(filename) is not None]
+    words = re.findall(r'[\w\-]+', query.lower())
+    text = " " + " ".join(words) + " "
+    return {
+        'filenames': filenames,
+        'types': [doc_type for doc_type, pattern in TYPE_KEYWORDS.items() if pattern.search(text)],
+        'destinations': sorted(name for key, name in known_destinations().items() if f" {key} " in text),
+    }
+
+
+def filters_from_query(query: str) -> Dict[str, Any]:
+    """
+    Turn the documents a query mentions into search filters: a filename
+    narrows the search to that file, otherwise document types and
+    destinations narrow it to matching documents.
+    """
+    mentioned = mentioned_documents(query)
+    if mentioned['filenames']:
+        return {'filename': mentioned['filenames'][0]}
+
+    filters = {}
+    for field, values in (('type', mentioned['types']), ('destination', mentioned['destinations'])):
+        if values:
+            filters[field] = values[0] if len(values) == 1 else values
+    return filters
+
+
+def _where(filters: Dict[str, Any]) -> Optional[dict]:
+    """Chroma metadata filter matching every field; a list value matches any of its entries"""
+    clauses = [
+        {field: {'$in': list(value)} if isinstance(value, (list, tuple)) else value}
+        for field, value in sorted(filters.items())
+    ]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+
+def _filters_key(filters: Optional[Dict[str, Any]]) -> tuple:
+    return tuple(
+        (field, tuple(value) if isinstance(value, (list, tuple)) else value)
+        for field, value in sorted((filters or {}).items())
+    )
+
+
+# Seconds each query enhancement stage may take before the turn goes ahead without it
+STAGE_TIMEOUTS = {
+    'context': 5.0,
+    'document_summary': 2.0,
+}
+# Stages only start when a worker is free. A stage that times out keeps its
+# worker until it finishes, so when every worker is busy new stages are
+# skipped rather than queued behind the slow ones
+STAGE_WORKERS = int(os.getenv('QUERY_STAGE_WORKERS', '32'))
+_stage_pool = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix="query-enhancement")
+_stage_slots = threading.BoundedSemaphore(STAGE_WORKERS)
+
+
+def _submit_stage(fn, *args) -> Optional[Future]:
+    """Run fn on a free stage worker, or return None if all of them are busy"""
+    if not _stage_slots.acquire(blocking=False):
+        return None
+    try:
+        future = _stage_pool.submit(fn, *args)
+    except BaseException:
+        _stage_slots.release()
+        raise
+    future.add_done_callback(lambda _: _stage_slots.release())
+    return future
+
 
 class DocumentMiddleware:
     """Middleware to handle document retrieval and context injection"""
@@ -16,22 +157,46 @@ class DocumentMiddleware:
         self.max_docs = max_docs
         self.logger = logging.getLogger(__name__)
     
-    def get_relevant_context(self, query: str) -> str:
+    @span('retrieval')
+    def get_relevant_context(self, query: str, filters: Optional[Dict[str, Any]] = None,
+                             fallback: bool = False) -> str:
+        """
+        Retrieve relevant documents based on the query, reusing the result of
+        an identical search made since the last document change.
+
+        filters ({'type', 'destination', 'filename'}) restrict the search to
+        matching chunks before they are scored. With fallback, a filtered
+        search that finds nothing usable is retried over every document, for
+        filters guessed from the query rather than asked for.
         """
-        Retrieve relevant documents based on the query
+        cache_key = (current_generation(), _normalize_query(query), self.max_docs, self.similarity_threshold,
+                     _filters_key(filters), fallback)
+        context = _context_cache.get(cache_key)
+        if context is None:
+            context = self._search_context(query, filters)
+            if fallback and filters and context is not None and not context.startswith('[From '):
+                context = self._search_context(query)
+            if context is None:
+                return "Error retrieving document context."
+            _context_cache.put(cache_key, context)
+        return context
+
+    def _search_context(self, query: str, filters: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Run the similarity search and format matches above the threshold
         """
-        if vectorstore is None:
-            initialize_vectorstore()
-        
-        if vectorstore is None:
-            return "No documents available for context."
-        
         try:
-            # Perform similarity search
-            relevant_docs = vectorstore.similarity_search_with_score(
-                query, 
-                k=self.max_docs
-            )
+            with retrieval_service.read() as vectorstore:
+                if vectorstore is None:
+                    return "No documents available for context."
+
+                # Perform similarity search
+                with span('vector_search'):
+                    relevant_docs = vectorstore.similarity_search_with_score(
+                        query, 
+                        k=self.max_docs,
+                        filter=_where(filters or {})
+                    )
             
             if not relevant_docs:
                 return "No relevant documents found."
@@ -53,36 +218,15 @@ class DocumentMiddleware:
             
         except Exception as e:
             self.logger.error(f"Error retrieving document context: {e}")
-            return "Error retrieving document context."
+            return None
     
+    @span('document_summary')
     def get_document_summary(self) -> Dict[str, Any]:
         """
         Get a summary of available documents by type
         """
         try:
-            documents_dir = os.path.join(os.path.dirname(__file__), '..', 'documents')
-            summary = {
-                'travel_plans': [],
-                'budgets': [],
-                'todo_lists': [],
-                'other': []
-            }
-            
-            for root, dirs, files in os.walk(documents_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(file_path, documents_dir)
-                    
-                    if 'travel_plans' in rel_path:
-                        summary['travel_plans'].append(file)
-                    elif 'budgets' in rel_path:
-                        summary['budgets'].append(file)
-                    elif 'todo_lists' in rel_path:
-                        summary['todo_lists'].append(file)
-                    else:
-                        summary['other'].append(file)
-            
-            return summary
+            return catalog.summary()
         except Exception as e:
             self.logger.error(f"Error getting document summary: {e}")
             return {}
@@ -92,22 +236,17 @@ class DocumentMiddleware:
         Read a specific document by filename
         """
         try:
-            documents_dir = os.path.join(os.path.dirname(__file__), '..', 'documents')
-            
-            # Search for the file
-            for root, dirs, files in os.walk(documents_dir):
-                if filename in files:
-                    file_path = os.path.join(root, filename)
-                    
-                    if filename.endswith('.json'):
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            return json.dumps(data, indent=2)
-                    else:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            return f.read()
+            entry = catalog.get(filename)
+            if entry is None:
+                return None
             
-            return None
+            if filename.endswith('.json'):
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                    return json.dumps(data, indent=2)
+            else:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    return f.read()
         except Exception as e:
             self.logger.error(f"Error reading document {filename}: {e}")
             return None
@@ -115,29 +254,35 @@ class DocumentMiddleware:
 class QueryEnhancementMiddleware:
     """Middleware to enhance queries with document awareness"""
     
-    def __init__(self, document_middleware: DocumentMiddleware):
+    def __init__(self, document_middleware: DocumentMiddleware,
+                 stage_timeouts: Optional[Dict[str, float]] = None):
         self.doc_middleware = document_middleware
+        self.stage_timeouts = {**STAGE_TIMEOUTS, **(stage_timeouts or {})}
         self.logger = logging.getLogger(__name__)
     
+    @span('query_enhancement')
     def enhance_query(self, query: str) -> Dict[str, Any]:
         """
-        Enhance the query with relevant context and metadata
+        Enhance the query with relevant context and metadata.
+        
+        Retrieval and the document summary run concurrently, each with its own
+        timeout; a stage that fails, times out or finds no free worker falls
+        back to empty output instead of holding up the turn.
         """
         try:
-            # Get relevant context
-            context = self.doc_middleware.get_relevant_context(query)
+            started = time.monotonic()
+            filters = filters_from_query(query)
+            context_future = _submit_stage(self.doc_middleware.get_relevant_context, query, filters, True)
+            summary_future = _submit_stage(self.doc_middleware.get_document_summary)
             
-            # Get document summary for reference
-            doc_summary = self.doc_middleware.get_document_summary()
-            
-            # Check if query mentions specific documents
-            mentioned_docs = self._extract_mentioned_documents(query)
+            context = self._stage_result('context', context_future, started, "")
+            doc_summary = self._stage_result('document_summary', summary_future, started, {})
             
             enhanced_data = {
                 'original_query': query,
                 'context': context,
                 'document_summary': doc_summary,
-                'mentioned_documents': mentioned_docs,
+                'search_filters': filters,
                 'enhancement_timestamp': datetime.now().isoformat()
             }
             
@@ -151,55 +296,21 @@ class QueryEnhancementMiddleware:
                 'error': str(e)
             }
     
-    def _extract_mentioned_documents(self, query: str) -> List[str]:
-        """
-        Extract potentially mentioned document names from the query
-        """
-        mentioned = []
-        query_lower = query.lower()
-        
-        # Common document-related keywords
-        doc_keywords = [
-            'budget', 'plan', 'todo', 'list', 'itinerary', 
-            'schedule', 'thailand', 'hong kong', 'new zealand', 
-            'southeast asia', 'vaccination'
-        ]
-        
-        for keyword in doc_keywords:
-            if keyword in query_lower:
-                mentioned.append(keyword)
-        
-        return mentioned
-
-class ConversationMiddleware:
-    """Middleware to manage conversation context and history"""
-    
-    def __init__(self, max_history: int = 10):
-        self.max_history = max_history
-        self.logger = logging.getLogger(__name__)
-    
-    def process_conversation_context(self, current_query: str, conversation_history: List[Dict]) -> str:
-        """
-        Process conversation history to maintain context
-        """
-        if not conversation_history:
-            return ""
-        
-        # Get recent conversation
-        recent_history = conversation_history[-self.max_history:]
-        
-        # Format conversation context
-        context_parts = ["Recent conversation context:"]
-        for entry in recent_history:
-            user_msg = entry.get('user', '')
-            assistant_msg = entry.get('assistant', '')
-            
-            if user_msg:
-                context_parts.append(f"User: {user_msg}")
-            if assistant_msg:
-                context_parts.append(f"Assistant: {assistant_msg}")
-        
-        return "\n".join(context_parts)
+    def _stage_result(self, stage: str, future: Optional[Future], started: float, default: Any) -> Any:
+        """Wait for a stage until its deadline, measured from the start of the turn"""
+        if future is None:
+            self.logger.warning(f"Query enhancement stage '{stage}' skipped, all stage workers are busy")
+            return default
+        remaining = self.stage_timeouts[stage] - (time.monotonic() - started)
+        try:
+            return future.result(timeout=max(remaining, 0))
+        except FutureTimeoutError:
+            # Frees the worker if the stage hasn't started; a running one finishes in the background
+            future.cancel()
+            self.logger.warning(f"Query enhancement stage '{stage}' timed out")
+        except Exception as e:
+            self.logger.error(f"Query enhancement stage '{stage}' failed: {e}")
+        return default
 
 # Factory function to create middleware instances
 def create_middleware_stack():
@@ -212,10 +323,8 @@ def create_middleware_stack():
     )
     
     query_enhancement = QueryEnhancementMiddleware(document_middleware)
-    conversation_middleware = ConversationMiddleware(max_history=5)
     
     return {
         'document': document_middleware,
-        'query_enhancement': query_enhancement,
-        'conversation': conversation_middleware
+        'query_enhancement': query_enhancement
     }
\ No newline at end of file
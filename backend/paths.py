@@ -0,0 +1,15 @@
+"""
+Filesystem locations of the stored documents
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Set DOCUMENTS_DIR to serve a different document tree (e.g. a benchmark corpus)
+DOCUMENTS_DIR = os.path.abspath(
+    os.getenv('DOCUMENTS_DIR', os.path.join(os.path.dirname(__file__), '..', 'documents'))
+)
+TRAVEL_PLANS_DIR = os.path.join(DOCUMENTS_DIR, 'travel_plans')
+TODO_LISTS_DIR = os.path.join(DOCUMENTS_DIR, 'todo_lists')
+BUDGETS_DIR = os.path.join(DOCUMENTS_DIR, 'budgets')
@@ -1,10 +1,12 @@
 
 import os
 from datetime import datetime
+from document_events import document_changed
+from paths import TRAVEL_PLANS_DIR
 
 def save_travel_plan(destination, content):
     """Save travel plan to a file"""
-    travel_plans_dir = os.path.join(os.path.dirname(__file__), "..", "documents", "travel_plans")
+    travel_plans_dir = TRAVEL_PLANS_DIR
     os.makedirs(travel_plans_dir, exist_ok=True)
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -17,4 +19,5 @@ def save_travel_plan(destination, content):
         f.write("=" * 50 + "\n\n")
         f.write(content)
 
+    document_changed(filepath)
     return f"Saved travel plan to {filename}"
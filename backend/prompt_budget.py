@@ -0,0 +1,217 @@
+"""
+Token accounting and budgeted prompt assembly
+"""
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List
+import tiktoken
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import ChatPromptTemplate
+from metrics import span
+
+PROMPT_MODEL = "gpt-4o"
+# Token budgets for each variable part of the agent prompt
+HISTORY_TOKEN_BUDGET = int(os.getenv('PROMPT_HISTORY_TOKENS', '2000'))
+CONTEXT_TOKEN_BUDGET = int(os.getenv('PROMPT_CONTEXT_TOKENS', '3000'))
+SUMMARY_TOKEN_BUDGET = int(os.getenv('PROMPT_SUMMARY_TOKENS', '400'))
+# Approximate tokens the chat format adds around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", (
+        "You maintain a running summary of a conversation between a user and a travel planner assistant. "
+        "Update the summary with the new lines, keeping destinations, dates, budgets, preferences, "
+        "documents created and open questions. Reply with the updated summary only, "
+        "in at most {max_words} words."
+    )),
+    ("human", "Current summary:\n{summary}\n\nNew lines:\n{lines}"),
+])
+
+# Rewrites conversation summaries outside the chat turn that folded the history
+_summary_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="history-summary")
+
+_encoding = None
+_encoding_lock = threading.Lock()
+logger = logging.getLogger(__name__)
+
+
+def _get_encoding():
+    """Load the tokenizer once; fall back to a character estimate if it can't be loaded"""
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                try:
+                    _encoding = tiktoken.encoding_for_model(PROMPT_MODEL)
+                except KeyError:
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.warning(f"Could not load tokenizer, estimating token counts: {e}")
+                _encoding = False
+        return _encoding or None
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """Number of tokens in a piece of text, cached by content"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+class PromptAssembler:
+    """
+    Keeps the variable parts of the agent prompt within fixed token budgets.
+    Retrieved context is cut to whole passages, most relevant first, and once
+    the chat history outgrows its budget the oldest turns are folded into a
+    rolling summary so the prompt stops growing with conversation length.
+    """
+
+    def __init__(self, summary_llm, history_budget: int = HISTORY_TOKEN_BUDGET,
+                 context_budget: int = CONTEXT_TOKEN_BUDGET, summary_budget: int = SUMMARY_TOKEN_BUDGET):
+        self.summary_chain = SUMMARY_PROMPT | summary_llm
+        self.history_budget = history_budget
+        self.context_budget = context_budget
+        self.summary_budget = summary_budget
+        self.summary = ""
+        # Folded turns waiting to be summarized, and a counter reset() bumps so
+        # a summary started before a reset is discarded
+        self._pending: List[BaseMessage] = []
+        self._epoch = 0
+        self._summary_future = None
+        self._summary_lock = threading.Lock()
+        self._summarize_lock = threading.Lock()
+
+    def fit_context(self, context: str) -> str:
+        """Keep as many retrieved passages as fit in the context budget"""
+        if count_tokens(context) <= self.context_budget:
+            return context
+        passages = re.split(r'\n\n(?=\[From )', context)
+        kept = []
+        used = 0
+        for passage in passages:
+            tokens = count_tokens(passage)
+            if used + tokens > self.context_budget:
+                break
+            kept.append(passage)
+            used += tokens
+        if not kept:
+            return truncate_to_tokens(passages[0], self.context_budget)
+        return "\n\n".join(kept)
+
+    def conversation_context(self) -> str:
+        summary = self.summary
+        with self._summary_lock:
+            pending = _format_lines(self._pending)
+        if pending:
+            # Turns folded out of the history whose summary is still being written
+            summary = _tail_tokens(f"{summary}\n{pending}".strip(), self.summary_budget)
+        if not summary:
+            return ""
+        return f"Summary of earlier conversation:\n{summary}"
+
+    def compact(self, chat_history: List[BaseMessage], max_turns: int = 20) -> bool:
+        """
+        Fold the oldest turns of chat_history (in place) into the summary once
+        it exceeds the history budget or holds more than max_turns turns.
+        Folds down to half of both so the summary is only rewritten every few
+        turns. The folding is immediate; the summary is rewritten on a
+        background thread so the session isn't held for the LLM call.
+        Returns True if it folded.
+        """
+        total = sum(message_tokens(message) for message in chat_history)
+        if total <= self.history_budget and len(chat_history) <= 2 * max_turns:
+            return False
+        folded = []
+        # Always keep the latest turn, whatever its size
+        while (total > self.history_budget // 2 or len(chat_history) > max_turns) and len(chat_history) > 2:
+            turn = chat_history[:2]
+            del chat_history[:2]
+            total -= sum(message_tokens(message) for message in turn)
+            folded.extend(turn)
+        if not folded:
+            return False
+        with self._summary_lock:
+            self._pending.extend(folded)
+            self._summary_future = _summary_pool.submit(self._summarize_pending)
+        return True
+
+    def wait_for_summary(self, timeout: float = None):
+        """Block until the turns folded so far are summarized"""
+        future = self._summary_future
+        if future is not None:
+            future.result(timeout=timeout)
+
+    def reset(self):
+        with self._summary_lock:
+            self.summary = ""
+            self._pending = []
+            self._epoch += 1
+
+    def _summarize_pending(self):
+        # One rewrite at a time, each building on the previous summary
+        with self._summarize_lock:
+            with self._summary_lock:
+                folded, epoch = list(self._pending), self._epoch
+            if not folded:
+                return
+            summary = self._summarize(folded)
+            with self._summary_lock:
+                if epoch != self._epoch:
+                    return
+                self.summary = summary
+                del self._pending[:len(folded)]
+
+    @span('history_summarization')
+    def _summarize(self, messages: List[BaseMessage]) -> str:
+        lines = _format_lines(messages)
+        try:
+            result = self.summary_chain.invoke({
+                "summary": self.summary or "(none yet)",
+                "lines": lines,
+                "max_words": int(self.summary_budget * 0.75),
+            })
+            summary = result.content.strip() if isinstance(result.content, str) else ""
+            if summary:
+                return truncate_to_tokens(summary, self.summary_budget)
+            logger.warning("Summarizer returned no text, appending the folded turns instead")
+        except Exception as e:
+            logger.error(f"Error summarizing conversation, appending the folded turns instead: {e}")
+        # Keep the most recent part of what would otherwise be lost
+        combined = f"{self.summary}\n{lines}".strip()
+        return _tail_tokens(combined, self.summary_budget)
+
+
+def _format_lines(messages: List[BaseMessage]) -> str:
+    return "\n".join(
+        f"{'User' if message.type == 'human' else 'Assistant'}: {message.content}" for message in messages
+    )
+
+
+def _tail_tokens(text: str, max_tokens: int) -> str:
+    """The last max_tokens tokens of a piece of text"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[-max_tokens * 4:]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[-max_tokens:])
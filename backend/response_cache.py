@@ -0,0 +1,158 @@
+"""
+Semantic cache of agent answers for repeated questions
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from document_events import current_generation
+from documents import embeddings
+from metrics import registry, cache_collector
+
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+# Cosine similarity a new question needs with a cached one to reuse its answer
+RESPONSE_CACHE_THRESHOLD = float(os.getenv('RESPONSE_CACHE_THRESHOLD', '0.95'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1000'))
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '3600'))
+# Shorter questions are usually follow-ups that only make sense with the conversation
+RESPONSE_CACHE_MIN_WORDS = int(os.getenv('RESPONSE_CACHE_MIN_WORDS', '4'))
+
+
+class CachedResponse:
+    def __init__(self, question: str, answer: str, tools_used: List[str]):
+        self.question = question
+        self.answer = answer
+        self.tools_used = tools_used
+
+
+class SemanticResponseCache:
+    """
+    Answers keyed by the embedding of the question that produced them. A new
+    question reuses an answer when its cosine similarity with a cached
+    question is at least threshold and the answer was produced against the
+    current document generation, so answers that drew on the user's
+    documents expire as soon as any document changes. Holds at most
+    max_entries answers, evicting the least recently used, and drops answers
+    older than ttl seconds.
+
+    Vectors live in one preallocated matrix so a lookup is a single
+    matrix-vector product over every cached question.
+    """
+
+    def __init__(self, embeddings: Embeddings, threshold: float = RESPONSE_CACHE_THRESHOLD,
+                 max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl: Optional[float] = RESPONSE_CACHE_TTL,
+                 min_words: int = RESPONSE_CACHE_MIN_WORDS):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.min_words = min_words
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # slot -> CachedResponse, least recently used first
+        self._entries: OrderedDict = OrderedDict()
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._vectors = None
+        self._live = np.zeros(max_entries, dtype=bool)
+        self._stored_at = np.zeros(max_entries)
+        self._generation = current_generation()
+
+    def cacheable(self, question: str) -> bool:
+        return len(question.split()) >= self.min_words
+
+    def lookup(self, question: str) -> Optional[CachedResponse]:
+        """The cached answer to the most similar earlier question, if similar enough"""
+        if not self.cacheable(question):
+            return None
+        vector = self._embed(question)
+        if vector is None:
+            return None
+        generation = current_generation()
+        with self._lock:
+            self._expire(generation)
+            if self._vectors is None or not self._entries:
+                self.misses += 1
+                return None
+            scores = self._vectors @ vector
+            scores[~self._live] = -1.0
+            slot = int(np.argmax(scores))
+            if scores[slot] < self.threshold:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return self._entries[slot]
+
+    def store(self, question: str, answer: str, tools_used: List[str], generation: int):
+        """Cache an answer produced against the given document generation"""
+        if not self.cacheable(question) or not answer:
+            return
+        vector = self._embed(question)
+        if vector is None:
+            return
+        with self._lock:
+            if generation != current_generation():
+                # Documents changed while the answer was being produced
+                return
+            self._expire(generation)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            if not self._free_slots:
+                self._release(next(iter(self._entries)))
+            slot = self._free_slots.pop()
+            self._vectors[slot] = vector
+            self._live[slot] = True
+            self._stored_at[slot] = time.monotonic()
+            self._entries[slot] = CachedResponse(question, answer, list(tools_used))
+
+    def clear(self):
+        with self._lock:
+            for slot in list(self._entries):
+                self._release(slot)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self._entries),
+            }
+
+    def _embed(self, question: str) -> Optional[np.ndarray]:
+        try:
+            # Same text retrieval embeds, so the embedding cache serves one of the two
+            vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        except Exception as e:
+            self.logger.error(f"Error embedding question for the response cache: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, generation: int):
+        """Drop answers from earlier document generations or past their TTL (call with the lock held)"""
+        if generation != self._generation:
+            for slot in list(self._entries):
+                self._release(slot)
+            self._generation = generation
+        elif self.ttl is not None and self._entries:
+            expired = np.flatnonzero(self._live & (self._stored_at < time.monotonic() - self.ttl))
+            for slot in expired:
+                self._release(int(slot))
+
+    def _release(self, slot: int):
+        del self._entries[slot]
+        self._live[slot] = False
+        self._free_slots.append(slot)
+
+
+response_cache = SemanticResponseCache(embeddings) if RESPONSE_CACHE_ENABLED else None
+if response_cache is not None:
+    registry.add_collector(cache_collector('responses', response_cache.stats))
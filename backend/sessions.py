@@ -0,0 +1,120 @@
+"""
+Per-session conversation state
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import List, Optional
+from chat_model import CustomAgentExecutor
+from metrics import registry
+
+# Most sessions kept in memory before the least recently used is dropped
+MAX_SESSIONS = int(os.getenv('SESSION_MAX_COUNT', '2000'))
+# Most conversation turns kept per session
+HISTORY_LIMIT = int(os.getenv('SESSION_HISTORY_LIMIT', '20'))
+
+
+class Session:
+    """
+    One user's conversation: a bounded turn history and the agent executor
+    holding its chat messages. Hold the lock for the whole of a chat turn so
+    concurrent requests in the same session run one after another.
+    """
+
+    def __init__(self, session_id: str, history_limit: int = HISTORY_LIMIT):
+        self.session_id = session_id
+        self.history = deque(maxlen=history_limit)
+        self.lock = threading.Lock()
+        self.last_used = time.time()
+        self._history_limit = history_limit
+        self._agent = None
+
+    @property
+    def agent(self) -> CustomAgentExecutor:
+        """The session's executor, created on its first chat turn"""
+        if self._agent is None:
+            self._agent = CustomAgentExecutor(max_iterations=3, max_history_turns=self._history_limit)
+        return self._agent
+
+    def add_turn(self, user_message: str, response: str, timestamp: str):
+        self.history.append({
+            'user': user_message,
+            'assistant': response,
+            'timestamp': timestamp
+        })
+
+    def get_history(self) -> List[dict]:
+        return list(self.history)
+
+    def clear(self):
+        self.history.clear()
+        if self._agent is not None:
+            self._agent.reset()
+
+
+class SessionStore:
+    """
+    Thread-safe map of session ID -> Session holding at most max_sessions,
+    evicting the least recently used session when a new one is created.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, history_limit: int = HISTORY_LIMIT):
+        self.max_sessions = max_sessions
+        self.history_limit = history_limit
+        self.evictions = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: Optional[str] = None) -> Session:
+        """Return the session for an ID, creating it (with a new ID if none is given)"""
+        session_id = session_id or uuid.uuid4().hex
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session(session_id, self.history_limit)
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_used = time.time()
+            return session
+
+    def peek(self, session_id: Optional[str]) -> Optional[Session]:
+        """Return an existing session without creating one or refreshing its position"""
+        with self._lock:
+            return self._sessions.get(session_id) if session_id else None
+
+    def drop(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'evictions': self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+session_store = SessionStore()
+
+
+def _session_metrics():
+    stats = session_store.stats()
+    return [
+        ('travel_assistant_sessions', 'gauge', 'Conversation sessions held in memory',
+         [({}, stats['sessions'])]),
+        ('travel_assistant_session_evictions_total', 'counter', 'Sessions dropped to stay under the session cap',
+         [({}, stats['evictions'])]),
+    ]
+
+
+registry.add_collector(_session_metrics)
@@ -0,0 +1,919 @@
+"""
+Storage for todo lists and budgets
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from document_events import document_changed
+from paths import DOCUMENTS_DIR, TODO_LISTS_DIR, BUDGETS_DIR
+
+# "sqlite" keeps lists in one database; "json" reads and rewrites one file per list
+LIST_STORAGE = os.getenv('LIST_STORAGE', 'sqlite').lower()
+LIST_DB_PATH = os.getenv('LIST_DB_PATH', os.path.join(DOCUMENTS_DIR, '.lists.sqlite'))
+# Seconds to wait before writing a changed list out as JSON, so bursts of edits produce one write
+LIST_EXPORT_DELAY = float(os.getenv('LIST_EXPORT_DELAY', '0.2'))
+
+LIST_DIRS = {
+    'todo_lists': TODO_LISTS_DIR,
+    'budgets': BUDGETS_DIR,
+}
+# Locks serializing writes to JSON list files; each file maps to one of them
+JSON_LOCK_STRIPES = 64
+# Item field that identifies duplicates within a list
+ITEM_KEYS = {
+    'todo_lists': 'text',
+    'budgets': 'name',
+}
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def new_list_filename(title: str) -> str:
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{title.lower().replace(' ', '_')}_{timestamp}.json"
+
+
+def list_path(kind: str, filename: str) -> str:
+    return os.path.join(LIST_DIRS[kind], filename)
+
+
+def write_json_atomic(filepath: str, data: dict):
+    """
+    Write JSON to a temporary file in the same directory and rename it over
+    filepath, so readers and crashes never see a half-written list
+    """
+    directory = os.path.dirname(filepath)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(filepath), suffix='.tmp')
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _item_id(item: dict) -> Optional[int]:
+    try:
+        return int(item.get('id'))
+    except (TypeError, ValueError):
+        return None
+
+
+def next_item_id(data: dict) -> int:
+    """
+    Id for the next item added to a list. Kept in the list rather than
+    derived from its items, so ids of removed items are never handed out
+    again.
+    """
+    highest = max((_item_id(item) or 0 for item in data.get("items", [])), default=0)
+    try:
+        stored = int(data.get("next_item_id") or 1)
+    except (TypeError, ValueError):
+        stored = 1
+    return max(stored, highest + 1)
+
+
+def _item_id_of(operation: dict) -> int:
+    try:
+        return int(operation['id'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Operation '{operation.get('op')}' needs an item id")
+
+
+def _added_item(kind: str, operation: dict, item_id: int, now: str) -> dict:
+    fields = operation.get('item')
+    if not isinstance(fields, dict):
+        raise ValueError("Operation 'add' needs an item object")
+    item = {"id": item_id, **{field: value for field, value in fields.items() if field != "id"}}
+    if kind == 'todo_lists':
+        item.setdefault("completed", False)
+    item.setdefault("created", now)
+    return item
+
+
+def _edited_item(operation: dict, item: dict) -> dict:
+    name = operation.get('op')
+    if name == 'toggle':
+        completed = operation['completed'] if 'completed' in operation else not item.get('completed', False)
+        return {**item, "completed": bool(completed)}
+    changes = operation.get('changes')
+    if not isinstance(changes, dict):
+        raise ValueError("Operation 'edit' needs a changes object")
+    return {**item, **{field: value for field, value in changes.items() if field != "id"}}
+
+
+def _target_index(operation: dict) -> int:
+    try:
+        index = int(operation['index'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Operation 'reorder' needs an index")
+    if index < 0:
+        raise ValueError("Operation 'reorder' needs a non-negative index")
+    return index
+
+
+def _new_items(items: List[dict], existing_keys: set, next_id: int, key: Optional[str]):
+    """
+    Split items into those to add, numbered from next_id, and duplicates of
+    an existing key or of an earlier item in the batch (key None adds all)
+    """
+    added, skipped = [], []
+    seen = set(existing_keys)
+    for item in items:
+        value = item.get(key) if key is not None else None
+        if value is not None:
+            if str(value) in seen:
+                skipped.append(item)
+                continue
+            seen.add(str(value))
+        added.append({"id": next_id, **{field: value for field, value in item.items() if field != "id"}})
+        next_id += 1
+    return added, skipped
+
+
+class ListStore(ABC):
+    """
+    Todo lists and budgets, addressed by kind ("todo_lists" or "budgets") and
+    filename. A list is {"title", "created", "updated", "next_item_id",
+    "items"}; next_item_id only ever increases, so an id is never reused
+    within a list. version increases whenever any list changes.
+    """
+
+    version = 0
+
+    @abstractmethod
+    def create(self, kind: str, title: str, items: List[dict]) -> str:
+        """Store a new list and return its filename"""
+
+    @abstractmethod
+    def get(self, kind: str, filename: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def list(self, kind: str) -> List[dict]:
+        """Listing fields of every list of a kind, newest first"""
+
+    @abstractmethod
+    def stat(self, kind: str, filename: str) -> Optional[Tuple[str, Optional[float]]]:
+        """
+        (tag, modified timestamp) of a list without loading its items; the
+        tag changes on every write. None if the list doesn't exist.
+        """
+
+    @abstractmethod
+    def most_recent(self, kind: str) -> Optional[str]:
+        """Filename of the most recently updated list of a kind"""
+
+    @abstractmethod
+    def update(self, kind: str, filename: str, change: Callable[[List[dict]], List[dict]]) -> Optional[dict]:
+        """
+        Replace a list's items with change(items) as one transaction, so
+        concurrent updates never lose each other's items. Returns the
+        updated list, or None if it doesn't exist.
+        """
+
+    @abstractmethod
+    def add_items(self, kind: str, filename: str, items: List[dict],
+                  skip_duplicates: bool = True) -> Optional[List[dict]]:
+        """
+        Append items in one read-modify-write, numbering them from the list's
+        next_item_id. With skip_duplicates, items whose key field
+        (ITEM_KEYS) matches an existing item are left out. Returns the
+        skipped items, or None if the list doesn't exist.
+        """
+
+    @abstractmethod
+    def apply_operations(self, kind: str, filename: str, operations: List[dict]) -> Optional[dict]:
+        """
+        Apply a batch of item operations in one write, all or nothing:
+
+            {"op": "add", "item": {...}}
+            {"op": "toggle", "id": 3}  (or with "completed": true/false)
+            {"op": "edit", "id": 3, "changes": {...}}
+            {"op": "remove", "id": 3}
+            {"op": "reorder", "id": 3, "index": 0}
+
+        Returns {"changed": [items], "removed": [ids], "updated": timestamp},
+        plus "order": [ids] with every item id in list order when the batch
+        reorders, or None if the list doesn't exist. Raises ValueError for an invalid
+        operation, leaving the list untouched.
+        """
+
+    @abstractmethod
+    def delete(self, kind: str, filename: str) -> bool:
+        ...
+
+    def replace_items(self, kind: str, filename: str, items: List[dict]) -> Optional[dict]:
+        return self.update(kind, filename, lambda current: items)
+
+
+class JsonListStore(ListStore):
+    """
+    One pretty-printed JSON file per list, listed through the document
+    catalog. Mutations of a file are serialized by a lock chosen by hashing
+    its path from a fixed set, and written atomically.
+    """
+
+    def __init__(self):
+        self._locks = [threading.Lock() for _ in range(JSON_LOCK_STRIPES)]
+
+    def create(self, kind: str, title: str, items: List[dict]) -> str:
+        os.makedirs(LIST_DIRS[kind], exist_ok=True)
+        filename = new_list_filename(title)
+        now = _now()
+        self._write(list_path(kind, filename), {
+            "title": title,
+            "created": now,
+            "updated": now,
+            "next_item_id": next_item_id({"items": items}),
+            "items": items,
+        })
+        return filename
+
+    def get(self, kind: str, filename: str) -> Optional[dict]:
+        filepath = list_path(kind, filename)
+        if not os.path.exists(filepath):
+            return None
+        with open(filepath, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def list(self, kind: str) -> List[dict]:
+        from catalog import catalog
+
+        lists = []
+        for entry in catalog.list(kind, '.json'):
+            if entry.meta.get('unreadable'):
+                continue
+            lists.append({'filename': entry.filename, **{
+                key: value for key, value in entry.meta.items() if key != 'destination'
+            }})
+        lists.sort(key=lambda summary: summary['created'], reverse=True)
+        return lists
+
+    def stat(self, kind: str, filename: str) -> Optional[Tuple[str, Optional[float]]]:
+        try:
+            stat = os.stat(list_path(kind, filename))
+        except OSError:
+            return None
+        return f"{stat.st_mtime_ns:x}-{stat.st_size:x}", stat.st_mtime
+
+    def most_recent(self, kind: str) -> Optional[str]:
+        from catalog import catalog
+
+        entry = catalog.most_recent(kind, '.json')
+        return entry.filename if entry else None
+
+    def update(self, kind: str, filename: str, change: Callable[[List[dict]], List[dict]]) -> Optional[dict]:
+        with self._lock_for(kind, filename):
+            data = self.get(kind, filename)
+            if data is None:
+                return None
+            data["next_item_id"] = next_item_id(data)
+            data["items"] = change(data.get("items", []))
+            data["next_item_id"] = next_item_id(data)
+            data["updated"] = _now()
+            self._write(list_path(kind, filename), data)
+            return data
+
+    def add_items(self, kind: str, filename: str, items: List[dict],
+                  skip_duplicates: bool = True) -> Optional[List[dict]]:
+        key = ITEM_KEYS[kind] if skip_duplicates else None
+        with self._lock_for(kind, filename):
+            data = self.get(kind, filename)
+            if data is None:
+                return None
+            existing = data.setdefault("items", [])
+            existing_keys = {str(item[key]) for item in existing if key and item.get(key) is not None}
+            added, skipped = _new_items(items, existing_keys, next_item_id(data), key)
+            if added:
+                existing.extend(added)
+                data["next_item_id"] = next_item_id(data)
+                data["updated"] = _now()
+                self._write(list_path(kind, filename), data)
+            return skipped
+
+    def apply_operations(self, kind: str, filename: str, operations: List[dict]) -> Optional[dict]:
+        """
+        Removed items leave a None behind until the list is compacted, once
+        at the end of the batch or before a reorder needs the live order, and
+        a reorder only renumbers the items it shifts, so positions are not
+        rebuilt for every operation
+        """
+        now = _now()
+        with self._lock_for(kind, filename):
+            data = self.get(kind, filename)
+            if data is None:
+                return None
+            items = data.setdefault("items", [])
+            positions = {_item_id(item): index for index, item in enumerate(items)}
+            next_id = next_item_id(data)
+            changed, removed = {}, []
+            reordered = False
+            holes = False
+
+            def find(operation):
+                item_id = _item_id_of(operation)
+                if item_id not in positions:
+                    raise ValueError(f"Item {item_id} not found")
+                return item_id, positions[item_id]
+
+            def compact():
+                items[:] = [item for item in items if item is not None]
+                positions.clear()
+                positions.update((_item_id(item), index) for index, item in enumerate(items))
+
+            for operation in operations:
+                name = operation.get('op')
+                if name == 'add':
+                    item = _added_item(kind, operation, next_id, now)
+                    next_id += 1
+                    data["next_item_id"] = next_id
+                    items.append(item)
+                    positions[item["id"]] = len(items) - 1
+                    changed[item["id"]] = True
+                elif name in ('toggle', 'edit'):
+                    item_id, index = find(operation)
+                    items[index] = _edited_item(operation, items[index])
+                    changed[item_id] = True
+                elif name == 'remove':
+                    item_id, index = find(operation)
+                    items[index] = None
+                    del positions[item_id]
+                    holes = True
+                    removed.append(item_id)
+                    changed.pop(item_id, None)
+                elif name == 'reorder':
+                    item_id, _ = find(operation)
+                    target = _target_index(operation)
+                    if holes:
+                        compact()
+                        holes = False
+                    index = positions[item_id]
+                    target = min(target, len(items) - 1)
+                    items.insert(target, items.pop(index))
+                    for position in range(min(index, target), max(index, target) + 1):
+                        positions[_item_id(items[position])] = position
+                    changed[item_id] = True
+                    reordered = True
+                else:
+                    raise ValueError(f"Unknown operation '{name}'")
+
+            if holes:
+                compact()
+            if changed or removed:
+                data["updated"] = now
+                self._write(list_path(kind, filename), data)
+            result = {
+                "changed": [items[positions[item_id]] for item_id in changed],
+                "removed": removed,
+                "updated": data.get("updated", now),
+            }
+            if reordered:
+                result["order"] = [_item_id(item) for item in items]
+            return result
+
+    def delete(self, kind: str, filename: str) -> bool:
+        filepath = list_path(kind, filename)
+        with self._lock_for(kind, filename):
+            if not os.path.exists(filepath):
+                return False
+            os.remove(filepath)
+        document_changed(filepath)
+        return True
+
+    @property
+    def version(self) -> int:
+        from catalog import catalog
+
+        # Listings come from the catalog, so they change exactly when it does
+        return catalog.current_version()
+
+    def _lock_for(self, kind: str, filename: str) -> threading.Lock:
+        return self._locks[hash(list_path(kind, filename)) % len(self._locks)]
+
+    @staticmethod
+    def _write(filepath: str, data: dict):
+        write_json_atomic(filepath, data)
+        document_changed(filepath)
+
+
+class SqliteListStore(ListStore):
+    """
+    Lists and their items as rows in a SQLite database in WAL mode. Item
+    updates run in a single transaction. Each list row carries its item
+    count, completed count and amount total, adjusted by every item write in
+    the same transaction, so listings are one indexed query that neither
+    parses nor aggregates items.
+
+    The documents directory stays the source for search and the document
+    tools, so each changed list is still written out as JSON, in the
+    background and at most once per export_delay seconds however many edits
+    it receives. JSON lists the database doesn't have, such as lists saved
+    before it existed or files copied into the documents directory, are
+    imported when it is opened and when the catalog sees them appear.
+    Edits made to the files of lists it already has are not read back.
+    """
+
+    def __init__(self, path: str = LIST_DB_PATH, export_delay: float = LIST_EXPORT_DELAY):
+        self.path = path
+        self.export_delay = export_delay
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pending = set()
+        self._export_timer = None
+        self._export_lock = threading.Lock()
+        # Held while exporting so an older snapshot can't be written over a newer one
+        self._export_run_lock = threading.Lock()
+        # Increases with every committed change, for listing caches and ETags
+        self.version = 0
+        # Catalog version each kind was last checked for new JSON files at, and
+        # lists deleted here whose files may not have been removed yet
+        self._catalog_versions: Dict[str, int] = {}
+        self._deleted = set()
+
+    def create(self, kind: str, title: str, items: List[dict]) -> str:
+        now = _now()
+        base = new_list_filename(title)
+        with self._transaction() as conn:
+            filename = base
+            suffix = 1
+            # Two lists with the same title created in the same second
+            while conn.execute("SELECT 1 FROM lists WHERE kind = ? AND filename = ?", (kind, filename)).fetchone():
+                suffix += 1
+                filename = f"{base[:-len('.json')]}_{suffix}.json"
+            list_id = conn.execute(
+                "INSERT INTO lists (kind, filename, title, created, updated) VALUES (?, ?, ?, ?, ?)",
+                (kind, filename, title, now, now)
+            ).lastrowid
+            self._insert_items(conn, list_id, kind, items)
+            self._deleted.discard((kind, filename))
+        self._schedule_export(kind, filename)
+        return filename
+
+    def get(self, kind: str, filename: str) -> Optional[dict]:
+        self._import_untracked(kind)
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT id, title, created, updated, next_item_id FROM lists WHERE kind = ? AND filename = ?",
+                (kind, filename)
+            ).fetchone()
+            if row is None:
+                return None
+            return {
+                "title": row[1],
+                "created": row[2],
+                "updated": row[3],
+                "next_item_id": row[4],
+                "items": self._select_items(conn, row[0]),
+            }
+
+    def list(self, kind: str) -> List[dict]:
+        self._import_untracked(kind)
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT filename, title, created, updated, item_count, completed_count, total_amount "
+                "FROM lists WHERE kind = ? ORDER BY created DESC",
+                (kind,)
+            ).fetchall()
+        lists = []
+        for filename, title, created, updated, item_count, completed_count, total_amount in rows:
+            summary = {
+                'filename': filename,
+                'title': title,
+                'created': created,
+                'updated': updated,
+                'item_count': item_count,
+            }
+            if kind == 'todo_lists':
+                summary['completed_count'] = completed_count
+            else:
+                # Rounded so repeated additions and subtractions don't leave float residue
+                summary['total_amount'] = round(total_amount, 9)
+            lists.append(summary)
+        return lists
+
+    def stat(self, kind: str, filename: str) -> Optional[Tuple[str, Optional[float]]]:
+        self._import_untracked(kind)
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT id, updated FROM lists WHERE kind = ? AND filename = ?", (kind, filename)
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            modified = datetime.fromisoformat(row[1]).timestamp()
+        except ValueError:
+            # Imported lists may carry any "updated" string
+            modified = None
+        return f"{row[0]:x}-{hashlib.sha1(row[1].encode('utf-8')).hexdigest()[:16]}", modified
+
+    def most_recent(self, kind: str) -> Optional[str]:
+        self._import_untracked(kind)
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT filename FROM lists WHERE kind = ? ORDER BY updated DESC LIMIT 1", (kind,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def update(self, kind: str, filename: str, change: Callable[[List[dict]], List[dict]]) -> Optional[dict]:
+        now = _now()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id, title, created FROM lists WHERE kind = ? AND filename = ?", (kind, filename)
+            ).fetchone()
+            if row is None:
+                return None
+            list_id = row[0]
+            items = change(self._select_items(conn, list_id))
+            conn.execute("DELETE FROM items WHERE list_id = ?", (list_id,))
+            conn.execute(
+                "UPDATE lists SET item_count = 0, completed_count = 0, total_amount = 0 WHERE id = ?", (list_id,)
+            )
+            self._insert_items(conn, list_id, kind, items)
+            conn.execute("UPDATE lists SET updated = ? WHERE id = ?", (now, list_id))
+            next_id = conn.execute("SELECT next_item_id FROM lists WHERE id = ?", (list_id,)).fetchone()[0]
+        self._schedule_export(kind, filename)
+        return {"title": row[1], "created": row[2], "updated": now, "next_item_id": next_id, "items": items}
+
+    def add_items(self, kind: str, filename: str, items: List[dict],
+                  skip_duplicates: bool = True) -> Optional[List[dict]]:
+        key = ITEM_KEYS[kind] if skip_duplicates else None
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id, next_item_id FROM lists WHERE kind = ? AND filename = ?", (kind, filename)
+            ).fetchone()
+            if row is None:
+                return None
+            list_id, next_id = row
+            # Only the candidate keys are looked up, through the (list_id, key) index
+            existing_keys = set()
+            if key is not None:
+                candidates = list({str(item.get(key)) for item in items if item.get(key) is not None})
+                for start in range(0, len(candidates), 500):
+                    batch = candidates[start:start + 500]
+                    placeholders = ','.join('?' * len(batch))
+                    existing_keys.update(value for (value,) in conn.execute(
+                        f"SELECT key FROM items WHERE list_id = ? AND key IN ({placeholders})",
+                        [list_id] + batch
+                    ))
+            max_position = conn.execute(
+                "SELECT MAX(position) FROM items WHERE list_id = ?", (list_id,)
+            ).fetchone()[0]
+            added, skipped = _new_items(items, existing_keys, next_id, key)
+            if added:
+                self._insert_items(conn, list_id, kind, added,
+                                   start=-1 if max_position is None else max_position)
+                conn.execute("UPDATE lists SET updated = ? WHERE id = ?", (_now(), list_id))
+        if added:
+            self._schedule_export(kind, filename)
+        return skipped
+
+    def apply_operations(self, kind: str, filename: str, operations: List[dict]) -> Optional[dict]:
+        """Only the rows an operation touches are written; a reorder shifts the items between the two positions"""
+        now = _now()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id, next_item_id FROM lists WHERE kind = ? AND filename = ?", (kind, filename)
+            ).fetchone()
+            if row is None:
+                return None
+            list_id, next_id = row
+            changed, removed = {}, []
+            reordered = False
+            for operation in operations:
+                name = operation.get('op')
+                if name == 'add':
+                    max_position = conn.execute(
+                        "SELECT MAX(position) FROM items WHERE list_id = ?", (list_id,)
+                    ).fetchone()[0]
+                    item = _added_item(kind, operation, next_id, now)
+                    next_id += 1
+                    self._insert_items(conn, list_id, kind, [item],
+                                       start=-1 if max_position is None else max_position)
+                    changed[item["id"]] = item
+                    continue
+                if name not in ('toggle', 'edit', 'remove', 'reorder'):
+                    raise ValueError(f"Unknown operation '{name}'")
+                item_id = _item_id_of(operation)
+                found = conn.execute(
+                    "SELECT position, completed, amount, data FROM items "
+                    "WHERE list_id = ? AND item_id = ? ORDER BY position LIMIT 1",
+                    (list_id, item_id)
+                ).fetchone()
+                if found is None:
+                    raise ValueError(f"Item {item_id} not found")
+                position, completed, amount, item = found[0], found[1], found[2], json.loads(found[3])
+                if name == 'remove':
+                    conn.execute("DELETE FROM items WHERE list_id = ? AND position = ?", (list_id, position))
+                    self._add_totals(conn, list_id, -1, -completed, -amount)
+                    removed.append(item_id)
+                    changed.pop(item_id, None)
+                    continue
+                if name == 'reorder':
+                    self._move_item(conn, list_id, position, _target_index(operation))
+                    reordered = True
+                else:
+                    item = _edited_item(operation, item)
+                    columns = self._item_columns(kind, item)
+                    conn.execute(
+                        "UPDATE items SET item_id = ?, key = ?, completed = ?, amount = ?, data = ? "
+                        "WHERE list_id = ? AND position = ?",
+                        (*columns, json.dumps(item, ensure_ascii=False), list_id, position)
+                    )
+                    self._add_totals(conn, list_id, 0, columns[2] - completed, columns[3] - amount)
+                changed[item_id] = item
+            if changed or removed:
+                conn.execute("UPDATE lists SET updated = ? WHERE id = ?", (now, list_id))
+            else:
+                now = conn.execute("SELECT updated FROM lists WHERE id = ?", (list_id,)).fetchone()[0]
+            result = {"changed": list(changed.values()), "removed": removed, "updated": now}
+            if reordered:
+                result["order"] = [item_id for (item_id,) in conn.execute(
+                    "SELECT item_id FROM items WHERE list_id = ? ORDER BY position", (list_id,)
+                )]
+        if changed or removed:
+            self._schedule_export(kind, filename)
+        return result
+
+    @staticmethod
+    def _move_item(conn: sqlite3.Connection, list_id: int, position: int, index: int):
+        """Move the item at position so it ends up at index, shifting only the items in between"""
+        target = conn.execute(
+            "SELECT position FROM items WHERE list_id = ? AND position != ? ORDER BY position LIMIT 1 OFFSET ?",
+            (list_id, position, index)
+        ).fetchone()
+        if target is None:
+            # Past the last item: move to the end
+            last = conn.execute("SELECT MAX(position) FROM items WHERE list_id = ?", (list_id,)).fetchone()[0]
+            if last != position:
+                conn.execute("UPDATE items SET position = ? WHERE list_id = ? AND position = ?",
+                             (last + 1, list_id, position))
+            return
+        target = target[0]
+        # Park the item at -1 and shift the others through negative positions, so the
+        # (list_id, position) key never holds two rows at once
+        conn.execute("UPDATE items SET position = -1 WHERE list_id = ? AND position = ?", (list_id, position))
+        if target < position:
+            conn.execute("UPDATE items SET position = -position - 2 "
+                         "WHERE list_id = ? AND position >= ? AND position < ?", (list_id, target, position))
+            conn.execute("UPDATE items SET position = -position - 1 WHERE list_id = ? AND position <= -2",
+                         (list_id,))
+            new_position = target
+        else:
+            conn.execute("UPDATE items SET position = -position - 2 "
+                         "WHERE list_id = ? AND position > ? AND position < ?", (list_id, position, target))
+            conn.execute("UPDATE items SET position = -position - 3 WHERE list_id = ? AND position <= -2",
+                         (list_id,))
+            new_position = target - 1
+        conn.execute("UPDATE items SET position = ? WHERE list_id = ? AND position = -1", (new_position, list_id))
+
+    def delete(self, kind: str, filename: str) -> bool:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM lists WHERE kind = ? AND filename = ?", (kind, filename)
+            ).fetchone()
+            if row is None:
+                return False
+            conn.execute("DELETE FROM items WHERE list_id = ?", (row[0],))
+            conn.execute("DELETE FROM lists WHERE id = ?", (row[0],))
+            self._deleted.add((kind, filename))
+        self._schedule_export(kind, filename)
+        return True
+
+    def flush(self):
+        """Write out every pending list change now"""
+        with self._export_lock:
+            if self._export_timer is not None:
+                self._export_timer.cancel()
+                self._export_timer = None
+        self._export()
+
+    def migrate_json(self, conn: sqlite3.Connection) -> int:
+        """Import the JSON lists in the documents directory not yet in the database (call inside a transaction)"""
+        imported = 0
+        for kind, directory in LIST_DIRS.items():
+            if not os.path.isdir(directory):
+                continue
+            for filename in sorted(os.listdir(directory)):
+                if filename.endswith('.json') and not filename.startswith('.'):
+                    imported += self._import_file(conn, kind, filename)
+        return imported
+
+    def _import_untracked(self, kind: str):
+        """
+        Import JSON lists of a kind that appeared in the documents directory
+        since the last check, e.g. copied in while the app is running. Only
+        runs when the catalog has changed.
+        """
+        from catalog import catalog
+
+        version = catalog.current_version()
+        if self._catalog_versions.get(kind) == version:
+            return
+        with self._lock:
+            tracked = {filename for (filename,) in self._connect().execute(
+                "SELECT filename FROM lists WHERE kind = ?", (kind,)
+            )}
+        untracked = [
+            entry.filename for entry in catalog.list(kind, '.json')
+            if entry.filename not in tracked and (kind, entry.filename) not in self._deleted
+        ]
+        if untracked:
+            with self._transaction() as conn:
+                imported = sum(self._import_file(conn, kind, filename) for filename in untracked)
+            if imported:
+                self.logger.info(f"Imported {imported} new JSON lists into {self.path}")
+        self._catalog_versions[kind] = version
+
+    def _import_file(self, conn: sqlite3.Connection, kind: str, filename: str) -> int:
+        """Import one JSON list unless the database already has it; returns 1 if imported"""
+        filepath = list_path(kind, filename)
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            items = data.get('items', [])
+            if not isinstance(items, list):
+                raise ValueError("items is not a list")
+            modified = datetime.fromtimestamp(os.path.getmtime(filepath)).isoformat()
+        except (OSError, ValueError, AttributeError) as e:
+            self.logger.warning(f"Skipping unreadable list {filename}: {e}")
+            return 0
+        if conn.execute("SELECT 1 FROM lists WHERE kind = ? AND filename = ?", (kind, filename)).fetchone():
+            return 0
+        list_id = conn.execute(
+            "INSERT INTO lists (kind, filename, title, created, updated, next_item_id) VALUES (?, ?, ?, ?, ?, ?)",
+            (kind, filename, data.get('title', filename.split('_')[0].title()),
+             data.get('created', modified), data.get('updated', modified), next_item_id(data))
+        ).lastrowid
+        self._insert_items(conn, list_id, kind, items)
+        return 1
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use, importing JSON lists it doesn't have yet (call with the lock held)"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Autocommit mode; writes open their own transactions
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS lists ("
+                "id INTEGER PRIMARY KEY, kind TEXT NOT NULL, filename TEXT NOT NULL, "
+                "title TEXT NOT NULL, created TEXT NOT NULL, updated TEXT NOT NULL, "
+                "item_count INTEGER NOT NULL DEFAULT 0, completed_count INTEGER NOT NULL DEFAULT 0, "
+                "total_amount REAL NOT NULL DEFAULT 0, next_item_id INTEGER NOT NULL DEFAULT 1, "
+                "UNIQUE (kind, filename))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                "list_id INTEGER NOT NULL REFERENCES lists (id), position INTEGER NOT NULL, "
+                "item_id INTEGER, key TEXT, "
+                "completed INTEGER NOT NULL DEFAULT 0, amount REAL NOT NULL DEFAULT 0, data TEXT NOT NULL, "
+                "PRIMARY KEY (list_id, position))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS items_key ON items (list_id, key)")
+            conn.execute("CREATE INDEX IF NOT EXISTS items_item_id ON items (list_id, item_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS lists_kind_created ON lists (kind, created)")
+            conn.execute("CREATE INDEX IF NOT EXISTS lists_kind_updated ON lists (kind, updated)")
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                imported = self.migrate_json(conn)
+                if imported:
+                    self.logger.info(f"Imported {imported} JSON lists into {self.path}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                conn.close()
+                raise
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        """Run a block in an IMMEDIATE transaction, committing unless it raises"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            self.version += 1
+
+    @staticmethod
+    def _select_items(conn: sqlite3.Connection, list_id: int) -> List[dict]:
+        # One json.loads over the joined rows is far cheaper than one per item on long lists
+        (joined,) = conn.execute(
+            "SELECT group_concat(data, ',') FROM "
+            "(SELECT data FROM items WHERE list_id = ? ORDER BY position)", (list_id,)
+        ).fetchone()
+        return json.loads(f"[{joined}]") if joined else []
+
+    @staticmethod
+    def _item_columns(kind: str, item: dict) -> tuple:
+        """(item_id, key, completed, amount) stored alongside an item's JSON for indexed queries"""
+        try:
+            amount = float(item.get('amount', 0) or 0)
+        except (TypeError, ValueError):
+            amount = 0.0
+        key = item.get(ITEM_KEYS[kind])
+        return (_item_id(item), None if key is None else str(key),
+                1 if item.get('completed', False) else 0, amount)
+
+    def _insert_items(self, conn: sqlite3.Connection, list_id: int, kind: str, items: List[dict],
+                      start: int = -1):
+        """Insert items at the positions after start, adding them to the list's totals and moving next_item_id past them"""
+        rows = [(list_id, start + 1 + offset, *self._item_columns(kind, item), json.dumps(item, ensure_ascii=False))
+                for offset, item in enumerate(items)]
+        conn.executemany(
+            "INSERT INTO items (list_id, position, item_id, key, completed, amount, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        self._add_totals(conn, list_id, len(rows), sum(row[4] for row in rows), sum(row[5] for row in rows))
+        highest = max((row[2] for row in rows if row[2] is not None), default=None)
+        if highest is not None:
+            conn.execute("UPDATE lists SET next_item_id = MAX(next_item_id, ?) WHERE id = ?", (highest + 1, list_id))
+
+    @staticmethod
+    def _add_totals(conn: sqlite3.Connection, list_id: int, count: int, completed: int, amount: float):
+        """Adjust the stored item count, completed count and amount total of a list"""
+        if count or completed or amount:
+            conn.execute(
+                "UPDATE lists SET item_count = item_count + ?, completed_count = completed_count + ?, "
+                "total_amount = total_amount + ? WHERE id = ?",
+                (count, completed, amount, list_id)
+            )
+
+    def _schedule_export(self, kind: str, filename: str):
+        with self._export_lock:
+            self._pending.add((kind, filename))
+            if self._export_timer is None:
+                self._export_timer = threading.Timer(self.export_delay, self._export_pending)
+                self._export_timer.daemon = True
+                self._export_timer.start()
+
+    def _export_pending(self):
+        with self._export_lock:
+            self._export_timer = None
+        self._export()
+
+    def _export(self):
+        """Mirror pending lists to the documents directory, removing files of deleted lists"""
+        with self._export_run_lock:
+            with self._export_lock:
+                pending, self._pending = self._pending, set()
+            for kind, filename in sorted(pending):
+                self._export_list(kind, filename)
+
+    def _export_list(self, kind: str, filename: str):
+        filepath = list_path(kind, filename)
+        try:
+            data = self.get(kind, filename)
+            if data is None:
+                if not os.path.exists(filepath):
+                    return
+                os.remove(filepath)
+            else:
+                write_json_atomic(filepath, data)
+        except (OSError, sqlite3.Error) as e:
+            self.logger.error(f"Error exporting list {filename}: {e}")
+            return
+        document_changed(filepath)
+
+
+def create_list_store() -> ListStore:
+    if LIST_STORAGE == 'json':
+        return JsonListStore()
+    if LIST_STORAGE != 'sqlite':
+        logging.getLogger(__name__).warning(f"Unknown LIST_STORAGE '{LIST_STORAGE}', using sqlite")
+    store = SqliteListStore()
+    # Don't lose list changes still waiting to be written out as JSON
+    atexit.register(store.flush)
+    return store
+
+
+list_store = create_list_store()
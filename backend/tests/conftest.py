@@ -0,0 +1,53 @@
+"""
+Test setup: point the backend at a temporary documents tree before any of
+its modules are imported, so tests never touch documents/ or the network
+"""
+import os
+import shutil
+import sys
+import tempfile
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+WORKDIR = tempfile.mkdtemp(prefix='travel-assistant-tests-')
+os.environ['DOCUMENTS_DIR'] = os.path.join(WORKDIR, 'documents')
+os.environ['VECTORSTORE_DIR'] = os.path.join(WORKDIR, 'vectorstore')
+os.environ['LIST_DB_PATH'] = os.path.join(WORKDIR, 'lists.sqlite')
+os.environ['LIST_EXPORT_DELAY'] = '0'
+os.environ.pop('EMBEDDING_CACHE_PATH', None)
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('ANONYMIZED_TELEMETRY', 'False')
+os.environ['RESPONSE_CACHE_ENABLED'] = 'false'
+for folder in ('travel_plans', 'todo_lists', 'budgets'):
+    os.makedirs(os.path.join(WORKDIR, 'documents', folder), exist_ok=True)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    # Write out pending list changes before their directory goes
+    storage = sys.modules.get('storage')
+    if storage is not None and hasattr(storage.list_store, 'flush'):
+        storage.list_store.flush()
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def app():
+    """The Flask app with the offline chat model and embeddings from the benchmarks"""
+    from app import app as flask_app
+    from benchmarks.fakes import install
+
+    install()
+    flask_app.config['TESTING'] = True
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def documents_dir():
+    return os.environ['DOCUMENTS_DIR']
@@ -0,0 +1,35 @@
+import json
+import pytest
+from benchmarks.fakes import FakeChatModel
+
+
+class SilentAgent:
+    """An agent pipeline whose model streams no chunks at all"""
+
+    def stream(self, inputs):
+        return iter(())
+
+
+@pytest.fixture
+def executor(app):
+    from chat_model import CustomAgentExecutor
+    from documents import retrieval_service
+    yield CustomAgentExecutor(agent_llm=FakeChatModel())
+    # The first search starts a background index sync, which bumps the document generation when it lands
+    retrieval_service.wait_for_rebuild(timeout=30)
+
+
+def test_answers_plain_questions(executor):
+    result = json.loads(executor.invoke("any tips for a first trip to Lisbon?"))
+    assert result == {"answer": "Some advice on: any tips for a first trip to Lisbon?", "tools_used": []}
+
+
+def test_an_empty_model_stream_is_an_empty_answer(executor):
+    executor.agent = SilentAgent()
+    events = list(executor.stream("hello"))
+    assert events[-1] == {"type": "done", "answer": "", "tools_used": []}
+
+
+def test_no_iterations_is_an_empty_answer(executor):
+    executor.max_iterations = 0
+    assert json.loads(executor.invoke("hello")) == {"answer": "", "tools_used": []}
@@ -0,0 +1,63 @@
+import os
+from catalog import DocumentCatalog
+
+
+def write(path, content="Travel Plan"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    return str(path)
+
+
+def test_same_named_files_in_different_folders_coexist(tmp_path):
+    top = write(tmp_path / 'notes.txt', "top")
+    nested = write(tmp_path / 'travel_plans' / 'notes.txt', "nested")
+    catalog = DocumentCatalog(str(tmp_path), check_interval=0)
+
+    assert sorted(entry.rel_path for entry in catalog.entries()) == ['notes.txt', os.path.join('travel_plans', 'notes.txt')]
+    assert catalog.summary()['other'] == ['notes.txt']
+    assert catalog.summary()['travel_plans'] == ['notes.txt']
+    # By name the shallowest file wins; a relative path picks either
+    assert catalog.get('notes.txt').path == top
+    assert catalog.get('travel_plans/notes.txt').path == nested
+
+
+def test_rescans_do_not_change_the_version_of_an_unchanged_tree(tmp_path):
+    write(tmp_path / 'notes.txt')
+    write(tmp_path / 'travel_plans' / 'notes.txt')
+    write(tmp_path / 'budgets' / 'notes.txt')
+    catalog = DocumentCatalog(str(tmp_path), check_interval=0)
+    version = catalog.current_version()
+    for _ in range(3):
+        catalog.update()
+        assert catalog.current_version() == version
+        assert catalog.get('notes.txt').path == str(tmp_path / 'notes.txt')
+
+
+def test_removing_one_of_two_same_named_files(tmp_path):
+    top = write(tmp_path / 'notes.txt')
+    nested = write(tmp_path / 'travel_plans' / 'notes.txt')
+    catalog = DocumentCatalog(str(tmp_path), check_interval=0)
+    catalog.refresh()
+
+    os.remove(top)
+    catalog.update(top)
+    assert catalog.get('notes.txt').path == nested
+    assert [entry.rel_path for entry in catalog.entries()] == [os.path.join('travel_plans', 'notes.txt')]
+
+    os.remove(nested)
+    catalog.refresh(force=True)
+    assert catalog.get('notes.txt') is None
+    assert catalog.entries() == []
+
+
+def test_changed_files_are_reread(tmp_path):
+    path = write(tmp_path / 'budgets' / 'peru_20260101_000000.json', '{"title": "Peru", "items": []}')
+    catalog = DocumentCatalog(str(tmp_path), check_interval=0)
+    assert catalog.get('peru_20260101_000000.json').meta['item_count'] == 0
+
+    write(tmp_path / 'budgets' / 'peru_20260101_000000.json',
+          '{"title": "Peru", "items": [{"id": 1, "name": "Hotel", "amount": 80}]}')
+    os.utime(path, (1, 1))
+    entry = catalog.get('peru_20260101_000000.json')
+    assert entry.meta['item_count'] == 1
+    assert entry.meta['total_amount'] == 80
@@ -0,0 +1,111 @@
+import json
+from chunking import CHUNK_SIZE, chunk_file, document_type, name_from_filename
+
+PLAN = """Travel Plan for Cambodia
+Created: 2026-01-09 15:26:17
+==================================================
+
+### Suggested Cambodia Travel Itinerary
+
+**Siem Reap & Angkor Wat** (3-4 days)
+- Visit the Angkor Archaeological Park, including Angkor Wat, Bayon Temple, and Ta Prohm.
+
+**Phnom Penh** (2-3 days)
+- Explore the Royal Palace, Silver Pagoda, and the Tuol Sleng Genocide Museum.
+
+**Additional Tips:**
+- Carry small US dollar notes.
+"""
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    return str(path)
+
+
+def test_names_and_types_come_from_the_path():
+    assert name_from_filename('new_zealand_20260106_093536.json') == 'New Zealand'
+    assert name_from_filename('peru_20250101_002100_000003.txt') == 'Peru'
+    assert document_type('travel_plans/peru.txt') == 'travel_plans'
+    assert document_type('budgets/peru.json') == 'budgets'
+    assert document_type('peru.txt') == 'other'
+
+
+def test_plan_chunks_drop_the_title_block_and_keep_sections_whole(tmp_path):
+    path = write(tmp_path / 'travel_plans' / 'cambodia_20260109_152617.txt', PLAN)
+    chunks = chunk_file(path, 'travel_plans/cambodia_20260109_152617.txt')
+
+    assert len(chunks) == 1
+    content = chunks[0].page_content
+    assert content.startswith("Travel plan for Cambodia\n### Suggested Cambodia Travel Itinerary")
+    assert 'Created:' not in content and '=====' not in content
+    assert 'Carry small US dollar notes.' in content
+    assert chunks[0].metadata == {
+        'source': path,
+        'filename': 'cambodia_20260109_152617.txt',
+        'type': 'travel_plans',
+        'destination': 'Cambodia',
+        'section': 'Suggested Cambodia Travel Itinerary',
+    }
+
+
+def test_long_plans_split_between_sections(tmp_path):
+    sections = "\n\n".join(
+        f"**Stop {number}** (2 days)\n" + "\n".join(f"- Activity {number}.{line} " + "x" * 60 for line in range(5))
+        for number in range(12)
+    )
+    path = write(tmp_path / 'travel_plans' / 'japan_20260101_000000.txt', f"Travel Plan for Japan\n\n{sections}")
+    chunks = chunk_file(path, 'travel_plans/japan_20260101_000000.txt')
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert len(chunk.page_content) <= CHUNK_SIZE
+        assert chunk.page_content.startswith("Travel plan for Japan\n**Stop ")
+    assert chunks[0].metadata['section'] == 'Stop 0 (2 days)'
+
+
+def test_budget_chunks_are_a_header_and_one_line_per_item(tmp_path):
+    budget = {'title': 'Lisbon', 'items': [
+        {'id': 1, 'name': 'Hotel', 'amount': 420, 'category': 'stay', 'created': '2026-01-01'},
+        {'id': 2, 'name': 'Tram pass', 'amount': '12.5'},
+    ]}
+    path = write(tmp_path / 'budgets' / 'lisbon_20260101_000000.json', json.dumps(budget, indent=2))
+    chunks = chunk_file(path, 'budgets/lisbon_20260101_000000.json')
+
+    assert [chunk.page_content for chunk in chunks] == [
+        "Budget 'Lisbon': 2 items, total $432.50\n"
+        "- Hotel: $420.00 (category: stay)\n"
+        "- Tram pass: $12.50"
+    ]
+    assert chunks[0].metadata['type'] == 'budgets'
+    assert chunks[0].metadata['destination'] == 'Lisbon'
+
+
+def test_todo_chunks_mark_completed_items(tmp_path):
+    todo = {'title': 'Prep', 'items': [
+        {'id': 1, 'text': 'renew passport', 'completed': True},
+        {'id': 2, 'text': 'book flights', 'completed': False},
+    ]}
+    path = write(tmp_path / 'todo_lists' / 'prep_20260101_000000.json', json.dumps(todo))
+    chunks = chunk_file(path, 'todo_lists/prep_20260101_000000.json')
+
+    assert chunks[0].page_content == "Todo list 'Prep': 2 items, 1 done\n- [x] renew passport\n- [ ] book flights"
+
+
+def test_long_lists_repeat_the_header_in_every_chunk(tmp_path):
+    todo = {'title': 'Long', 'items': [{'id': i, 'text': f'task number {i} ' + 'y' * 40} for i in range(100)]}
+    path = write(tmp_path / 'todo_lists' / 'long_20260101_000000.json', json.dumps(todo))
+    chunks = chunk_file(path, 'todo_lists/long_20260101_000000.json')
+
+    assert len(chunks) > 1
+    assert all(chunk.page_content.startswith("Todo list 'Long': 100 items, 0 done\n") for chunk in chunks)
+    assert all(len(chunk.page_content) <= CHUNK_SIZE for chunk in chunks)
+    assert sum(chunk.page_content.count('\n- [ ]') for chunk in chunks) == 100
+
+
+def test_other_json_is_compacted(tmp_path):
+    path = write(tmp_path / 'notes.json', json.dumps({'a': [1, 2], 'b': 'text'}, indent=4))
+    chunks = chunk_file(path, 'notes.json')
+    assert [chunk.page_content for chunk in chunks] == ['{"a":[1,2],"b":"text"}']
+    assert chunks[0].metadata['type'] == 'other'
@@ -0,0 +1,88 @@
+from context_compression import (
+    compress_context, drop_near_duplicates, drop_repeated_headings, query_terms, trim_passage,
+)
+
+CAMBODIA = """[From cambodia_20260109_152617.txt]: Travel plan for Cambodia
+### Suggested Cambodia Travel Itinerary
+
+**Siem Reap & Angkor Wat** (3-4 days)
+- Visit the Angkor Archaeological Park, including Angkor Wat, Bayon Temple, and Ta Prohm.
+
+**Phnom Penh** (2-3 days)
+- Explore the Royal Palace, Silver Pagoda, and the poignant Tuol Sleng Genocide Museum.
+
+**Sihanoukville & Islands** (2-3 days)
+- Relax on the beaches or visit nearby islands like Koh Rong or Koh Rong Samloem.
+
+**Battambang** (1-2 days)
+- Enjoy the Bamboo Train ride and explore the colonial architecture and local markets."""
+
+PERU = """[From peru_20260101_000000.txt]: Travel plan for Peru
+**Cusco** (3 days)
+- Acclimatise, walk the San Blas quarter and visit the Sacred Valley markets and ruins.
+
+**Machu Picchu** (1 day)
+- Take the early train from Ollantaytambo and hike up to the Sun Gate for the view.
+
+**Lima** (2 days)
+- Eat ceviche in Miraflores and walk the clifftop parks above the Pacific beaches."""
+
+
+def test_query_terms_drop_stop_words_and_short_words():
+    assert query_terms("What should I do in Cambodia?") == {'cambodia'}
+    assert query_terms("tell me about the beaches") == {'beaches'}
+
+
+def test_destination_only_query_keeps_the_whole_passage():
+    assert compress_context("what should I do in cambodia", CAMBODIA) == CAMBODIA
+    assert trim_passage(CAMBODIA, query_terms("cambodia itinerary ideas")) is not None
+
+
+def test_specific_terms_trim_to_matching_paragraphs():
+    trimmed = trim_passage(CAMBODIA, query_terms("cambodia beaches"))
+    assert trimmed == ("[From cambodia_20260109_152617.txt]: Travel plan for Cambodia\n"
+                       "**Sihanoukville & Islands** (2-3 days)\n"
+                       "- Relax on the beaches or visit nearby islands like Koh Rong or Koh Rong Samloem.")
+
+
+def test_passages_matched_only_on_their_subject_give_way_to_specific_matches():
+    compressed = compress_context("peru markets", f"{CAMBODIA}\n\n{PERU}")
+    assert compressed.startswith("[From cambodia_20260109_152617.txt]: Travel plan for Cambodia\n**Battambang**")
+    assert "Sacred Valley markets" in compressed
+    assert "Machu Picchu" not in compressed
+
+
+def test_passages_not_mentioning_the_query_are_dropped_when_others_do():
+    compressed = compress_context("machu picchu sun gate", f"{CAMBODIA}\n\n{PERU}")
+    assert "[From cambodia" not in compressed
+    assert "Machu Picchu" in compressed
+
+
+def test_unmatched_queries_keep_every_passage():
+    context = f"{CAMBODIA}\n\n{PERU}"
+    assert compress_context("what about the weather", context) == context
+    assert compress_context("ok", context) == context
+
+
+def test_non_document_context_is_left_alone():
+    assert compress_context("cambodia", "No relevant documents found.") == "No relevant documents found."
+
+
+def test_near_duplicates_keep_the_first_copy():
+    copy = CAMBODIA.replace("cambodia_20260109_152617.txt", "cambodia_20260109_155004.txt")
+    assert drop_near_duplicates([CAMBODIA, copy, PERU]) == [CAMBODIA, PERU]
+
+
+def test_repeated_headings_of_a_file_are_dropped():
+    repeated = CAMBODIA + "\n\n### Suggested Cambodia Travel Itinerary\n\n**Kampot** (2 days)\n- Pepper farms."
+    compressed = compress_context("what should I do in cambodia", repeated)
+    assert compressed.count("### Suggested Cambodia Travel Itinerary") == 1
+    assert "Pepper farms." in compressed
+
+
+def test_headings_are_the_ones_chunking_splits_on():
+    first = "[From peru.txt]: Travel plan for Peru\n**Cusco** (3 days)\n- Walk the San Blas streets."
+    second = "[From peru.txt]: Travel plan for Peru\n**Cusco** (3 days)\n- Day trip to Rainbow Mountain."
+    assert drop_repeated_headings([first, second]) == [
+        first, "[From peru.txt]: Travel plan for Peru\n- Day trip to Rainbow Mountain.",
+    ]
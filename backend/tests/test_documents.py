@@ -0,0 +1,173 @@
+import threading
+import pytest
+import documents
+import storage
+from benchmarks.fakes import FakeEmbeddings
+from documents import RetrievalService, retrieval_service
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    """Fake embeddings that record every text embedded and can be held up mid-call"""
+
+    def __init__(self):
+        super().__init__()
+        self.embedded = []
+        self.gate = None
+        self.started = threading.Event()
+
+    def embed_documents(self, texts):
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(10)
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    """An empty documents tree and vector store of its own, embedded by CountingEmbeddings"""
+    # The shared service reads the same module globals; don't let a rebuild of it overlap the test
+    if hasattr(storage.list_store, 'flush'):
+        storage.list_store.flush()
+    retrieval_service.wait_for_rebuild(timeout=30)
+
+    documents_dir = tmp_path / 'documents'
+    (documents_dir / 'travel_plans').mkdir(parents=True)
+    vectorstore_dir = tmp_path / 'vectorstore'
+    embeddings = CountingEmbeddings()
+    monkeypatch.setattr(documents, 'DOCUMENTS_DIR', str(documents_dir))
+    monkeypatch.setattr(documents, 'VECTORSTORE_DIR', str(vectorstore_dir))
+    monkeypatch.setattr(documents, 'MANIFEST_PATH', str(vectorstore_dir / 'manifest.json'))
+    monkeypatch.setattr(documents, 'embeddings', embeddings)
+    return documents_dir, embeddings
+
+
+def write_plan(documents_dir, name, activity):
+    path = documents_dir / 'travel_plans' / f'{name}_20260101_000000.txt'
+    path.write_text(f"Travel Plan for {name.title()}\n\n**Highlights** (3 days)\n- {activity}\n", encoding='utf-8')
+    return path
+
+
+def embedded_destinations(embeddings):
+    return sorted(text.split('\n')[0] for text in embeddings.embedded)
+
+
+def started(service):
+    """Start a service and let its initial background sync finish"""
+    service.start()
+    assert service.wait_for_rebuild(timeout=30)
+    return service
+
+
+def search(service, query):
+    with service.read() as store:
+        return [doc.metadata['filename'] for doc in store.similarity_search(query, k=5)]
+
+
+def test_only_changed_and_removed_files_are_reindexed(index):
+    documents_dir, embeddings = index
+    write_plan(documents_dir, 'peru', "Hike the Inca Trail.")
+    write_plan(documents_dir, 'chile', "Stargaze in the Atacama.")
+    oman = write_plan(documents_dir, 'oman', "Dive off Musandam.")
+    service = started(RetrievalService())
+    assert embedded_destinations(embeddings) == [
+        'Travel plan for Chile', 'Travel plan for Oman', 'Travel plan for Peru',
+    ]
+
+    embeddings.embedded.clear()
+    write_plan(documents_dir, 'peru', "Raft the Urubamba.")
+    oman.unlink()
+    service.rebuild()
+    # Chile is copied from the previously active buffer rather than embedded again
+    assert embedded_destinations(embeddings) == ['Travel plan for Peru']
+    assert search(service, "raft the urubamba") == ['peru_20260101_000000.txt', 'chile_20260101_000000.txt']
+
+    # The other buffer catches up by copying, with nothing left to embed
+    embeddings.embedded.clear()
+    service.rebuild()
+    assert embeddings.embedded == []
+    with service.read() as store:
+        assert store._collection.count() == 2
+
+
+def test_a_restart_reopens_the_index_without_embedding(index):
+    documents_dir, embeddings = index
+    write_plan(documents_dir, 'peru', "Hike the Inca Trail.")
+    started(RetrievalService())
+
+    embeddings.embedded.clear()
+    restarted = RetrievalService()
+    restarted.start()
+    # The persisted buffer serves straight away, before the background sync finishes
+    assert search(restarted, "inca trail") == ['peru_20260101_000000.txt']
+    assert restarted.wait_for_rebuild(timeout=30)
+    assert embeddings.embedded == []
+
+
+def test_a_new_index_version_forces_a_rebuild(index, monkeypatch):
+    documents_dir, embeddings = index
+    write_plan(documents_dir, 'peru', "Hike the Inca Trail.")
+    started(RetrievalService())
+
+    monkeypatch.setattr(documents, 'INDEX_FORMAT_VERSION', documents.INDEX_FORMAT_VERSION + 1)
+    embeddings.embedded.clear()
+    restarted = RetrievalService()
+    restarted.start()
+    with restarted.read() as store:
+        assert store is None
+    assert restarted.wait_for_rebuild(timeout=30)
+    assert embedded_destinations(embeddings) == ['Travel plan for Peru']
+    assert search(restarted, "inca trail") == ['peru_20260101_000000.txt']
+
+
+def test_reads_never_see_the_buffer_being_rebuilt(index):
+    documents_dir, embeddings = index
+    write_plan(documents_dir, 'peru', "Hike the Inca Trail.")
+    service = started(RetrievalService())
+    with service.read() as store:
+        first = store._collection.name
+
+    write_plan(documents_dir, 'chile', "Stargaze in the Atacama.")
+    embeddings.gate = threading.Event()
+    embeddings.started.clear()
+    rebuild = threading.Thread(target=service.rebuild)
+    rebuild.start()
+    try:
+        assert embeddings.started.wait(10)
+        # Mid-rebuild, queries keep reading the previous buffer, which lacks the new file
+        with service.read() as store:
+            assert store._collection.name == first
+            assert search(service, "stargaze atacama") == ['peru_20260101_000000.txt']
+    finally:
+        embeddings.gate.set()
+        rebuild.join(10)
+    with service.read() as store:
+        assert store._collection.name != first
+    assert 'chile_20260101_000000.txt' in search(service, "stargaze atacama")
+
+
+def test_rebuilds_wait_for_readers_of_the_buffer_they_reuse(index):
+    documents_dir, embeddings = index
+    write_plan(documents_dir, 'peru', "Hike the Inca Trail.")
+    service = started(RetrievalService())
+    write_plan(documents_dir, 'chile', "Stargaze in the Atacama.")
+
+    with service.read() as held:
+        held_name = held._collection.name
+        # The first rebuild goes to the other buffer and swaps it in at once
+        service.rebuild()
+        with service.read() as store:
+            assert store._collection.name != held_name
+
+        # The next one would write to the held buffer, so it waits for the reader
+        write_plan(documents_dir, 'oman', "Dive off Musandam.")
+        rebuild = threading.Thread(target=service.rebuild)
+        rebuild.start()
+        rebuild.join(0.3)
+        assert rebuild.is_alive()
+        assert held._collection.count() == 1
+    rebuild.join(10)
+    assert not rebuild.is_alive()
+    with service.read() as store:
+        assert store._collection.name == held_name
+        assert store._collection.count() == 3
@@ -0,0 +1,71 @@
+import time
+from array import array
+from benchmarks.fakes import FakeEmbeddings
+from embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    def __init__(self):
+        super().__init__()
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.embedded.append(text)
+        return super().embed_query(text)
+
+
+def cached(tmp_path, **options):
+    model = CountingEmbeddings()
+    return CachedEmbeddings(model, str(tmp_path / 'cache.sqlite'), **options), model
+
+
+def test_each_distinct_text_is_embedded_once(tmp_path):
+    cache, model = cached(tmp_path)
+    vectors = cache.embed_documents(['peru', 'chile', 'peru'])
+    assert model.embedded == ['peru', 'chile']
+    assert vectors[0] == vectors[2]
+    # Cached vectors come back exactly as first returned, at the stored precision
+    assert cache.embed_documents(['chile']) == [vectors[1]]
+    assert vectors[1] == array('f', FakeEmbeddings().embed_documents(['chile'])[0]).tolist()
+    assert model.embedded == ['peru', 'chile']
+    assert cache.stats() == {'hits': 2, 'misses': 2, 'hit_rate': 0.5, 'entries': 2}
+
+
+def test_queries_and_documents_are_cached_separately(tmp_path):
+    cache, model = cached(tmp_path)
+    cache.embed_documents(['peru'])
+    cache.embed_query('peru')
+    cache.embed_query('peru')
+    assert model.embedded == ['peru', 'peru']
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['entries'] == 2
+
+
+def test_the_cache_survives_a_restart(tmp_path):
+    cache, _ = cached(tmp_path)
+    cache.embed_documents(['peru', 'chile'])
+
+    restarted, model = cached(tmp_path)
+    restarted.embed_documents(['peru', 'chile'])
+    assert model.embedded == []
+    assert restarted.stats() == {'hits': 2, 'misses': 0, 'hit_rate': 1.0, 'entries': 2}
+
+
+def test_least_recently_used_vectors_are_evicted(tmp_path):
+    cache, model = cached(tmp_path, max_entries=2)
+    cache.embed_documents(['peru'])
+    time.sleep(0.01)
+    cache.embed_documents(['chile'])
+    time.sleep(0.01)
+    cache.embed_documents(['peru'])
+    time.sleep(0.01)
+    cache.embed_documents(['oman'])
+    assert cache.stats()['entries'] == 2
+
+    model.embedded.clear()
+    cache.embed_documents(['peru', 'oman', 'chile'])
+    assert model.embedded == ['chile']
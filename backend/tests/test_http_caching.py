@@ -0,0 +1,87 @@
+import gzip
+import json
+import os
+import pytest
+from document_events import document_changed
+from paths import TRAVEL_PLANS_DIR
+from storage import list_store
+
+PLAN_TEXT = "Travel Plan for Peru\n\n" + "\n".join(f"Day {day}: hike, market, museum." for day in range(1, 80))
+
+
+@pytest.fixture
+def plan():
+    filename = 'peru_20260101_000000.txt'
+    filepath = os.path.join(TRAVEL_PLANS_DIR, filename)
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(PLAN_TEXT)
+    document_changed(filepath)
+    yield filename
+    os.remove(filepath)
+    document_changed(filepath)
+
+
+def test_matching_etag_gets_304(client, plan):
+    first = client.get(f'/travel-plans/{plan}')
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'no-cache'
+    etag = first.headers['ETag']
+
+    repeat = client.get(f'/travel-plans/{plan}', headers={'If-None-Match': etag})
+    assert repeat.status_code == 304
+    assert repeat.data == b''
+    assert repeat.headers['ETag'] == etag
+
+    modified = client.get(f'/travel-plans/{plan}', headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert modified.status_code == 304
+
+
+def test_changed_file_gets_a_new_etag(client, plan):
+    etag = client.get(f'/travel-plans/{plan}').headers['ETag']
+    filepath = os.path.join(TRAVEL_PLANS_DIR, plan)
+    with open(filepath, 'a', encoding='utf-8') as f:
+        f.write("\nDay 80: fly home.")
+    document_changed(filepath)
+
+    response = client.get(f'/travel-plans/{plan}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_list_etag_changes_with_its_items(client):
+    filename = list_store.create('todo_lists', 'Etag', [{'id': 1, 'text': 'pack', 'completed': False}])
+    etag = client.get(f'/todo-lists/{filename}').headers['ETag']
+    assert client.get(f'/todo-lists/{filename}', headers={'If-None-Match': etag}).status_code == 304
+
+    client.patch(f'/todo-lists/{filename}', json={'operations': [{'op': 'toggle', 'id': 1}]})
+    response = client.get(f'/todo-lists/{filename}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['items'][0]['completed'] is True
+
+
+def test_overview_etag_changes_with_any_list(client):
+    etag = client.get('/documents/overview').headers['ETag']
+    assert client.get('/documents/overview', headers={'If-None-Match': etag}).status_code == 304
+
+    filename = list_store.create('budgets', 'Overview', [{'id': 1, 'name': 'Bus', 'amount': 12}])
+    response = client.get('/documents/overview', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert filename in [summary['filename'] for summary in response.get_json()['budgets']]
+
+
+def test_large_responses_are_gzipped_with_a_weak_etag(client, plan):
+    response = client.get(f'/travel-plans/{plan}', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.headers['ETag'].startswith('W/')
+    assert json.loads(gzip.decompress(response.data))['content'] == PLAN_TEXT
+
+    repeat = client.get(f'/travel-plans/{plan}', headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag'],
+    })
+    assert repeat.status_code == 304
+
+
+def test_small_or_unaccepted_responses_are_not_compressed(client, plan):
+    assert 'Content-Encoding' not in client.get('/health', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in client.get(f'/travel-plans/{plan}').headers
@@ -0,0 +1,68 @@
+import pytest
+from storage import list_store
+
+
+@pytest.fixture
+def todo_list():
+    return list_store.create('todo_lists', 'Patch', [
+        {'id': item_id, 'text': f'task {item_id}', 'completed': False} for item_id in (1, 2, 3)
+    ])
+
+
+def patch(client, path, *operations):
+    return client.patch(path, json={'operations': list(operations)})
+
+
+def test_patch_returns_only_the_changed_items(client, todo_list):
+    response = patch(client, f'/todo-lists/{todo_list}',
+                     {'op': 'toggle', 'id': 1},
+                     {'op': 'edit', 'id': 2, 'changes': {'text': 'renamed'}},
+                     {'op': 'remove', 'id': 3},
+                     {'op': 'add', 'item': {'text': 'added'}})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['filename'] == todo_list
+    assert [(item['id'], item['text'], item['completed']) for item in body['changed']] == [
+        (1, 'task 1', True), (2, 'renamed', False), (4, 'added', False),
+    ]
+    assert body['removed'] == [3]
+    assert 'order' not in body
+
+    items = client.get(f'/todo-lists/{todo_list}').get_json()['items']
+    assert [item['id'] for item in items] == [1, 2, 4]
+
+
+def test_patch_reorder_returns_the_full_order(client, todo_list):
+    body = patch(client, f'/todo-lists/{todo_list}', {'op': 'reorder', 'id': 3, 'index': 0}).get_json()
+    assert [item['id'] for item in body['changed']] == [3]
+    assert body['order'] == [3, 1, 2]
+
+
+def test_patch_rejects_the_whole_batch_on_an_invalid_operation(client, todo_list):
+    before = client.get(f'/todo-lists/{todo_list}').get_json()
+    response = patch(client, f'/todo-lists/{todo_list}', {'op': 'toggle', 'id': 1}, {'op': 'edit', 'id': 99,
+                                                                                      'changes': {}})
+    assert response.status_code == 400
+    assert 'Item 99' in response.get_json()['error']
+    assert client.get(f'/todo-lists/{todo_list}').get_json() == before
+
+
+@pytest.mark.parametrize('body', [{}, {'operations': 'toggle'}, {'operations': [1, 2]}])
+def test_patch_needs_a_list_of_operations(client, todo_list, body):
+    assert client.patch(f'/todo-lists/{todo_list}', json=body).status_code == 400
+
+
+def test_patch_missing_list(client):
+    assert patch(client, '/todo-lists/missing.json', {'op': 'toggle', 'id': 1}).status_code == 404
+    assert patch(client, '/budgets/missing.json', {'op': 'remove', 'id': 1}).status_code == 404
+
+
+def test_patch_budget_updates_the_listing_total(client):
+    budget = list_store.create('budgets', 'Patch', [{'id': 1, 'name': 'Hotel', 'amount': 200}])
+    body = patch(client, f'/budgets/{budget}',
+                 {'op': 'edit', 'id': 1, 'changes': {'amount': 150}},
+                 {'op': 'add', 'item': {'name': 'Ferry', 'amount': 25}}).get_json()
+    assert [(item['id'], item['amount']) for item in body['changed']] == [(1, 150), (2, 25)]
+
+    budgets = {summary['filename']: summary for summary in client.get('/budgets').get_json()['documents/budgets']}
+    assert budgets[budget]['total_amount'] == 175
@@ -0,0 +1,111 @@
+import json
+import os
+import pytest
+from catalog import catalog
+from document_events import document_changed
+from keyword_index import KeywordIndex
+from paths import BUDGETS_DIR, TRAVEL_PLANS_DIR
+
+
+def write(directory, filename, content):
+    filepath = os.path.join(directory, filename)
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(content)
+    document_changed(filepath)
+    return filepath
+
+
+@pytest.fixture
+def documents():
+    paths = [
+        write(TRAVEL_PLANS_DIR, 'zanzibar_20260101_000000.txt',
+              "Travel Plan for Zanzibar\n\n**Stone Town** (2 days)\n- Spice tour and **snorkelling** at Mnemba.\n"
+              "- More snorkelling off Nungwi, then snorkelling lessons."),
+        write(TRAVEL_PLANS_DIR, 'tasmania_20260101_000000.txt',
+              "Travel Plan for Tasmania\n\n**Hobart** (3 days)\n- Salamanca market, MONA and one snorkelling trip, "
+              "plus a long drive up the east coast past Freycinet, Bay of Fires and a dozen small towns."),
+        write(BUDGETS_DIR, 'zanzibar_20260102_000000.json',
+              json.dumps({'title': 'Zanzibar', 'items': [{'id': 1, 'name': 'Snorkelling tour', 'amount': 45}]})),
+    ]
+    yield
+    for path in paths:
+        os.remove(path)
+        document_changed(path)
+
+
+def filenames(results):
+    return [result['filename'] for result in results]
+
+
+def test_ranks_documents_by_bm25(documents):
+    results = KeywordIndex().search('snorkelling', max_results=10)
+    assert filenames(results)[:1] == ['zanzibar_20260101_000000.txt']
+    assert set(filenames(results)) >= {
+        'zanzibar_20260101_000000.txt', 'tasmania_20260101_000000.txt', 'zanzibar_20260102_000000.json',
+    }
+    scores = [result['score'] for result in results]
+    assert scores == sorted(scores, reverse=True)
+
+    top = results[0]
+    assert top['type'] == 'travel_plans'
+    assert top['destination'] == 'Zanzibar'
+    # Markdown is stripped before matches are highlighted, so bold never nests
+    assert '**snorkelling**' in top['snippet']
+    assert '****' not in top['snippet']
+
+
+def test_filters_restrict_results(documents):
+    index = KeywordIndex()
+    assert filenames(index.search('snorkelling', 10, {'type': 'budgets'})) == ['zanzibar_20260102_000000.json']
+    assert set(filenames(index.search('snorkelling', 10, {'destination': ['Zanzibar']}))) == {
+        'zanzibar_20260101_000000.txt', 'zanzibar_20260102_000000.json',
+    }
+    assert index.search('snorkelling', 10, {'filename': 'missing.txt'}) == []
+
+
+def test_follows_writes_and_deletes(documents):
+    index = KeywordIndex()
+    assert index.search('kitesurfing') == []
+
+    path = write(TRAVEL_PLANS_DIR, 'tasmania_20260101_000000.txt', "Travel Plan for Tasmania\n\n- Kitesurfing.")
+    assert filenames(index.search('kitesurfing')) == ['tasmania_20260101_000000.txt']
+    assert 'tasmania_20260101_000000.txt' not in filenames(index.search('freycinet'))
+
+    os.remove(path)
+    document_changed(path)
+    assert index.search('kitesurfing') == []
+    # Put it back for the fixture to remove
+    write(TRAVEL_PLANS_DIR, 'tasmania_20260101_000000.txt', "Travel Plan for Tasmania")
+
+
+def test_picks_up_files_added_outside_the_app(documents):
+    index = KeywordIndex()
+    index.build()
+    filepath = os.path.join(TRAVEL_PLANS_DIR, 'oman_20260101_000000.txt')
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write("Travel Plan for Oman\n\n- Paragliding over the north coast.")
+    try:
+        catalog.refresh(force=True)
+        assert filenames(index.search('paragliding')) == ['oman_20260101_000000.txt']
+    finally:
+        os.remove(filepath)
+        document_changed(filepath)
+
+
+def test_queries_without_terms_match_nothing(documents):
+    assert KeywordIndex().search('  ?! ') == []
+
+
+def test_search_endpoint_returns_results_and_context(client, documents):
+    body = client.post('/documents/search', json={'keyword': 'snorkelling', 'document_type': 'budgets'}).get_json()
+    assert filenames(body['results']) == ['zanzibar_20260102_000000.json']
+    assert body['context'] == f"[From zanzibar_20260102_000000.json]: {body['results'][0]['snippet']}"
+
+    body = client.post('/documents/search', json={'keyword': 'qwertyuiop'}).get_json()
+    assert body['results'] == []
+    assert body['context'] == "No relevant documents found."
+
+
+def test_search_endpoint_rejects_bad_requests(client):
+    assert client.post('/documents/search', json={'keyword': ''}).status_code == 400
+    assert client.post('/documents/search', json={'keyword': 'x', 'document_type': 'poems'}).status_code == 400
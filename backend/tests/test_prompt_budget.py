@@ -0,0 +1,95 @@
+import threading
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from prompt_budget import PromptAssembler, count_tokens, message_tokens, truncate_to_tokens
+
+
+def summarizer(reply="Summary: planning Peru.", gate=None):
+    def summarize(prompt):
+        if gate is not None:
+            gate.wait(5)
+        if isinstance(reply, Exception):
+            raise reply
+        return AIMessage(content=reply)
+    return RunnableLambda(summarize)
+
+
+def conversation(turns, words=40):
+    history = []
+    for turn in range(turns):
+        history.append(HumanMessage(content=f"question {turn} " + "word " * words))
+        history.append(AIMessage(content=f"answer {turn} " + "word " * words))
+    return history
+
+
+def passage(name, words):
+    return f"[From {name}]: " + "text " * words
+
+
+def test_truncate_to_tokens():
+    text = "word " * 500
+    assert count_tokens(truncate_to_tokens(text, 50)) <= 50
+    assert truncate_to_tokens("short", 50) == "short"
+
+
+def test_fit_context_keeps_whole_passages_in_order():
+    assembler = PromptAssembler(summarizer(), context_budget=300)
+    context = "\n\n".join([passage('a.txt', 100), passage('b.txt', 100), passage('c.txt', 100)])
+    fitted = assembler.fit_context(context)
+    assert fitted.split("\n\n") == [passage('a.txt', 100), passage('b.txt', 100)]
+    assert count_tokens(fitted) <= 300
+
+    too_long = passage('d.txt', 2000)
+    assert count_tokens(assembler.fit_context(too_long)) <= 300
+
+
+def test_compact_leaves_short_histories_alone():
+    assembler = PromptAssembler(summarizer(), history_budget=2000)
+    history = conversation(2)
+    assert assembler.compact(history) is False
+    assert len(history) == 4
+    assert assembler.conversation_context() == ""
+
+
+def test_compact_folds_the_oldest_turns_into_the_summary():
+    gate = threading.Event()
+    assembler = PromptAssembler(summarizer(gate=gate), history_budget=300, summary_budget=2000)
+    history = conversation(6)
+    latest = history[-2:]
+
+    assert assembler.compact(history) is True
+    assert history[-2:] == latest
+    assert sum(message_tokens(message) for message in history) <= 150
+    # The folded turns are in the prompt before their summary is written
+    assert "question 0" in assembler.conversation_context()
+
+    gate.set()
+    assembler.wait_for_summary(timeout=5)
+    assert assembler.conversation_context() == "Summary of earlier conversation:\nSummary: planning Peru."
+
+
+def test_compact_keeps_the_latest_turn_whatever_its_size():
+    assembler = PromptAssembler(summarizer(), history_budget=100)
+    history = conversation(1, words=500)
+    assembler.compact(history)
+    assert len(history) == 2
+
+
+def test_reset_discards_a_summary_in_progress():
+    gate = threading.Event()
+    assembler = PromptAssembler(summarizer(gate=gate), history_budget=300)
+    assembler.compact(conversation(6))
+    assembler.reset()
+    gate.set()
+    assembler.wait_for_summary(timeout=5)
+    assert assembler.summary == ""
+    assert assembler.conversation_context() == ""
+
+
+def test_failed_summaries_keep_the_latest_folded_lines():
+    assembler = PromptAssembler(summarizer(RuntimeError("model down")), history_budget=300, summary_budget=50)
+    assembler.compact(conversation(6))
+    assembler.wait_for_summary(timeout=5)
+    assert count_tokens(assembler.summary) <= 50
+    assert "question 0" not in assembler.summary
+    assert assembler.summary.strip().endswith("word")
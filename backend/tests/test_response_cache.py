@@ -0,0 +1,71 @@
+import time
+from benchmarks.fakes import FakeEmbeddings
+from document_events import bump_generation, current_generation, document_changed
+from response_cache import SemanticResponseCache
+
+QUESTION = "what are the best beaches in portugal"
+
+
+def cache(**options):
+    return SemanticResponseCache(FakeEmbeddings(), **options)
+
+
+def test_similar_questions_reuse_the_answer():
+    responses = cache(threshold=0.9)
+    responses.store(QUESTION, "Praia da Marinha.", ['search_documents'], current_generation())
+
+    hit = responses.lookup("the best beaches in Portugal, what are they")
+    assert hit.answer == "Praia da Marinha."
+    assert hit.tools_used == ['search_documents']
+    assert responses.lookup("how much is a train from lisbon to porto") is None
+    assert responses.stats()['hits'] == 1
+
+
+def test_document_changes_expire_every_answer():
+    responses = cache()
+    responses.store(QUESTION, "Praia da Marinha.", [], current_generation())
+    document_changed()
+    assert responses.lookup(QUESTION) is None
+
+    responses.store(QUESTION, "Praia da Marinha.", [], current_generation())
+    bump_generation()
+    assert responses.lookup(QUESTION) is None
+    assert responses.stats()['entries'] == 0
+
+
+def test_answers_produced_before_a_change_are_not_stored():
+    responses = cache()
+    generation = current_generation()
+    bump_generation()
+    responses.store(QUESTION, "Praia da Marinha.", [], generation)
+    assert responses.lookup(QUESTION) is None
+
+
+def test_short_questions_and_empty_answers_are_not_cached():
+    responses = cache()
+    responses.store("and porto?", "Yes.", [], current_generation())
+    responses.store(QUESTION, "", [], current_generation())
+    assert responses.stats()['entries'] == 0
+    assert responses.lookup("and porto?") is None
+
+
+def test_least_recently_used_answers_are_evicted():
+    responses = cache(max_entries=2)
+    questions = [f"what should I pack for {place} in winter" for place in ('iceland', 'norway', 'finland')]
+    generation = current_generation()
+    responses.store(questions[0], "iceland", [], generation)
+    responses.store(questions[1], "norway", [], generation)
+    assert responses.lookup(questions[0]).answer == "iceland"
+    responses.store(questions[2], "finland", [], generation)
+
+    assert responses.lookup(questions[1]) is None
+    assert responses.lookup(questions[0]).answer == "iceland"
+    assert responses.lookup(questions[2]).answer == "finland"
+
+
+def test_answers_expire_after_the_ttl():
+    responses = cache(ttl=0.05)
+    responses.store(QUESTION, "Praia da Marinha.", [], current_generation())
+    assert responses.lookup(QUESTION) is not None
+    time.sleep(0.1)
+    assert responses.lookup(QUESTION) is None
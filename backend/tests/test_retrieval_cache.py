@@ -0,0 +1,64 @@
+import pytest
+import middleware
+from document_events import bump_generation, document_changed
+from middleware import DocumentMiddleware
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    """Replace the vector search with a recorder returning one passage per call"""
+    calls = []
+
+    def search(self, query, filters=None):
+        calls.append((query, filters))
+        if query == 'broken':
+            return None
+        if filters and filters.get('destination') == ['Atlantis']:
+            return "No relevant documents found."
+        return f"[From result_{len(calls)}.txt]: {query}"
+
+    middleware._context_cache.clear()
+    monkeypatch.setattr(DocumentMiddleware, '_search_context', search)
+    return calls
+
+
+def test_repeated_queries_are_served_from_the_cache(searches):
+    document = DocumentMiddleware()
+    first = document.get_relevant_context("Peru hiking")
+    assert document.get_relevant_context("  peru   HIKING ") == first
+    assert len(searches) == 1
+
+
+def test_document_changes_invalidate_cached_results(searches):
+    document = DocumentMiddleware()
+    first = document.get_relevant_context("peru hiking")
+    document_changed()
+    second = document.get_relevant_context("peru hiking")
+    assert second != first
+    bump_generation()
+    assert document.get_relevant_context("peru hiking") not in (first, second)
+    assert len(searches) == 3
+
+
+def test_filters_and_settings_are_part_of_the_key(searches):
+    DocumentMiddleware().get_relevant_context("peru")
+    DocumentMiddleware().get_relevant_context("peru", {'type': 'budgets'})
+    DocumentMiddleware(max_docs=2).get_relevant_context("peru")
+    DocumentMiddleware().get_relevant_context("peru", {'type': 'budgets'})
+    assert len(searches) == 3
+
+
+def test_errors_are_not_cached(searches):
+    document = DocumentMiddleware()
+    assert document.get_relevant_context("broken") == "Error retrieving document context."
+    document.get_relevant_context("broken")
+    assert len(searches) == 2
+
+
+def test_fallback_retries_without_filters(searches):
+    context = DocumentMiddleware().get_relevant_context("beaches", {'destination': ['Atlantis']}, fallback=True)
+    assert context.startswith("[From ")
+    assert searches == [("beaches", {'destination': ['Atlantis']}), ("beaches", None)]
+
+    assert DocumentMiddleware().get_relevant_context("beaches", {'destination': ['Atlantis']}) == \
+        "No relevant documents found."
@@ -0,0 +1,61 @@
+import os
+import pytest
+from document_events import document_changed
+from middleware import _where, filters_from_query, mentioned_documents, search_filters
+from paths import BUDGETS_DIR, TRAVEL_PLANS_DIR
+
+
+@pytest.fixture
+def documents():
+    paths = [
+        os.path.join(TRAVEL_PLANS_DIR, 'new_zealand_20260106_093536.txt'),
+        os.path.join(BUDGETS_DIR, 'chile_20260106_093536.json'),
+    ]
+    for path in paths:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"title": "Chile", "items": []}' if path.endswith('.json') else "Travel Plan for New Zealand")
+        document_changed(path)
+    yield
+    for path in paths:
+        os.remove(path)
+        document_changed(path)
+
+
+def test_explicit_filters(documents):
+    assert search_filters('budgets', 'new zealand', 'plans/x.txt') == {
+        'type': 'budgets', 'destination': 'New Zealand', 'filename': 'x.txt',
+    }
+    assert search_filters(destination='mars') == {'destination': 'Mars'}
+    assert search_filters() == {}
+    with pytest.raises(ValueError):
+        search_filters('poems')
+
+
+def test_mentioned_documents(documents):
+    assert mentioned_documents("is chile_20260106_093536.json my chile budget or missing.json?") == {
+        'filenames': ['chile_20260106_093536.json'], 'types': ['budgets'], 'destinations': ['Chile'],
+    }
+    assert mentioned_documents("new zealand or chile schedule") == {
+        'filenames': [], 'types': ['travel_plans'], 'destinations': ['Chile', 'New Zealand'],
+    }
+
+
+def test_filters_inferred_from_the_query(documents):
+    assert filters_from_query("what's in my new zealand itinerary?") == {
+        'type': 'travel_plans', 'destination': 'New Zealand',
+    }
+    assert filters_from_query("compare the chile budget with my packing list") == {
+        'type': ['budgets', 'todo_lists'], 'destination': 'Chile',
+    }
+    assert filters_from_query("open chile_20260106_093536.json please") == {
+        'filename': 'chile_20260106_093536.json',
+    }
+    assert filters_from_query("what's good to eat in spring") == {}
+
+
+def test_where_clauses():
+    assert _where({}) is None
+    assert _where({'type': 'budgets'}) == {'type': 'budgets'}
+    assert _where({'type': ['budgets', 'todo_lists'], 'destination': 'Chile'}) == {
+        '$and': [{'destination': 'Chile'}, {'type': {'$in': ['budgets', 'todo_lists']}}],
+    }
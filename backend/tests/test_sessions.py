@@ -0,0 +1,77 @@
+import json
+from sessions import Session, SessionStore
+
+
+def test_sessions_are_created_once_per_id():
+    store = SessionStore(max_sessions=10)
+    session = store.get('abc')
+    assert store.get('abc') is session
+    assert store.get().session_id not in ('abc', None)
+    assert len(store) == 2
+
+
+def test_least_recently_used_session_is_evicted():
+    store = SessionStore(max_sessions=2)
+    store.get('a')
+    store.get('b')
+    store.get('a')
+    store.get('c')
+    assert store.peek('b') is None
+    assert store.peek('a') is not None and store.peek('c') is not None
+    assert store.stats() == {'sessions': 2, 'max_sessions': 2, 'evictions': 1}
+
+
+def test_peek_neither_creates_nor_refreshes():
+    store = SessionStore(max_sessions=2)
+    assert store.peek('missing') is None
+    assert store.peek(None) is None
+    store.get('a')
+    store.get('b')
+    store.peek('a')
+    store.get('c')
+    assert store.peek('a') is None
+    assert len(store) == 2
+
+    store.drop('c')
+    assert store.peek('c') is None
+
+
+def test_history_is_bounded_and_clearable():
+    session = Session('abc', history_limit=3)
+    for turn in range(5):
+        session.add_turn(f"question {turn}", f"answer {turn}", f"2026-01-0{turn + 1}")
+    assert [turn['user'] for turn in session.get_history()] == ['question 2', 'question 3', 'question 4']
+    session.clear()
+    assert session.get_history() == []
+
+
+def test_chat_history_is_kept_per_session(client):
+    first = client.post('/chat', json={'message': 'hello from the first session'})
+    session_id = first.headers['X-Session-ID']
+    assert first.get_json()['session_id'] == session_id
+
+    client.post('/chat', json={'message': 'hello from the second session'}, headers={'X-Session-ID': 'second'})
+    client.post('/chat', json={'message': 'and again', 'session_id': session_id})
+
+    history = client.get('/history', headers={'X-Session-ID': session_id}).get_json()['history']
+    assert [turn['user'] for turn in history] == ['hello from the first session', 'and again']
+    history = client.get('/history', query_string={'session_id': 'second'}).get_json()['history']
+    assert [turn['user'] for turn in history] == ['hello from the second session']
+    assert client.get('/history', headers={'X-Session-ID': 'unknown'}).get_json()['history'] == []
+
+    client.delete('/history', headers={'X-Session-ID': session_id})
+    assert client.get('/history', headers={'X-Session-ID': session_id}).get_json()['history'] == []
+    assert len(client.get('/history', headers={'X-Session-ID': 'second'}).get_json()['history']) == 1
+
+
+def test_streamed_turns_join_the_session_history(client):
+    response = client.post('/chat/stream', json={'message': 'hello over the stream'},
+                           headers={'X-Session-ID': 'streamed'})
+    events = [json.loads(line[len('data: '):]) for line in response.get_data(as_text=True).splitlines()
+              if line.startswith('data: ')]
+    assert events[-1]['type'] == 'done'
+    assert events[-1]['session_id'] == 'streamed'
+
+    history = client.get('/history', headers={'X-Session-ID': 'streamed'}).get_json()['history']
+    assert history[0]['user'] == 'hello over the stream'
+    assert history[0]['assistant'] == events[-1]['response']
@@ -0,0 +1,230 @@
+import json
+import os
+import pytest
+import storage
+from catalog import catalog
+from document_events import document_changed
+from storage import JsonListStore, ListStore, SqliteListStore, list_path
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'json':
+        yield JsonListStore()
+        return
+    sqlite_store = SqliteListStore(str(tmp_path / 'lists.sqlite'), export_delay=0)
+    yield sqlite_store
+    sqlite_store.flush()
+
+
+def todo_items(*ids):
+    return [{'id': item_id, 'text': f'task {item_id}', 'completed': False} for item_id in ids]
+
+
+def ids(store, kind, filename):
+    return [item['id'] for item in store.get(kind, filename)['items']]
+
+
+def without_timestamps(items):
+    return [{field: value for field, value in item.items() if field != 'created'} for item in items]
+
+
+def test_removed_ids_are_not_reused(store):
+    filename = store.create('todo_lists', 'Reuse', todo_items(1, 2, 3))
+    result = store.apply_operations('todo_lists', filename, [
+        {'op': 'remove', 'id': 3},
+        {'op': 'remove', 'id': 1},
+        {'op': 'add', 'item': {'text': 'new'}},
+    ])
+    assert [item['id'] for item in result['changed']] == [4]
+    assert result['removed'] == [3, 1]
+    assert ids(store, 'todo_lists', filename) == [2, 4]
+    assert store.get('todo_lists', filename)['next_item_id'] == 5
+
+
+def test_backends_agree_on_the_same_batch(tmp_path):
+    operations = [
+        {'op': 'add', 'item': {'text': 'pack'}},
+        {'op': 'toggle', 'id': 2},
+        {'op': 'edit', 'id': 1, 'changes': {'text': 'book hostel', 'id': 99}},
+        {'op': 'remove', 'id': 3},
+        {'op': 'reorder', 'id': 4, 'index': 0},
+        {'op': 'add', 'item': {'text': 'visa'}},
+    ]
+    results = []
+    for store in (JsonListStore(), SqliteListStore(str(tmp_path / 'lists.sqlite'), export_delay=0)):
+        filename = store.create('todo_lists', 'Parity', todo_items(1, 2, 3))
+        result = store.apply_operations('todo_lists', filename, operations)
+        data = store.get('todo_lists', filename)
+        results.append((
+            without_timestamps(result['changed']), result['removed'], result['order'],
+            without_timestamps(data['items']), data['next_item_id'],
+        ))
+    assert results[0] == results[1]
+    assert results[0][2] == [4, 1, 2, 5]
+
+
+def test_removes_and_reorders_interleave(store):
+    filename = store.create('todo_lists', 'Interleave', todo_items(1, 2, 3, 4, 5, 6))
+    result = store.apply_operations('todo_lists', filename, [
+        {'op': 'remove', 'id': 2},
+        {'op': 'reorder', 'id': 5, 'index': 0},
+        {'op': 'remove', 'id': 1},
+        {'op': 'add', 'item': {'text': 'new'}},
+        {'op': 'remove', 'id': 4},
+        {'op': 'reorder', 'id': 7, 'index': 1},
+        {'op': 'toggle', 'id': 6},
+    ])
+    assert result['order'] == [5, 7, 3, 6]
+    assert [item['id'] for item in result['changed']] == [5, 7, 6]
+    assert ids(store, 'todo_lists', filename) == [5, 7, 3, 6]
+
+
+def test_reorder_returns_the_full_order(store):
+    filename = store.create('todo_lists', 'Order', todo_items(1, 2, 3, 4))
+    result = store.apply_operations('todo_lists', filename, [{'op': 'reorder', 'id': 4, 'index': 0}])
+    assert result['order'] == [4, 1, 2, 3]
+    assert ids(store, 'todo_lists', filename) == [4, 1, 2, 3]
+
+    result = store.apply_operations('todo_lists', filename, [{'op': 'reorder', 'id': 4, 'index': 10}])
+    assert result['order'] == [1, 2, 3, 4]
+
+    result = store.apply_operations('todo_lists', filename, [{'op': 'toggle', 'id': 1}])
+    assert 'order' not in result
+
+
+def test_invalid_batch_leaves_the_list_untouched(store):
+    filename = store.create('todo_lists', 'Atomic', todo_items(1, 2))
+    before = store.get('todo_lists', filename)
+    with pytest.raises(ValueError):
+        store.apply_operations('todo_lists', filename, [{'op': 'toggle', 'id': 1}, {'op': 'remove', 'id': 99}])
+    with pytest.raises(ValueError):
+        store.apply_operations('todo_lists', filename, [{'op': 'shuffle', 'id': 1}])
+    with pytest.raises(ValueError):
+        store.apply_operations('todo_lists', filename, [{'op': 'reorder', 'id': 1, 'index': -1}])
+    assert store.get('todo_lists', filename) == before
+
+
+def test_add_items_skips_duplicates_and_keeps_numbering(store):
+    filename = store.create('todo_lists', 'Dupes', todo_items(1, 2))
+    skipped = store.add_items('todo_lists', filename, [{'text': 'task 1'}, {'text': 'new'}, {'text': 'new'}])
+    assert [item['text'] for item in skipped] == ['task 1', 'new']
+    assert ids(store, 'todo_lists', filename) == [1, 2, 3]
+
+    store.replace_items('todo_lists', filename, [])
+    assert store.add_items('todo_lists', filename, [{'text': 'after clearing'}]) == []
+    assert ids(store, 'todo_lists', filename) == [4]
+
+
+def test_missing_list(store):
+    assert store.get('todo_lists', 'missing.json') is None
+    assert store.stat('todo_lists', 'missing.json') is None
+    assert store.add_items('todo_lists', 'missing.json', [{'text': 'x'}]) is None
+    assert store.apply_operations('todo_lists', 'missing.json', [{'op': 'toggle', 'id': 1}]) is None
+    assert store.delete('todo_lists', 'missing.json') is False
+
+
+def test_stat_changes_on_every_write(store):
+    filename = store.create('budgets', 'Stat', [{'id': 1, 'name': 'Hotel', 'amount': 100}])
+    before = store.stat('budgets', filename)
+    store.apply_operations('budgets', filename, [{'op': 'edit', 'id': 1, 'changes': {'amount': 120}}])
+    assert store.stat('budgets', filename)[0] != before[0]
+
+
+def test_sqlite_listing_totals_follow_item_writes(tmp_path):
+    store = SqliteListStore(str(tmp_path / 'lists.sqlite'), export_delay=0)
+    budget = store.create('budgets', 'Totals', [{'id': 1, 'name': 'Hotel', 'amount': 100.5}])
+    store.apply_operations('budgets', budget, [
+        {'op': 'add', 'item': {'name': 'Train', 'amount': 40}},
+        {'op': 'edit', 'id': 1, 'changes': {'amount': 80}},
+    ])
+    todo = store.create('todo_lists', 'Totals', todo_items(1, 2, 3))
+    store.apply_operations('todo_lists', todo, [{'op': 'toggle', 'id': 1}, {'op': 'remove', 'id': 2}])
+
+    budgets = {summary['filename']: summary for summary in store.list('budgets')}
+    assert budgets[budget]['item_count'] == 2
+    assert budgets[budget]['total_amount'] == 120
+    todos = {summary['filename']: summary for summary in store.list('todo_lists')}
+    assert todos[todo]['item_count'] == 2
+    assert todos[todo]['completed_count'] == 1
+    store.flush()
+
+
+def test_sqlite_imports_json_lists_added_later(tmp_path):
+    store = SqliteListStore(str(tmp_path / 'lists.sqlite'), export_delay=0)
+    store.list('todo_lists')
+
+    filename = 'copied_in_20260101_000000.json'
+    filepath = list_path('todo_lists', filename)
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump({'title': 'Copied in', 'next_item_id': 7, 'items': todo_items(1, 2)}, f)
+    document_changed(filepath)
+
+    assert filename in [summary['filename'] for summary in store.list('todo_lists')]
+    store.add_items('todo_lists', filename, [{'text': 'added'}])
+    assert ids(store, 'todo_lists', filename) == [1, 2, 7]
+    store.flush()
+
+
+def test_sqlite_does_not_reimport_a_deleted_list(tmp_path):
+    store = SqliteListStore(str(tmp_path / 'lists.sqlite'), export_delay=60)
+    filename = store.create('todo_lists', 'Deleted', todo_items(1))
+    store.flush()
+    assert os.path.exists(list_path('todo_lists', filename))
+
+    store.delete('todo_lists', filename)
+    catalog.refresh(force=True)
+    assert filename not in [summary['filename'] for summary in store.list('todo_lists')]
+    store.flush()
+    assert not os.path.exists(list_path('todo_lists', filename))
+
+
+def test_sqlite_lists_of_different_kinds_may_share_a_filename(tmp_path):
+    filename = 'shared_20260101_000000.json'
+    for kind, items in (('todo_lists', todo_items(1)), ('budgets', [{'id': 1, 'name': 'Hotel', 'amount': 90}])):
+        filepath = list_path(kind, filename)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump({'title': 'Shared', 'items': items}, f)
+        document_changed(filepath)
+    store = SqliteListStore(str(tmp_path / 'lists.sqlite'), export_delay=0)
+    try:
+        assert store.get('todo_lists', filename)['items'][0]['text'] == 'task 1'
+        assert store.get('budgets', filename)['items'][0]['name'] == 'Hotel'
+
+        store.delete('todo_lists', filename)
+        assert store.get('todo_lists', filename) is None
+        assert store.get('budgets', filename) is not None
+    finally:
+        store.flush()
+        os.remove(list_path('budgets', filename))
+        document_changed(list_path('budgets', filename))
+
+
+def test_sqlite_exports_lists_as_json(tmp_path):
+    store = SqliteListStore(str(tmp_path / 'lists.sqlite'), export_delay=60)
+    filename = store.create('todo_lists', 'Export', todo_items(1))
+    store.apply_operations('todo_lists', filename, [{'op': 'remove', 'id': 1}])
+    store.flush()
+    with open(list_path('todo_lists', filename), encoding='utf-8') as f:
+        exported = json.load(f)
+    assert exported['items'] == []
+    assert exported['next_item_id'] == 2
+
+
+def test_list_store_is_abstract():
+    with pytest.raises(TypeError):
+        ListStore()
+
+    class Partial(ListStore):
+        def get(self, kind, filename):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_create_list_store_follows_list_storage(monkeypatch):
+    monkeypatch.setattr(storage, 'LIST_STORAGE', 'json')
+    assert isinstance(storage.create_list_store(), JsonListStore)
+    monkeypatch.setattr(storage, 'LIST_STORAGE', 'unknown')
+    assert isinstance(storage.create_list_store(), SqliteListStore)
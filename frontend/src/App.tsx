@@ -2,22 +2,62 @@ import React, { useState, useEffect } from 'react';
 import {
   Message,
   ChatResponse,
+  ChatStreamEvent,
   TravelPlan,
   TodoList,
   Budget,
   TravelPlanSummary,
   TodoListSummary,
-  BudgetSummary 
+  BudgetSummary,
+  TodoItem,
+  BudgetItem,
+  ItemOperation,
+  ItemPatchResponse,
+  DocumentsOverview
 } from './types';
 import ChatSection from './ChatSection';
 import DocumentPanel from './DocumentPanel';
 import './App.css';
 
+const SESSION_STORAGE_KEY = 'travel-assistant-session-id';
+
+// Conversation history is kept per session on the server; reuse one ID per browser
+const getSessionId = (): string => {
+  let sessionId = localStorage.getItem(SESSION_STORAGE_KEY);
+  if (!sessionId) {
+    sessionId = typeof crypto !== 'undefined' && 'randomUUID' in crypto
+      ? crypto.randomUUID()
+      : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    localStorage.setItem(SESSION_STORAGE_KEY, sessionId);
+  }
+  return sessionId;
+};
+
+// Merge the items returned by a PATCH into the local copy: changed items are
+// replaced in place, new ones appended and removed ones dropped
+const applyItemPatch = <T extends { id: number }>(items: T[], patch: ItemPatchResponse<T>): T[] => {
+  const changed = new Map(patch.changed.map(item => [item.id, item] as [number, T]));
+  const removed = new Set(patch.removed);
+  const merged = items
+    .filter(item => !removed.has(item.id))
+    .map(item => {
+      const updated = changed.get(item.id);
+      changed.delete(item.id);
+      return updated ?? item;
+    });
+  const patched = [...merged, ...Array.from(changed.values())];
+  if (!patch.order) return patched;
+  // A reorder shifts the items around the moved one, so take the full order from the server
+  const byId = new Map(patched.map(item => [item.id, item] as [number, T]));
+  return patch.order.map(id => byId.get(id)).filter((item): item is T => item !== undefined);
+};
+
 function App() {
   const [messages, setMessages] = useState<Message[]>([]);
   const [inputMessage, setInputMessage] = useState('');
   const [isLoading, setIsLoading] = useState(false);
   const [isFirstLoad, setIsFirstLoad] = useState(true);
+  const [streamingStatus, setStreamingStatus] = useState<string | null>(null);
   const [currentPlan, setCurrentPlan] = useState<TravelPlan | null>(null);
   const [currentTodo, setCurrentTodo] = useState<TodoList | null>(null);
   const [currentBudget, setCurrentBudget] = useState<Budget | null>(null);
@@ -36,25 +76,13 @@ function App() {
 
   const loadAvailableDocuments = async () => {
     try {
-      const [plansResponse, todosResponse, budgetsResponse] = await Promise.all([
-        fetch('http://localhost:5000/travel-plans'),
-        fetch('http://localhost:5000/todo-lists'),
-        fetch('http://localhost:5000/budgets')
-      ]);
-      
-      if (plansResponse.ok) {
-        const plansData = await plansResponse.json();
-        setAvailablePlans(plansData.plans || []);
-      }
-      
-      if (todosResponse.ok) {
-        const todosData = await todosResponse.json();
-        setAvailableTodos(todosData.lists || []);
-      }
-      
-      if (budgetsResponse.ok) {
-        const budgetsData = await budgetsResponse.json();
-        setAvailableBudgets(budgetsData.budgets || []);
+      // One request for every panel list; the browser revalidates it with the ETag, so an unchanged refresh is a 304
+      const response = await fetch('http://localhost:5000/documents/overview');
+      if (response.ok) {
+        const overview: DocumentsOverview = await response.json();
+        setAvailablePlans(overview.plans || []);
+        setAvailableTodos(overview.lists || []);
+        setAvailableBudgets(overview.budgets || []);
       }
     } catch (error) {
       console.error('Error loading available documents:', error);
@@ -103,22 +131,21 @@ function App() {
     if (!currentTodo) return;
 
     try {
-      const updatedItems = currentTodo.items.map(item =>
-        item.id === itemId ? { ...item, completed } : item
-      );
-
+      const operations: ItemOperation<TodoItem>[] = [{ op: 'toggle', id: itemId, completed }];
       const response = await fetch(`http://localhost:5000/todo-lists/${currentTodo.filename}`, {
-        method: 'PUT',
+        method: 'PATCH',
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ items: updatedItems }),
+        body: JSON.stringify({ operations }),
       });
 
       if (response.ok) {
+        const patch: ItemPatchResponse<TodoItem> = await response.json();
         setCurrentTodo({
           ...currentTodo,
-          items: updatedItems
+          updated: patch.updated,
+          items: applyItemPatch(currentTodo.items, patch)
         });
       } else {
         console.error('Error updating todo item');
@@ -132,22 +159,21 @@ function App() {
     if (!currentBudget) return;
 
     try {
-      const updatedItems = currentBudget.items.map(item =>
-        item.id === itemId ? { ...item, name, amount } : item
-      );
-
+      const operations: ItemOperation<BudgetItem>[] = [{ op: 'edit', id: itemId, changes: { name, amount } }];
       const response = await fetch(`http://localhost:5000/budgets/${currentBudget.filename}`, {
-        method: 'PUT',
+        method: 'PATCH',
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ items: updatedItems }),
+        body: JSON.stringify({ operations }),
       });
 
       if (response.ok) {
+        const patch: ItemPatchResponse<BudgetItem> = await response.json();
         setCurrentBudget({
           ...currentBudget,
-          items: updatedItems
+          updated: patch.updated,
+          items: applyItemPatch(currentBudget.items, patch)
         });
       } else {
         console.error('Error updating budget item');
@@ -178,7 +204,9 @@ function App() {
 
   const loadHistory = async () => {
     try {
-      const response = await fetch('http://localhost:5000/history');
+      const response = await fetch('http://localhost:5000/history', {
+        headers: { 'X-Session-ID': getSessionId() },
+      });
       const data = await response.json();
       setMessages(data.history || []);
       setIsFirstLoad(data.history?.length === 0);
@@ -202,31 +230,74 @@ function App() {
     setIsFirstLoad(false);
     setIsLoading(true);
     
+    // Apply an update to the message pair for this request
+    const updateLastMessage = (update: (lastMessage: Message) => Message) => {
+      setMessages(prev => {
+        const updatedMessages = [...prev];
+        const lastMessage = updatedMessages[updatedMessages.length - 1];
+        if (lastMessage && lastMessage.user === message) {
+          updatedMessages[updatedMessages.length - 1] = update(lastMessage);
+        }
+        return updatedMessages;
+      });
+    };
+    
     try {
-      const response = await fetch('http://localhost:5000/chat', {
+      const response = await fetch('http://localhost:5000/chat/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'X-Session-ID': getSessionId(),
         },
         body: JSON.stringify({ message }),
       });
 
-      const data: ChatResponse = await response.json();
+      let data: ChatResponse | null = null;
       
-      if (response.ok) {
-        // Update the last message with the assistant's response
-        setMessages(prev => {
-          const updatedMessages = [...prev];
-          const lastMessage = updatedMessages[updatedMessages.length - 1];
-          if (lastMessage && lastMessage.user === message) {
-            updatedMessages[updatedMessages.length - 1] = {
-              ...lastMessage,
-              assistant: data.response,
-              timestamp: data.timestamp
-            };
+      if (response.ok && response.body) {
+        // Read Server-Sent Events as they arrive so the answer renders token by token
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+          
+          const events = buffer.split('\n\n');
+          buffer = events.pop() || '';
+          
+          for (const rawEvent of events) {
+            const dataLine = rawEvent.split('\n').find(line => line.startsWith('data: '));
+            if (!dataLine) continue;
+            const event: ChatStreamEvent = JSON.parse(dataLine.slice(6));
+            
+            if (event.type === 'tool') {
+              setStreamingStatus(`Using ${event.name.replace(/_tool$/, '').replace(/_/g, ' ')}...`);
+            } else if (event.type === 'token') {
+              setStreamingStatus(null);
+              updateLastMessage(lastMessage => ({
+                ...lastMessage,
+                assistant: lastMessage.assistant + event.content
+              }));
+            } else if (event.type === 'done') {
+              data = { response: event.response, timestamp: event.timestamp };
+            } else if (event.type === 'error') {
+              console.error('Error in chat stream:', event.error);
+            }
           }
-          return updatedMessages;
-        });
+        }
+      }
+      
+      if (data) {
+        const finalResponse: ChatResponse = data;
+        // Replace the streamed text with the complete response
+        updateLastMessage(lastMessage => ({
+          ...lastMessage,
+          assistant: finalResponse.response,
+          timestamp: finalResponse.timestamp
+        }));
         
         // Check if response includes a plan, todo, or budget to show
         if (data.show_plan) {
@@ -267,36 +338,23 @@ function App() {
         }
       } else {
         // Update the last message with error response
-        setMessages(prev => {
-          const updatedMessages = [...prev];
-          const lastMessage = updatedMessages[updatedMessages.length - 1];
-          if (lastMessage && lastMessage.user === message) {
-            updatedMessages[updatedMessages.length - 1] = {
-              ...lastMessage,
-              assistant: 'Sorry, I encountered an error processing your request. Please try again.',
-              timestamp: new Date().toISOString()
-            };
-          }
-          return updatedMessages;
-        });
-        console.error('Error sending message:', data);
+        updateLastMessage(lastMessage => ({
+          ...lastMessage,
+          assistant: 'Sorry, I encountered an error processing your request. Please try again.',
+          timestamp: new Date().toISOString()
+        }));
+        console.error('Error sending message:', response.status);
       }
     } catch (error) {
       // Update the last message with error response
-      setMessages(prev => {
-        const updatedMessages = [...prev];
-        const lastMessage = updatedMessages[updatedMessages.length - 1];
-        if (lastMessage && lastMessage.user === message) {
-          updatedMessages[updatedMessages.length - 1] = {
-            ...lastMessage,
-            assistant: 'Sorry, I encountered a network error. Please check your connection and try again.',
-            timestamp: new Date().toISOString()
-          };
-        }
-        return updatedMessages;
-      });
+      updateLastMessage(lastMessage => ({
+        ...lastMessage,
+        assistant: 'Sorry, I encountered a network error. Please check your connection and try again.',
+        timestamp: new Date().toISOString()
+      }));
       console.error('Error sending message:', error);
     } finally {
+      setStreamingStatus(null);
       setIsLoading(false);
     }
   };
@@ -305,6 +363,7 @@ function App() {
     try {
       await fetch('http://localhost:5000/history', {
         method: 'DELETE',
+        headers: { 'X-Session-ID': getSessionId() },
       });
       setMessages([]);
       setIsFirstLoad(true);
@@ -447,6 +506,7 @@ function App() {
           messages={messages}
           inputMessage={inputMessage}
           isLoading={isLoading}
+          streamingStatus={streamingStatus}
           isFirstLoad={isFirstLoad}
           showDocumentPanel={showDocumentPanel}
           onInputChange={setInputMessage}
@@ -5,6 +5,7 @@ interface ChatSectionProps {
   messages: Message[];
   inputMessage: string;
   isLoading: boolean;
+  streamingStatus: string | null;
   isFirstLoad: boolean;
   showDocumentPanel: boolean;
   onInputChange: (message: string) => void;
@@ -16,6 +17,7 @@ const ChatSection: React.FC<ChatSectionProps> = ({
   messages,
   inputMessage,
   isLoading,
+  streamingStatus,
   isFirstLoad,
   showDocumentPanel,
   onInputChange,
@@ -84,9 +86,10 @@ const ChatSection: React.FC<ChatSectionProps> = ({
               </div>
             ))}
             
-            {isLoading && (
+            {isLoading && (streamingStatus || !messages[messages.length - 1]?.assistant) && (
               <div className="message assistant-message loading">
                 <div className="message-content">
+                  {streamingStatus && <div className="streaming-status">{streamingStatus}</div>}
                   <div className="typing-indicator">
                     <span></span>
                     <span></span>
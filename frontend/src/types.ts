@@ -12,6 +12,12 @@ export interface ChatResponse {
   show_budget?: string;
 }
 
+export type ChatStreamEvent =
+  | { type: 'tool'; name: string; args: Record<string, unknown> }
+  | { type: 'token'; content: string }
+  | { type: 'done'; response: string; timestamp: string; session_id: string }
+  | { type: 'error'; error: string };
+
 export interface BudgetItem {
   id: number;
   name: string;
@@ -71,3 +77,24 @@ export interface TodoListSummary {
   item_count: number;
   completed_count: number;
 }
+
+export type ItemOperation<T> =
+  | { op: 'add'; item: Partial<T> }
+  | { op: 'toggle'; id: number; completed?: boolean }
+  | { op: 'edit'; id: number; changes: Partial<T> }
+  | { op: 'remove'; id: number }
+  | { op: 'reorder'; id: number; index: number };
+
+export interface ItemPatchResponse<T> {
+  filename: string;
+  changed: T[];
+  removed: number[];
+  updated: string;
+  order?: number[];
+}
+
+export interface DocumentsOverview {
+  plans: TravelPlanSummary[];
+  lists: TodoListSummary[];
+  budgets: BudgetSummary[];
+}